@@ -128,6 +128,10 @@ def _getRaysPeripheral(
     return rays
 
 
+# the radial rays of each format and radius as offsets from the center with their distances, they do not depend on where the center is
+_RADIAL_RAYS: dict[tuple[str, int], list[list[tuple[int, int, float]]]] = dict()
+
+
 class FieldOfView:
     AngleCone = "cone"
     AngleRadial = "radial"
@@ -145,6 +149,8 @@ class FieldOfView:
         self.focalDistance: int = 0
         self._formatFunction: Callable[[Point, Point], float]
         self._angleFunction: Callable[[Point, int, Direction], list[list[Point]]]
+        self._angle = FieldOfView.AngleRadial
+        self._format = FieldOfView.FormatSquare
         self.angleOfView = FieldOfView.AngleRadial
         self.formatOfView = FieldOfView.FormatSquare
 
@@ -165,6 +171,7 @@ class FieldOfView:
                 self._angleFunction = _getRaysSquare
             case _:
                 raise ValueError("Expected: cone, radial or peripheral")
+        self._angle = value
 
 
     @property
@@ -185,12 +192,52 @@ class FieldOfView:
                 self._formatFunction = lambda p1, p2: p1.distanceSquare(p2)
             case _:
                 raise ValueError("Expected: octal, square, circle or diamond")
+        self._format = value
+
+
+    # the radial rays of the format and radius, kept between calls
+    def radialRays(self) -> list[list[tuple[int, int, float]]]:
+        key = (self._format, self.radius)
+        rays = _RADIAL_RAYS.get(key)
+        if rays is None:
+            origin = Point(0, 0)
+            rays = [[(point.x, point.y, self._formatFunction(origin, point)) for point in line] for line in _getRaysSquare(origin, self.radius, Direction.Up)]
+            _RADIAL_RAYS[key] = rays
+        return rays
 
 
     def rayCasting(self, center: Point, direction: Direction = Direction.Up) -> set[Point]:
+        if self._angle != FieldOfView.AngleRadial:  # the octants of the cone and peripheral angles change with the center
+            return self._castLines(center, self._angleFunction(center, self.radius, direction))
+        visible: set[Point] = set()
+        blocked: set[Point] = set()
+        isOpaque = self.isOpaque
+        focalDistance = self.focalDistance
+        farthest = self.radius + 0.5
+        cx, cy = center.x, center.y
+        for line in self.radialRays():
+            i = 0
+            while i < len(line) and not isOpaque(cx + line[i][0], cy + line[i][1]):
+                dx, dy, dist = line[i]
+                if dist >= focalDistance and dist <= farthest:
+                    visible.add(Point(cx + dx, cy + dy))
+                i += 1
+            if i < len(line):
+                dx, dy, dist = line[i]
+                if dist >= focalDistance and dist <= farthest:
+                    visible.add(Point(cx + dx, cy + dy))
+            while i < len(line):
+                dx, dy, _ = line[i]
+                if isOpaque(cx + dx, cy + dy):
+                    blocked.add(Point(cx + dx, cy + dy))
+                i += 1
+        return self.removeArtifacts(visible, blocked)
+
+
+    def _castLines(self, center: Point, lines: list[list[Point]]) -> set[Point]:
         visible: set[Point] = set()
         blocked: set[Point] = set()
-        for line in self._angleFunction(center, self.radius, direction):
+        for line in lines:
             i = 0
             while i < len(line) and not self.isOpaque(line[i].x, line[i].y):
                 dist = self._formatFunction(center, line[i])
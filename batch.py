@@ -0,0 +1,108 @@
+import os
+import csv
+import sys
+import time
+import getopt
+
+from multiprocessing import Pool
+
+from core import ECS, World
+from headless import randomInput, step
+from map import Map
+from runState import RunState
+from simulation import createScene, startGame
+from utils import Logger, Statistics
+
+# plays seeds x depths random games over a process pool and writes one summary row per game
+
+FIELDS = ["seed", "depth", "turns", "died", "kills", "damageDealt", "damageTaken", "reachedDepth", "msPerTurn", "mapGenerationMs"]
+
+
+# runs in the worker processes, each game gets its own world so entity ids start over
+def playGame(task: tuple[int, int, int]) -> dict[str, int | float]:
+    seed, depth, maxTurns = task
+    with World() as world:
+        scene = createScene(seed, RunState.PlayerTurn, Logger(None, 10, 0, 0))
+        startGame(scene, depth=depth)
+        firstLevel = sum(world.profiler.timing("generateWorldMap").durations)
+        keys = randomInput(seed)
+        turns = 0
+        start = time.perf_counter()
+        while turns < maxTurns and ECS.scene.resources.state != RunState.GameOver:
+            if step(keys) == RunState.MonsterTurn:
+                turns += 1
+        elapsed = time.perf_counter() - start
+        statistics: Statistics = ECS.scene.resources.statistics
+        map: Map = ECS.scene.resources.map
+        died = ECS.scene.resources.state == RunState.GameOver
+    generation = sum(world.profiler.timing("generateWorldMap").durations)
+    descents = generation - firstLevel  # levels generated while playing count against the turns
+    return {
+        "seed": seed,
+        "depth": depth,
+        "turns": turns,
+        "died": int(died),
+        "kills": statistics.kills,
+        "damageDealt": statistics.damageDealt,
+        "damageTaken": statistics.damageTaken,
+        "reachedDepth": map.depth,
+        "msPerTurn": round((elapsed - descents) * 1000 / max(turns, 1), 4),
+        "mapGenerationMs": round(generation * 1000, 4),
+    }
+
+
+def runBatch(seeds: range, depths: range, maxTurns: int, processes: int | None = None) -> list[dict[str, int | float]]:
+    tasks = [(seed, depth, maxTurns) for seed in seeds for depth in depths]
+    processes = processes or os.cpu_count() or 1
+    with Pool(processes) as pool:
+        rows = list(pool.imap_unordered(playGame, tasks, chunksize=max(1, len(tasks) // (processes * 8))))
+    rows.sort(key=lambda row: (row["seed"], row["depth"]))
+    return rows
+
+
+def writeCSV(path: str, rows: list[dict[str, int | float]]) -> None:
+    with open(path, "w", newline="") as outfile:
+        writer = csv.DictWriter(outfile, FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    firstSeed = 0
+    seeds = 100
+    depths = 1
+    maxTurns = 1000
+    processes = None
+    output = "./batch.csv"
+    helpMessage = "batch.py -h | [-r <first seed>] [-s <seeds>] [-d <depths, from 1>] [-n <max turns per game>] [-p <processes>] [-o <csv file>]"
+
+    try:
+        opts, _ = getopt.getopt(sys.argv[1:], "hr:s:d:n:p:o:")
+    except getopt.GetoptError:
+        print(helpMessage)
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt == '-h':
+            print(helpMessage)
+            sys.exit(0)
+        if opt == '-r':
+            firstSeed = int(arg)
+        if opt == '-s':
+            seeds = int(arg)
+        if opt == '-d':
+            depths = int(arg)
+        if opt == '-n':
+            maxTurns = int(arg)
+        if opt == '-p':
+            processes = int(arg)
+        if opt == '-o':
+            output = arg
+
+    start = time.perf_counter()
+    rows = runBatch(range(firstSeed, firstSeed + seeds), range(1, depths + 1), maxTurns, processes)
+    writeCSV(output, rows)
+    elapsed = time.perf_counter() - start
+    turns = sum(row["turns"] for row in rows)
+    deaths = sum(row["died"] for row in rows)
+    print(f"{len(rows)} games, {turns} turns, {deaths} deaths in {elapsed:.2f} s, written to {output}")
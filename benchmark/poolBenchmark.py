@@ -0,0 +1,86 @@
+import gc
+import time
+
+from component import CombatStats, Equipped, Monster, Name, ParticleLifetime, Player, Position, WantsToMelee, WantsToUseItem
+from core import ECS, Context, Entity, Pool, Scene
+from map import Map
+from system.damageSystem import damageSystem
+from system.meleeCombatSystem import meleeCombatSystem
+from system.particleSystem import cullDeadParticles
+from utils import Logger, Statistics
+
+MONSTERS = 1000
+TURNS = 50
+FRAMES_PER_TURN = 4
+COMPONENT_POOLS = {
+    "WantsToMelee": WantsToMelee.pool,
+    "WantsToUseItem": WantsToUseItem.pool,
+    "ParticleLifetime": ParticleLifetime.pool,
+}
+
+
+def createScene() -> Scene:
+    scene = Scene()
+    scene.useColumns(CombatStats, "maxHP", "HP", "defense", "power")
+    scene.useColumns(ParticleLifetime, "frames")
+    scene.useRelation(Equipped, "owner", "slot")
+    scene.resources.register("map", Map, Map(80, 50))
+    scene.resources.register("logger", Logger, Logger(None, 10, 0, 0))
+    scene.resources.register("statistics", Statistics, Statistics())
+    scene.resources.register("turn", int, 1)
+    scene.resources.register("player", Entity)
+    ECS.scene = scene
+    ECS.context = Context()
+
+    player = scene.create()
+    player.add(Position(40, 25)).add(Player()).add(Name("Player")).add(CombatStats(10 ** 9, 0, 0))
+    scene.resources.player = player
+    for i in range(MONSTERS):
+        monster = scene.create()
+        monster.add(Position(i % 80, i // 80)).add(Monster()).add(Name("Goblin")).add(CombatStats(10 ** 9, 0, 1))
+    return scene
+
+
+# every monster attacks the player each turn, producing intents, damage and particles
+def stressTurn(scene: Scene) -> None:
+    player = scene.resources.player
+    for monster in scene.filter(Monster.id):
+        scene.commands.add(monster, WantsToMelee.acquire(player))
+    scene.flush()
+    meleeCombatSystem()
+    scene.flush()
+    damageSystem()
+    scene.flush()
+    for _ in range(FRAMES_PER_TURN):
+        cullDeadParticles()
+        scene.flush()
+
+
+def run(pooled: bool) -> tuple[float, int, dict[str, Pool]]:
+    scene = createScene()
+    pools = dict(COMPONENT_POOLS, particles=scene.entityPool("particles"))
+    for pool in pools.values():
+        pool.free.clear()
+        pool.limit = 4096 if pooled else 0
+        pool.created = pool.reused = pool.released = 0
+    gc.collect()
+    collections = gc.get_stats()[0]["collections"]
+    start = time.perf_counter()
+    for turn in range(TURNS):
+        scene.resources.turn = turn
+        stressTurn(scene)
+    elapsed = time.perf_counter() - start
+    return elapsed, gc.get_stats()[0]["collections"] - collections, pools
+
+
+def main():
+    print(f"{MONSTERS} monsters attacking for {TURNS} turns")
+    for pooled in (False, True):
+        elapsed, collections, pools = run(pooled)
+        print(f"\n{'pooled' if pooled else 'unpooled'}: {elapsed * 1000 / TURNS:.3f} ms/turn, {collections} gen0 collections")
+        for name, pool in pools.items():
+            print(f"  {name:<18} {pool}")
+
+
+if __name__ == "__main__":
+    main()
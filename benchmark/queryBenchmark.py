@@ -0,0 +1,96 @@
+import time
+
+from component import BlocksTile, CombatStats, GUIDescription, HungerClock, Item, Monster, Name, ParticleLifetime, Player, Position, Renderable, Viewshed, WantsToDropItem, WantsToMelee, WantsToRemoveItem, WantsToUseItem
+from core import Entity, Scene
+
+FRAMES = 20
+SIZES = [1000, 10000, 100000]
+CHURN = 100  # entities that get and lose a component each frame, as the intents and particles do
+
+# the queries issued by one frame of main.update (runSystems, drawing and guiSystem)
+FRAME_QUERIES = [
+    Position.id | Viewshed.id,
+    Position.id | Viewshed.id | Monster.id | Name.id,
+    Position.id,
+    Name.id | WantsToUseItem.id | CombatStats.id,
+    Name.id | WantsToDropItem.id,
+    Name.id | WantsToRemoveItem.id,
+    WantsToMelee.id | Name.id | CombatStats.id,
+    HungerClock.id,
+    CombatStats.id,
+    Position.id | Renderable.id,
+    Position.id | Renderable.id | ParticleLifetime.id,
+    ParticleLifetime.id,
+    GUIDescription.id | Position.id,
+    Position.id | Name.id | Renderable.id,
+]
+
+
+def populate(scene: Scene, size: int) -> None:
+    player = scene.create()
+    player.add(Position()).add(Renderable('@')).add(Player()).add(Viewshed(8))
+    player.add(CombatStats(30, 2, 5)).add(Name('Player')).add(HungerClock(HungerClock.WELL_FED, 20))
+    for i in range(size - 1):
+        entity = scene.create()
+        entity.add(Position(i % 80, i // 80))
+        if i % 10 == 0:
+            entity.add(Renderable('G')).add(Monster()).add(Viewshed(8)).add(BlocksTile())
+            entity.add(CombatStats(16, 1, 4)).add(Name('Goblin')).add(GUIDescription())
+        elif i % 10 < 4:
+            entity.add(Renderable('!')).add(Item()).add(Name('Potion')).add(GUIDescription())
+        else:
+            entity.add(Renderable('░')).add(ParticleLifetime(2))
+
+
+def linearFilter(entities: set[Entity], signature: int) -> set[Entity]:
+    return set(filter(lambda e: (e.signature & signature) == signature, entities))
+
+
+# every added or removed component updates each cached query, so the churn costs more as the queries grow
+def churnFrame(entities: list[Entity]) -> None:
+    for entity in entities:
+        entity.add(WantsToMelee(entity))
+    for entity in entities:
+        entity.remove(WantsToMelee.id)
+
+
+def measure(function) -> float:
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        function()
+    return (time.perf_counter() - start) / FRAMES
+
+
+def main():
+    print(f"{'entities':>10} {'linear (ms/frame)':>18} {'indexed (ms/frame)':>19} {'speedup':>8}")
+    for size in SIZES:
+        scene = Scene()
+        populate(scene, size)
+
+        def linearFrame():
+            for signature in FRAME_QUERIES:
+                linearFilter(scene.entities, signature)
+
+        def indexedFrame():
+            for signature in FRAME_QUERIES:
+                scene.filter(signature)
+
+        indexedFrame()  # builds the indexes, as the first game frame does
+        linear = measure(linearFrame)
+        indexed = measure(indexedFrame)
+        print(f"{size:>10} {linear * 1000:>18.3f} {indexed * 1000:>19.3f} {linear / indexed:>7.1f}x")
+
+    print(f"\n{'entities':>10} {'churn, no queries':>18} {'churn, indexed':>19} {'cost':>8}  ({CHURN} entities add and remove a component per frame, ms/frame)")
+    for size in SIZES:
+        scene = Scene()
+        populate(scene, size)
+        churned = list(scene.entities)[:CHURN]
+        bare = measure(lambda: churnFrame(churned))
+        for signature in FRAME_QUERIES:
+            scene.filter(signature)
+        indexed = measure(lambda: churnFrame(churned))
+        print(f"{size:>10} {bare * 1000:>18.3f} {indexed * 1000:>19.3f} {indexed / bare:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
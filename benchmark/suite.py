@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import getopt
+import platform
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from typing import Callable
+
+from algorithms import Direction, FieldOfView, PathFinding, Point, Random, plotLine
+from component import BlocksTile, CombatStats, HungerClock, Item, Monster, Name, Player, Position, Renderable, Viewshed
+from core import ECS, Scene
+from device import Device, Font
+from map import Map, TileType
+from mapRenderer import drawMapBackground
+from map_builders.BSPMap import BSPDungeonBuilder
+from map_builders.mapBuilder import MapBuilder
+from screen import Screen
+from benchmark.queryBenchmark import FRAME_QUERIES
+from benchmark.timing import calibration, measure
+
+# micro-benchmarks of the algorithms and the map, compared against a stored baseline:
+#   python -m benchmark.suite              measures and checks against benchmark/baseline.json
+#   python -m benchmark.suite -u           measures and stores the results as the new baseline
+# times are divided by a pure python calibration loop, so a baseline taken on another machine still compares
+
+BASELINE_FILE_NAME = os.path.join(os.path.dirname(__file__), "baseline.json")
+MAP_SIZES = [(40, 25), (80, 50), (160, 100)]
+ENTITY_COUNTS = [100, 1000, 10000]
+SCENE_LOOKUPS = 1000
+FOV_RADIUS = 8
+PATH_DISTANCE = 16
+
+Case = tuple[str, Callable[[], Callable[[], object]]]
+maps: dict[tuple[int, int], tuple[Map, Point]] = dict()
+
+
+# built once per size, the cases only read it
+def buildMap(width: int, height: int) -> tuple[Map, Point]:
+    if (width, height) not in maps:
+        builder = BSPDungeonBuilder()
+        builder.name = "Benchmark"
+        map, start = builder.build(width, height, 1, Random(width * height))
+        map.populateBlocked()
+        maps[(width, height)] = (map, start)
+    return maps[(width, height)]
+
+
+def pathTarget(map: Map, start: Point) -> Point:
+    floors = [point for point, tile in map.tiles.items() if tile != TileType.Wall]
+    return min(floors, key=lambda point: (abs(point.distanceDiamond(start) - PATH_DISTANCE), point.x, point.y))
+
+
+def fieldOfViewCase(angle: str, format: str, width: int, height: int) -> Callable[[], object]:
+    map, start = buildMap(width, height)
+    fieldOfView = FieldOfView(FOV_RADIUS, map.isOpaque)
+    fieldOfView.angleOfView = angle
+    fieldOfView.formatOfView = format
+    return lambda: fieldOfView.rayCasting(start, Direction.Up)
+
+
+def pathFindingCase(width: int, height: int) -> Callable[[], object]:
+    map, start = buildMap(width, height)
+    target = pathTarget(map, start)
+    pathFinding = PathFinding(lambda point: point not in map.blocked, Direction.All)
+    return lambda: pathFinding.searchPath(start, target)
+
+
+def plotLineCase(width: int, height: int) -> Callable[[], object]:
+    start = Point(0, 0)
+    end = Point(width - 1, height - 1)
+    return lambda: plotLine(start, end)
+
+
+def populate(size: int) -> Scene:
+    scene = Scene()
+    for i in range(size):
+        entity = scene.create()
+        entity.add(Position(i % 80, i // 80)).add(Renderable('g'))
+        if i % 10 == 0:
+            entity.add(Monster()).add(Viewshed(8)).add(BlocksTile()).add(CombatStats(16, 1, 4)).add(Name('Goblin'))
+        elif i % 10 < 4:
+            entity.add(Item()).add(Name('Potion'))
+    return scene
+
+
+# the queries of one frame, answered from the indexes or rebuilding them
+def filterCase(size: int, cold: bool) -> Callable[[], object]:
+    scene = populate(size)
+
+    def frameQueries():
+        if cold:
+            scene.queries.clear()
+            scene.queryViews.clear()
+        for signature in FRAME_QUERIES:
+            scene.filter(signature)
+    return frameQueries
+
+
+# the hunger clocks of one side of the turn, counted down in the columns; starving keeps a clock below zero, which counts row by row
+def countdownCase(size: int, grouped: bool | None, starving: bool = False) -> Callable[[], object]:
+    scene = Scene()
+    scene.useColumns(HungerClock, "duration", groupBy=Player.id)
+    for i in range(size):
+        entity = scene.create()
+        entity.add(HungerClock(HungerClock.NORMAL, 0 if starving and i == size - 1 else 10 ** 12))
+        if i == 0:
+            entity.add(Player())
+    return lambda: scene.countdown(HungerClock.id, "duration", grouped=grouped)
+
+
+# the scene resources read by a system, through the ECS.scene property each time or bound once as the systems do
+def sceneLookupCase(bound: bool) -> Callable[[], object]:
+    scene = Scene()
+    scene.resources.register("turn", int)
+    scene.resources.turn = 0
+    ECS.scene = scene
+
+    def lookups():
+        if bound:
+            scene = ECS.scene
+            for _ in range(SCENE_LOOKUPS):
+                scene.resources.turn
+        else:
+            for _ in range(SCENE_LOOKUPS):
+                ECS.scene.resources.turn
+    return lookups
+
+
+def cloneCase(width: int, height: int) -> Callable[[], object]:
+    map, _ = buildMap(width, height)
+    return lambda: map.clone()
+
+
+def drawMapBackgroundCase(font: Font, width: int, height: int) -> Callable[[], object]:
+    map, _ = buildMap(width, height)
+    screen = Screen(width, height, font)
+    return lambda: drawMapBackground(screen, map)
+
+
+# the builders as configured for the game, a fresh one and the same seed on every call
+def builderCase(index: int, width: int, height: int) -> Callable[[], object]:
+    return lambda: MapBuilder()._builderTable()[index].build(width, height, 1, Random(width + height))
+
+
+def cases(font: Font) -> list[Case]:
+    cases: list[Case] = [("calibration", lambda: calibration)]
+    for width, height in MAP_SIZES:
+        size = f"{width}x{height}"
+        for angle in (FieldOfView.AngleCone, FieldOfView.AngleRadial, FieldOfView.AnglePeripheral):
+            for format in (FieldOfView.FormatOctal, FieldOfView.FormatCircle, FieldOfView.FormatSquare, FieldOfView.FormatDiamond):
+                cases.append((f"FieldOfView.rayCasting[{angle},{format},{size}]", lambda angle=angle, format=format, width=width, height=height: fieldOfViewCase(angle, format, width, height)))
+        cases.append((f"PathFinding.searchPath[{size}]", lambda width=width, height=height: pathFindingCase(width, height)))
+        cases.append((f"plotLine[{size}]", lambda width=width, height=height: plotLineCase(width, height)))
+        cases.append((f"Map.clone[{size}]", lambda width=width, height=height: cloneCase(width, height)))
+        cases.append((f"drawMapBackground[{size}]", lambda width=width, height=height: drawMapBackgroundCase(font, width, height)))
+        for index, builder in enumerate(MapBuilder()._builderTable()):
+            cases.append((f"{builder.__class__.__name__}.build[{builder.name},{size}]", lambda index=index, width=width, height=height: builderCase(index, width, height)))
+    for size in ENTITY_COUNTS:
+        cases.append((f"Scene.filter[cached,{size}]", lambda size=size: filterCase(size, False)))
+        cases.append((f"Scene.filter[cold,{size}]", lambda size=size: filterCase(size, True)))
+        cases.append((f"Scene.countdown[all,{size}]", lambda size=size: countdownCase(size, None)))
+        cases.append((f"Scene.countdown[grouped,{size}]", lambda size=size: countdownCase(size, False)))
+        cases.append((f"Scene.countdown[starving,{size}]", lambda size=size: countdownCase(size, False, True)))
+    cases.append((f"ECS.scene[property,{SCENE_LOOKUPS}]", lambda: sceneLookupCase(False)))
+    cases.append((f"ECS.scene[bound,{SCENE_LOOKUPS}]", lambda: sceneLookupCase(True)))
+    return cases
+
+
+def run(select: Callable[[str], bool]) -> dict[str, float]:
+    device = Device("benchmark", width=64, height=64)
+    font = device.loadFont("./art/DejaVuSansMono-Bold.ttf", 16)
+    results: dict[str, float] = dict()
+    for name, setup in cases(font):
+        if name == "calibration" or select(name):
+            results[name] = measure(setup())
+            print(f"{name:<64} {results[name] * 1e6:>12.2f} us", file=sys.stderr)
+    return results
+
+
+# cases slower than factor times the baseline, both relative to their calibration
+def compare(results: dict[str, float], baseline: dict[str, float], factor: float) -> list[tuple[str, float]]:
+    scale = results["calibration"] / baseline["calibration"]
+    regressions: list[tuple[str, float]] = list()
+    for name, seconds in results.items():
+        if name in baseline and name != "calibration":
+            ratio = seconds / (baseline[name] * scale)
+            if ratio > factor:
+                regressions.append((name, ratio))
+    return regressions
+
+
+def save(path: str, results: dict[str, float]) -> None:
+    data = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+    with open(path, "w") as outfile:
+        json.dump(data, outfile, indent=1, sort_keys=True)
+
+
+def load(path: str) -> dict[str, float]:
+    with open(path) as infile:
+        return json.load(infile)["results"]
+
+
+if __name__ == "__main__":
+    pattern = ""
+    output = None
+    baselinePath = BASELINE_FILE_NAME
+    update = False
+    factor = 2.0
+    helpMessage = "python -m benchmark.suite -h | [-k <only cases containing>] [-o <results json>] [-b <baseline json>] [-u <store as the new baseline>] [-x <slowdown factor that fails, default 2>]"
+
+    try:
+        opts, _ = getopt.getopt(sys.argv[1:], "hk:o:b:ux:")
+    except getopt.GetoptError:
+        print(helpMessage)
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt == '-h':
+            print(helpMessage)
+            sys.exit(0)
+        if opt == '-k':
+            pattern = arg
+        if opt == '-o':
+            output = arg
+        if opt == '-b':
+            baselinePath = arg
+        if opt == '-u':
+            update = True
+        if opt == '-x':
+            factor = float(arg)
+
+    results = run(lambda name: pattern in name)
+    if output is not None:
+        save(output, results)
+    if update:
+        baseline = load(baselinePath) if pattern and os.path.exists(baselinePath) else dict()
+        baseline.update(results)
+        save(baselinePath, baseline)
+        print(f"baseline written to {baselinePath}")
+        sys.exit(0)
+
+    if not os.path.exists(baselinePath):
+        print(f"no baseline at {baselinePath}, store one with -u")
+        sys.exit(0)
+    baseline = load(baselinePath)
+    regressions = compare(results, baseline, factor)
+    if regressions:  # measured again before failing, a busy moment of the machine is not a regression
+        slow = {name for name, _ in regressions}
+        again = run(lambda name: name in slow)
+        results.update({name: min(results[name], again[name]) for name in slow})
+        results["calibration"] = min(results["calibration"], again["calibration"])
+        regressions = compare(results, baseline, factor)
+    for name in results:
+        if name not in baseline:
+            print(f"new case without baseline: {name}")
+    for name, ratio in regressions:
+        print(f"REGRESSION {name}: {ratio:.2f}x the baseline")
+    if regressions:
+        sys.exit(1)
+    print(f"{len(results)} cases within {factor}x of the baseline")
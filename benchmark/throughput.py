@@ -0,0 +1,158 @@
+import gc
+import os
+import sys
+import json
+import getopt
+import resource
+import platform
+import tracemalloc
+
+from multiprocessing import Pool
+
+from benchmark.timing import calibration, measure
+
+# whole turns through runSystems for fixed seeds, compared against a stored baseline:
+#   python -m benchmark.throughput              measures and checks against benchmark/throughput.json
+#   python -m benchmark.throughput -u           measures and stores the results as the new baseline
+# every game runs in a fresh process so the peak resident memory is its own
+#   retainedBlocks  memory blocks still allocated when the game ends against when it started, grows with leaks
+#   peakTracedKb    largest Python heap of the game, traced in a separate game that is not timed
+#   gcCollections   garbage collections during the game, they follow the container allocations
+
+BASELINE_FILE_NAME = os.path.join(os.path.dirname(__file__), "throughput.json")
+SEEDS = [1, 7, 11]
+TURNS = 400
+REPEAT = 3
+TOLERANCE = 0.25
+
+
+# runs in the worker process; the random player of headless.py, restarted when it dies
+def playSeed(task: tuple[int, int]) -> dict[str, float]:
+    from core import ECS
+    from headless import run
+
+    seed, turns = task
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    collections = sum(stats["collections"] for stats in gc.get_stats())
+    played, _, _, elapsed = run(seed, turns)
+    return {
+        "turnsPerSecond": played / elapsed,
+        "peakRSSKb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "retainedBlocks": sys.getallocatedblocks() - blocks,
+        "gcCollections": sum(stats["collections"] for stats in gc.get_stats()) - collections,
+        "turn": ECS.scene.resources.turn,
+    }
+
+
+# runs in the worker process; the same game as playSeed, tracing slows it down too much to time it
+def traceSeed(task: tuple[int, int]) -> float:
+    from headless import run
+
+    seed, turns = task
+    gc.collect()
+    tracemalloc.start()
+    run(seed, turns)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+# the fastest of REPEAT games per seed, one at a time so they do not compete for the processor
+def run(seeds: list[int], turns: int) -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = {"calibration": {"seconds": measure(calibration)}}
+    with Pool(1, maxtasksperchild=1) as pool:
+        for seed in seeds:
+            games = list(pool.imap(playSeed, [(seed, turns)] * REPEAT))
+            best = max(games, key=lambda game: game["turnsPerSecond"])
+            best["peakRSSKb"] = min(game["peakRSSKb"] for game in games)
+            best["peakTracedKb"] = pool.apply(traceSeed, ((seed, turns),))
+            results[f"seed {seed}, {turns} turns"] = best
+            print(f"seed {seed:>4} {best['turnsPerSecond']:>8.1f} turns/s {best['peakRSSKb'] / 1024:>8.1f} MB peak {best['peakTracedKb'] / 1024:>8.1f} MB traced {best['retainedBlocks']:>8} retained blocks {best['gcCollections']:>6} collections, turn {best['turn']}", file=sys.stderr)
+    return results
+
+
+# slower, larger or allocating more than the tolerance allows; the throughput is relative to the calibration
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], tolerance: float) -> list[str]:
+    scale = results["calibration"]["seconds"] / baseline["calibration"]["seconds"]
+    regressions: list[str] = list()
+    for name, metrics in results.items():
+        if name not in baseline or name == "calibration":
+            continue
+        expected = baseline[name]
+        if metrics["turn"] != expected["turn"]:
+            regressions.append(f"{name}: reached turn {metrics['turn']} instead of {expected['turn']}, the games differ and can not be compared")
+            continue
+        throughput = metrics["turnsPerSecond"] * scale
+        if throughput < expected["turnsPerSecond"] * (1 - tolerance):
+            regressions.append(f"{name}: {throughput:.1f} turns/s, baseline {expected['turnsPerSecond']:.1f}")
+        for metric in ("peakRSSKb", "peakTracedKb", "retainedBlocks", "gcCollections"):
+            if metric in expected and metrics[metric] > max(expected[metric], 1) * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {metrics[metric]}, baseline {expected[metric]}")
+    return regressions
+
+
+def save(path: str, results: dict[str, dict[str, float]]) -> None:
+    data = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+    with open(path, "w") as outfile:
+        json.dump(data, outfile, indent=1, sort_keys=True)
+
+
+def load(path: str) -> dict[str, dict[str, float]]:
+    with open(path) as infile:
+        return json.load(infile)["results"]
+
+
+if __name__ == "__main__":
+    seeds = SEEDS
+    turns = TURNS
+    output = None
+    baselinePath = BASELINE_FILE_NAME
+    update = False
+    tolerance = TOLERANCE
+    helpMessage = "python -m benchmark.throughput -h | [-s <seeds separated by commas>] [-n <turns>] [-o <results json>] [-b <baseline json>] [-u <store as the new baseline>] [-x <tolerance, default 0.25>]"
+
+    try:
+        opts, _ = getopt.getopt(sys.argv[1:], "hs:n:o:b:ux:")
+    except getopt.GetoptError:
+        print(helpMessage)
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt == '-h':
+            print(helpMessage)
+            sys.exit(0)
+        if opt == '-s':
+            seeds = [int(seed) for seed in arg.split(",")]
+        if opt == '-n':
+            turns = int(arg)
+        if opt == '-o':
+            output = arg
+        if opt == '-b':
+            baselinePath = arg
+        if opt == '-u':
+            update = True
+        if opt == '-x':
+            tolerance = float(arg)
+
+    results = run(seeds, turns)
+    if output is not None:
+        save(output, results)
+    if update:
+        save(baselinePath, results)
+        print(f"baseline written to {baselinePath}")
+        sys.exit(0)
+
+    if not os.path.exists(baselinePath):
+        print(f"no baseline at {baselinePath}, store one with -u")
+        sys.exit(0)
+    baseline = load(baselinePath)
+    for name in results:
+        if name not in baseline:
+            print(f"new case without baseline: {name}")
+    regressions = compare(results, baseline, tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"{len(results) - 1} games within {tolerance:.0%} of the baseline")
@@ -0,0 +1,39 @@
+import time
+
+from typing import Callable
+
+REPEAT = 5
+MIN_TIME = 0.02
+MAX_TIME = 0.5
+
+
+# the same work on every machine, the benchmarks divide their times by it
+def calibration() -> int:
+    total = 0
+    for i in range(10000):
+        total += i * i % 7
+    return total
+
+
+# the best of up to REPEAT runs, each long enough for the timer, in seconds per call; slow cases repeat less
+def measure(function: Callable[[], object]) -> float:
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TIME:
+            break
+        number *= 2 if elapsed <= 0 else max(2, int(MIN_TIME / elapsed * 1.2))
+    best = total = elapsed
+    for _ in range(REPEAT - 1):
+        if total >= MAX_TIME:
+            break
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+    return best / number
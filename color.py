@@ -0,0 +1,3 @@
+
+# kept apart from device so the simulation modules can import it without pygame
+Color = tuple[int, int, int, int]
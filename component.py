@@ -1,7 +1,8 @@
 
 from algorithms import Point
-from core import ECS, Component, Entity
-from device import Color
+from core import ECS, Component, Entity, Pool
+from color import Color
+from event import DamageEvent
 
 
 class Position(Component):
@@ -41,14 +42,19 @@ class Player(Component):
 
 class Viewshed(Component):
     id = ECS.nextSignature()
-    __slots__ = ["range", "visibleTiles", "dirty"]
+    __slots__ = ["range", "visibleTiles"]
 
     def __init__(self, range: int):
         super().__init__(Viewshed.id)
-        self.dirty = True
         self.range = range
         self.visibleTiles: set[Point] = set()
 
+    def __setstate__(self, state):  # saves written before change ticks carry a dirty flag
+        _, slots = state
+        slots.pop("dirty", None)
+        for name, value in slots.items():
+            setattr(self, name, value)
+
 
 class Monster(Component):
     id = ECS.nextSignature()
@@ -87,6 +93,7 @@ class CombatStats(Component):
 
 class WantsToMelee(Component):
     id = ECS.nextSignature()
+    pool = Pool()
     __slots__ = ["target"]
 
     def __init__(self, target: Entity):
@@ -94,7 +101,7 @@ class WantsToMelee(Component):
         self.target = target
 
 
-class SufferDamage(Component):
+class SufferDamage(Component):  # replaced by DamageEvent, kept so the signature bits stay stable for saves
     id = ECS.nextSignature()
     __slots__ = ["amount"]
 
@@ -137,7 +144,7 @@ class InBackpack(Component):
         self.owner = owner
 
 
-class WantsToPickupItem(Component):
+class WantsToPickupItem(Component):  # replaced by PickupEvent, kept so the signature bits stay stable for saves
     id = ECS.nextSignature()
     __slots__ = ['collectedBy', 'item']
 
@@ -149,6 +156,7 @@ class WantsToPickupItem(Component):
 
 class WantsToUseItem(Component):
     id = ECS.nextSignature()
+    pool = Pool()
     __slots__ = ['item', 'target']
 
     def __init__(self, potion: Entity, target: Point | None = None):
@@ -259,6 +267,7 @@ class WantsToRemoveItem(Component):
 
 class ParticleLifetime(Component):
     id = ECS.nextSignature()
+    pool = Pool()
     __slots__ = ['frames']
 
     def __init__(self, frames: int):
@@ -308,7 +317,7 @@ class EntryTrigger(Component):
         super().__init__(EntryTrigger.id)
 
 
-class EntityMoved(Component):
+class EntityMoved(Component):  # replaced by MoveEvent, kept so the signature bits stay stable for saves
     id = ECS.nextSignature()
 
     def __init__(self):
@@ -323,8 +332,4 @@ class SingleActivation(Component):
 
 
 def sufferDamage(victim: Entity, amount: int):
-    if victim.has(SufferDamage.id):
-        sufferDamage: SufferDamage = victim[SufferDamage.id]
-        sufferDamage.amount += amount
-    else:
-        victim.add(SufferDamage(amount))
+    ECS.scene.events.emit(DamageEvent(victim, amount))
@@ -1,17 +1,117 @@
-from typing import TypeVar, Any
+import sys
+import time
+import operator
+
+from array import array
+from collections import deque
+from collections.abc import Set
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from functools import wraps
+from itertools import compress, repeat
+from typing import Callable, TypeVar, Any
 from algorithms import Point
 
 
+T = TypeVar("T")
+
+
+class Pool:
+    __slots__ = ["free", "limit", "reset", "created", "reused", "released"]
+
+    def __init__(self, limit: int = 4096, reset: Callable[..., None] | None = None):
+        self.free: list[Any] = list()
+        self.limit = limit
+        self.reset = reset
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+
+    # recycled items are initialized again (or reset) with the same arguments the factory would receive
+    def acquire(self, factory: Callable[..., T], *args) -> T:
+        try:
+            item = self.free.pop()  # component pools are shared by worlds running on other threads
+        except IndexError:
+            self.created += 1
+            return factory(*args)
+        if self.reset is None:
+            item.__init__(*args)
+        else:
+            self.reset(item, *args)
+        self.reused += 1
+        return item
+
+    def release(self, item: Any) -> bool:
+        if len(self.free) >= self.limit:
+            return False
+        self.free.append(item)
+        self.released += 1
+        return True
+
+    def __repr__(self) -> str:
+        return f"Pool(created={self.created}, reused={self.reused}, released={self.released}, free={len(self.free)})"
+
+
 class Component:
     __slots__ = "signature"
+    pool: Pool | None = None
 
     def __init__(self, signature: int):
         self.signature = signature
 
+    @classmethod
+    def acquire(cls, *args) -> Any:
+        if cls.pool is None:
+            return cls(*args)
+        return cls.pool.acquire(cls, *args)
+
+    def release(self) -> None:
+        if self.pool is not None:
+            self.pool.release(self)
+
     def __repr__(self) -> str:
         return self.__class__.__name__
 
 
+class Event:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return self.__class__.__name__
+
+
+E = TypeVar("E", bound=Event)
+
+
+# producers emit during a turn and each consumer system drains the batch of its event type
+class EventQueue:
+    def __init__(self):
+        self.queues: dict[type, list[Event]] = dict()
+
+    # a system sharing its stage emits when the stage ends, in the order of the systems
+    def emit(self, event: Event) -> None:
+        deferToStage(self._append, event)
+
+    def _append(self, event: Event) -> None:
+        queue = self.queues.get(event.__class__)
+        if queue is None:
+            queue = self.queues[event.__class__] = list()
+        queue.append(event)
+
+    def drain(self, eventType: type[E]) -> list[E]:
+        queue = self.queues.get(eventType)
+        if not queue:
+            return []
+        self.queues[eventType] = list()
+        return queue  # type: ignore[return-value]
+
+    def pending(self, eventType: type[E]) -> list[E]:
+        return self.queues.get(eventType, [])  # type: ignore[return-value]
+
+    def clear(self) -> None:
+        self.queues.clear()
+
+
 class Context:
     def __init__(self):
         self.keys: set[str] = set()
@@ -23,21 +123,105 @@ class Context:
         self.mouseLeftPressed = False
 
 
+INDEX_BITS = 24
+INDEX_MASK = (1 << INDEX_BITS) - 1
+
+
+# a world owns the entity handles, the scene and the input context of one simulation
+class World:
+    def __init__(self):
+        self.generations = array("q")
+        self.entities: list[Entity | None] = list()
+        self.freeIndices: list[int] = list()
+        self.scene: Scene = Scene(self)
+        self.context = Context()
+        self.profiler = Profiler()
+        self.tokens: list = list()
+
+    def nextId(self, entity: "Entity") -> int:
+        if self.freeIndices:
+            index = self.freeIndices.pop()
+        else:
+            index = len(self.generations)
+            if index > INDEX_MASK:
+                raise OverflowError(f"More than {INDEX_MASK + 1} live entities")
+            self.generations.append(0)
+            self.entities.append(None)
+        self.entities[index] = entity
+        return (self.generations[index] << INDEX_BITS) | index
+
+    def releaseId(self, id: int) -> None:
+        index = id & INDEX_MASK
+        if self.isAlive(id):
+            self.generations[index] += 1
+            self.entities[index] = None
+            self.freeIndices.append(index)
+
+    def isAlive(self, id: int) -> bool:
+        index = id & INDEX_MASK
+        return index < len(self.generations) and self.generations[index] == id >> INDEX_BITS
+
+    def owns(self, entity: "Entity") -> bool:
+        return self.isAlive(entity.id) and self.entities[entity.id & INDEX_MASK] is entity
+
+    def lookup(self, id: int) -> "Entity | None":
+        return self.entities[id & INDEX_MASK] if self.isAlive(id) else None
+
+    # with world: makes it the world seen through ECS in this thread or task
+    def __enter__(self) -> "World":
+        self.tokens.append(CURRENT_WORLD.set(self))
+        return self
+
+    def __exit__(self, *exception) -> None:
+        CURRENT_WORLD.reset(self.tokens.pop())
+
+
+# component signatures are shared by every world, everything else resolves to the current world
 class EntityComponentSystem:
     def __init__(self):
         self.signature: int = 1
-        self.id: int = 0
-        self.scene: Scene
-        self.context: Context
 
     def nextSignature(self) -> int:
         current = self.signature
         self.signature = self.signature << 1
         return current
 
-    def nextId(self) -> int:
-        self.id += 1
-        return self.id
+    @property
+    def world(self) -> World:
+        return CURRENT_WORLD.get()
+
+    @property
+    def scene(self) -> "Scene":
+        return CURRENT_WORLD.get().scene
+
+    @scene.setter
+    def scene(self, scene: "Scene") -> None:
+        world = CURRENT_WORLD.get()
+        world.scene = scene
+        scene.world = world
+
+    @property
+    def context(self) -> Context:
+        return CURRENT_WORLD.get().context
+
+    @context.setter
+    def context(self, context: Context) -> None:
+        CURRENT_WORLD.get().context = context
+
+    def nextId(self, entity: "Entity") -> int:
+        return CURRENT_WORLD.get().nextId(entity)
+
+    def releaseId(self, id: int) -> None:
+        CURRENT_WORLD.get().releaseId(id)
+
+    def isAlive(self, id: int) -> bool:
+        return CURRENT_WORLD.get().isAlive(id)
+
+    def owns(self, entity: "Entity") -> bool:
+        return CURRENT_WORLD.get().owns(entity)
+
+    def lookup(self, id: int) -> "Entity | None":
+        return CURRENT_WORLD.get().lookup(id)
 
     def run(self, scene: 'Scene', context: Context) -> None:
         self.scene = scene
@@ -49,22 +233,60 @@ ECS = EntityComponentSystem()
 
 class Entity:
     def __init__(self):
-        self.id: int = ECS.nextId()
+        self.id: int = ECS.nextId(self)
         self.signature = 0
         self.components: dict[int, Component] = dict()
+        self.scene: Scene | None = None
 
     def add(self, component: Component) -> "Entity":
+        previous = self.signature
+        if self.scene is not None:
+            component = self.scene.attachComponent(self, component)
+        else:
+            current = self.components.get(component.signature)
+            if current is not None and current is not component:  # replaced, back to its pool
+                current.release()
         self.signature = component.signature | self.signature
         self.components[component.signature] = component
+        if self.scene is not None:
+            if previous != self.signature:
+                self.scene.updateIndex(self, previous)
+            else:
+                self.scene.markChanged(self, component.signature)
         return self
 
     def remove(self, signature: int):
+        previous = self.signature
         self.signature = self.signature & ~signature
-        self.components.pop(signature)
+        component = self.components.pop(signature)
+        if self.scene is not None:
+            self.scene.detachComponent(self, component)
+            self.scene.updateIndex(self, previous)
 
     def has(self, signature: int) -> bool:
         return (self.signature & signature) > 0
 
+    # reuse a destroyed entity under the same handle
+    def reset(self) -> None:
+        self.signature = 0
+        self.components.clear()
+        self.scene = None
+
+    def markChanged(self, signature: int) -> None:
+        if self.scene is not None:
+            self.scene.markChanged(self, signature)
+
+    @property
+    def index(self) -> int:
+        return self.id & INDEX_MASK
+
+    @property
+    def generation(self) -> int:
+        return self.id >> INDEX_BITS
+
+    def isAlive(self) -> bool:
+        return ECS.isAlive(self.id)
+
     T = TypeVar("T", bound=Component)
 
     def get(self, signature: int) -> Any:
@@ -79,6 +301,15 @@ class Entity:
     def __hash__(self) -> int:
         return self.id
 
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state.pop("scene", None)
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.scene = None
+
     def __repr__(self) -> str:
         representation = '{'
         first = True
@@ -92,29 +323,799 @@ class Entity:
         return representation
 
 
-class Scene:
+def _slotNames(componentType: type) -> list[str]:
+    names: list[str] = []
+    for cls in componentType.__mro__:
+        slots = cls.__dict__.get("__slots__", ())
+        names.extend([slots] if isinstance(slots, str) else slots)
+    return names
+
+
+def _columnProperty(column: array) -> property:
+    def getter(view) -> int:
+        return column[view.row]
+
+    def setter(view, value: int) -> None:
+        column[view.row] = value
+
+    return property(getter, setter)
+
+
+def _restoreComponent(componentType: type, state: dict[str, Any]) -> Component:
+    component = componentType.__new__(componentType)
+    for name, value in state.items():
+        setattr(component, name, value)
+    return component
+
+
+# rows by group, one byte each: free, taken by an entity without the groupBy components, taken by one with them
+FREE_ROW = 0
+UNGROUPED_ROW = 1
+GROUPED_ROW = 2
+SELECT_ROWS = {None: bytes([0, 1, 1]) + bytes(253), False: bytes([0, 1, 0]) + bytes(253), True: bytes([0, 0, 1]) + bytes(253)}
+
+
+class ColumnStorage:
+    def __init__(self, componentType: type, fields: tuple[str, ...], typecode: str = "q", groupBy: int = 0):
+        self.componentType = componentType
+        self.fields = fields
+        self.typecode = typecode
+        self.groupBy = groupBy
+        self.largest = (1 << (array(typecode).itemsize * 8 - (typecode.islower()))) - 1
+        self.columns: dict[str, array] = {field: array(typecode) for field in fields}
+        self.groups = bytearray()
+        self.entities: list[Entity | None] = list()
+        self.views: list[Component] = list()
+        self.free: list[int] = list()
+        self.slots = [name for name in _slotNames(componentType) if name not in fields]
+
+        def reduce(view) -> tuple:
+            state = {name: getattr(view, name) for name in self.slots + list(self.fields)}
+            return (_restoreComponent, (componentType, state))
+
+        namespace: dict[str, Any] = {
+            "__slots__": ("row",),
+            "__reduce__": reduce,
+            "__module__": componentType.__module__,
+            "__qualname__": componentType.__qualname__,
+        }
+        for field in fields:
+            namespace[field] = _columnProperty(self.columns[field])
+        self.viewType = type(componentType.__name__, (componentType,), namespace)
+
+    def attach(self, entity: Entity, component: Component) -> Component:
+        if self.free:
+            row = self.free.pop()
+        else:
+            row = len(self.entities)
+            for column in self.columns.values():
+                column.append(0)
+            view = self.viewType.__new__(self.viewType)
+            view.row = row
+            self.views.append(view)
+            self.entities.append(None)
+            self.groups.append(FREE_ROW)
+        view = self.views[row]
+        for name in self.slots:
+            setattr(view, name, getattr(component, name))
+        for field in self.fields:
+            self.columns[field][row] = getattr(component, field)
+        self.entities[row] = entity
+        self.regroup(view, entity.signature)
+        return view
+
+    def release(self, view: Component) -> None:
+        if view.__class__ is self.viewType:
+            self.entities[view.row] = None
+            self.groups[view.row] = FREE_ROW
+            for column in self.columns.values():
+                column[view.row] = self.largest
+            self.free.append(view.row)
+
+    # the entity of the view gained or lost groupBy components
+    def regroup(self, view: Component, signature: int) -> None:
+        if view.__class__ is self.viewType:
+            grouped = self.groupBy != 0 and (signature & self.groupBy) == self.groupBy
+            self.groups[view.row] = GROUPED_ROW if grouped else UNGROUPED_ROW
+
+    def column(self, field: str) -> array:
+        return self.columns[field]
+
+    # subtracts from the taken rows, only the grouped or ungrouped ones when grouped is given, and returns the entities that reached zero
+    def countdown(self, field: str, amount: int = 1, grouped: bool | None = None) -> list[Entity]:
+        column = self.columns[field]
+        selected = self.groups.translate(SELECT_ROWS[grouped])
+        if 0 < amount < min(column, default=amount + 1):  # free rows hold the largest value, most calls end here
+            self.subtract(column, selected, amount)
+            return []
+        # some row reaches zero or stays below it, row by row
+        deltas = selected if amount == 1 else map(amount.__mul__, selected)
+        column[:] = array(self.typecode, list(map(operator.sub, column, deltas)))
+        if min(column, default=1) > 0:
+            return []
+        return list(compress(self.entities, map(operator.and_, selected, map(operator.le, column, repeat(0)))))
+
+    # the column as one number with a row per digit: no row goes below zero, so none borrows from the next and one subtraction does them all
+    def subtract(self, column: array, selected: bytes, amount: int) -> None:
+        size = column.itemsize
+        deltas = bytearray(len(selected) * size)
+        deltas[0 if sys.byteorder == "little" else size - 1::size] = selected
+        total = int.from_bytes(column, sys.byteorder) - int.from_bytes(deltas, sys.byteorder) * amount
+        column[:] = array(self.typecode, total.to_bytes(len(deltas), sys.byteorder))
+
+    def below(self, field: str, threshold: int) -> list[Entity]:
+        return [entity for entity in compress(self.entities, map(threshold.__gt__, self.columns[field])) if entity is not None]
+
+
+# parent -> children index for components that point at their parent (owner -> backpack items), optionally keyed by a field (slot)
+class Relation:
+    def __init__(self, componentType: type, field: str, key: str | None = None):
+        self.componentType = componentType
+        self.field = field
+        self.key = key
+        self.children: dict[Entity, dict[Any, Entity]] = dict()
+
+    def link(self, entity: Entity, component: Component) -> None:
+        parent = getattr(component, self.field)
+        key = entity if self.key is None else getattr(component, self.key)
+        self.children.setdefault(parent, dict())[key] = entity
+
+    def unlink(self, entity: Entity, component: Component) -> None:
+        parent = getattr(component, self.field)
+        key = entity if self.key is None else getattr(component, self.key)
+        children = self.children.get(parent)
+        if children is not None and children.get(key) is entity:
+            del children[key]
+            if not children:
+                del self.children[parent]
+
+    def of(self, parent: Entity) -> list[Entity]:
+        children = self.children.get(parent)
+        return list(children.values()) if children is not None else []
+
+    def get(self, parent: Entity, key: Any) -> Entity | None:
+        children = self.children.get(parent)
+        return children.get(key) if children is not None else None
+
+
+class CommandBuffer:
+    def __init__(self, scene: "Scene"):
+        self.scene = scene
+        self.commands: list[tuple[Callable[..., None], tuple]] = list()
+
+    def create(self, pool: Pool | None = None) -> Entity:
+        entity = Entity() if pool is None else pool.acquire(Entity)
+        self._record(self.scene.adopt, (entity,))
+        return entity
+
+    # entities destroyed into a pool keep their handle, pools must be built with reset=Entity.reset
+    def destroy(self, entity: Entity, pool: Pool | None = None) -> None:
+        self._record(self._destroy, (entity, pool))
+
+    def add(self, entity: Entity, component: Component) -> None:
+        self._record(self._add, (entity, component))
+
+    def remove(self, entity: Entity, signature: int) -> None:
+        self._record(self._remove, (entity, signature))
+
+    # systems sharing a stage queue their commands when it ends, in the order of the systems, whatever thread ran them
+    def _record(self, command: Callable[..., None], arguments: tuple) -> None:
+        deferToStage(self.commands.append, (command, arguments))
+
+    def pending(self, entity: Entity, signature: int) -> Any:
+        output = STAGE_OUTPUT.get() or []
+        queued = self.commands + [arguments[0] for function, arguments in output if function == self.commands.append]
+        for command, arguments in reversed(queued):
+            if command == self._add and arguments[0] is entity and arguments[1].signature == signature:
+                return arguments[1]
+        return None
+
+    def flush(self) -> None:
+        commands = self.commands
+        self.commands = list()
+        for command, arguments in commands:
+            command(*arguments)
+
+    def _destroy(self, entity: Entity, pool: Pool | None) -> None:
+        if entity.scene is self.scene:
+            self.scene.destroy(entity, releaseId=pool is None)
+            if pool is not None and not pool.release(entity):
+                self.scene.world.releaseId(entity.id)
+
+    def _add(self, entity: Entity, component: Component) -> None:
+        if entity.scene is self.scene:
+            entity.add(component)
+
+    def _remove(self, entity: Entity, signature: int) -> None:
+        if entity.scene is self.scene and signature in entity.components:
+            entity.remove(signature)
+
+
+FAST_RESOURCES = ("map", "player", "random", "turn")
+
+
+# the entities matching a query, read-only and kept current by the scene: iterating it while components are added or removed
+# directly (not through the commands) needs a snapshot, list(query)
+class Query(Set):
+    __slots__ = ["matches"]
+
+    def __init__(self, matches: set[Entity]):
+        self.matches = matches
+
+    def __contains__(self, entity: object) -> bool:
+        return entity in self.matches
+
+    def __iter__(self):
+        return iter(self.matches)
+
+    def __len__(self) -> int:
+        return len(self.matches)
+
+    # set operations give plain sets, they are not kept current
+    @classmethod
+    def _from_iterable(cls, iterable) -> set[Entity]:
+        return set(iterable)
+
+
+# every resource is registered with its type before it is stored, the hot ones live in slots
+class Resources:
+    __slots__ = FAST_RESOURCES + ("types", "values")
+
     def __init__(self):
+        object.__setattr__(self, "types", dict())
+        object.__setattr__(self, "values", dict())
+
+    def register(self, name: str, resourceType: type, value: Any = None) -> None:
+        if not name.isidentifier() or name in ("types", "values") or hasattr(Resources, name) and name not in FAST_RESOURCES:
+            raise ValueError(f"Invalid resource name: {name}")
+        current = self.types.get(name)
+        if current is not None and current is not resourceType:
+            raise TypeError(f"Resource {name} is already registered as {current.__name__}")
+        self.types[name] = resourceType
+        if value is not None:
+            setattr(self, name, value)
+
+    def isRegistered(self, name: str) -> bool:
+        return name in self.types
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        resourceType = self.types.get(name)
+        if resourceType is None:
+            raise AttributeError(f"Resource {name} is not registered")
+        if not isinstance(value, resourceType):
+            raise TypeError(f"Resource {name} expects {resourceType.__name__}, got {value.__class__.__name__}")
+        if name in FAST_RESOURCES:
+            object.__setattr__(self, name, value)
+        else:
+            self.values[name] = value
+
+    def __delattr__(self, name: str) -> None:
+        if name in FAST_RESOURCES:
+            object.__delattr__(self, name)
+        elif name in self.values:
+            del self.values[name]
+        else:
+            raise AttributeError(f"Resource {name} is not stored")
+
+    # only reached for resources outside the slots, or slots not stored yet
+    def __getattr__(self, name: str) -> Any:
+        values = object.__getattribute__(self, "values")
+        if name in values:
+            return values[name]
+        if name in object.__getattribute__(self, "types"):
+            raise AttributeError(f"Resource {name} is not stored yet")
+        raise AttributeError(f"Resource {name} is not registered")
+
+
+class Scene:
+    def __init__(self, world: World | None = None):
+        self.world: World = world if world is not None else CURRENT_WORLD.get()
         self.entities: set[Entity] = set()
-        self.memory: dict[str, Any] = dict()
+        self.resources = Resources()
+        self.queries: dict[int, set[Entity]] = dict()
+        self.queryViews: dict[int, Query] = dict()  # what filter returns, over the sets in queries
+        self.storages: dict[int, ColumnStorage] = dict()
+        self.groupedStorages: list[ColumnStorage] = list()  # the storages with groupBy, their rows follow the entities' signatures
+        self.relations: dict[int, Relation] = dict()
+        self.commands = CommandBuffer(self)
+        self.events = EventQueue()
+        self.pools: dict[str, Pool] = dict()
+        self.tick = 0
+        self.lastRuns: dict[str, int] = dict()
+        self.additions: dict[int, dict[Entity, int]] = dict()
+        self.changes: dict[int, dict[Entity, int]] = dict()
+        self.removals: dict[int, dict[Entity, int]] = dict()
 
     def create(self):
         entity = Entity()
-        self.entities.add(entity)
+        self.adopt(entity)
         return entity
 
-    def destroy(self, entity: Entity):
+    def adopt(self, entity: Entity):
+        entity.scene = self
+        self.entities.add(entity)
+        for signature, component in entity.components.items():
+            storage = self.storages.get(signature)
+            if storage is not None:
+                entity.components[signature] = self._attachColumns(storage, entity, component)
+            relation = self.relations.get(signature)
+            if relation is not None:
+                relation.link(entity, component)
+        for signature, matches in self.queries.items():
+            if (entity.signature & signature) == signature:
+                matches.add(entity)
+        self._record(self.additions, entity, entity.signature)
+
+    def flush(self):
+        self.commands.flush()
+
+    # pooled entities keep handles of this scene's world, so each scene has its own entity pools
+    def entityPool(self, name: str) -> Pool:
+        pool = self.pools.get(name)
+        if pool is None:
+            pool = self.pools[name] = Pool(reset=Entity.reset)
+        return pool
+
+    def destroy(self, entity: Entity, releaseId: bool = True):
         self.entities.remove(entity)
+        if releaseId:
+            self.world.releaseId(entity.id)
+        entity.scene = None
+        # the rows and pooled components go to other entities, the destroyed one must not reach them anymore
+        components, signature = entity.components, entity.signature
+        entity.components = dict()
+        entity.signature = 0
+        for component in components.values():
+            self.detachComponent(entity, component)
+        for query, matches in self.queries.items():
+            if (signature & query) == query:
+                matches.discard(entity)
+        self._forget(entity, signature)
+        self._record(self.removals, entity, signature)
+
+    def clear(self):
+        for entity in self.entities:
+            entity.scene = None
+            self.world.releaseId(entity.id)
+        self.entities.clear()
+        for matches in self.queries.values():
+            matches.clear()
+        self._resetStorages()
+        self._resetRelations()
+        self._resetChanges()
+        self.events.clear()
+
+    def setEntities(self, entities: set[Entity]):
+        for entity in entities:
+            if not self.world.owns(entity):  # loaded from a save, its handle belongs to another session
+                entity.id = self.world.nextId(entity)
+        entities = set(entities)
+        for entity in self.entities:
+            entity.scene = None
+            if entity not in entities:
+                self.world.releaseId(entity.id)
+        self.entities = entities
+        self._resetStorages()
+        self._resetRelations()
+        for entity in entities:
+            entity.scene = self
+            for signature, component in entity.components.items():
+                storage = self.storages.get(signature)
+                if storage is not None:
+                    entity.components[signature] = storage.attach(entity, component)
+                relation = self.relations.get(signature)
+                if relation is not None:
+                    relation.link(entity, component)
+        self.queries.clear()
+        self.queryViews.clear()
+        self._resetChanges()
+
+    # groupBy splits the rows by the components of their entities, countdown can then run over one of the groups
+    def useColumns(self, componentType: type, *fields: str, groupBy: int = 0):
+        storage = ColumnStorage(componentType, fields, groupBy=groupBy)
+        self.storages[componentType.id] = storage
+        if groupBy:
+            self.groupedStorages.append(storage)
+        for entity in self.entities:
+            if entity.has(componentType.id):
+                entity.components[componentType.id] = storage.attach(entity, entity.components[componentType.id])
+
+    def columns(self, signature: int) -> ColumnStorage | None:
+        return self.storages.get(signature)
+
+    # the parent field of a related component must not be reassigned in place, replace the component instead
+    def useRelation(self, componentType: type, field: str, key: str | None = None):
+        relation = Relation(componentType, field, key)
+        self.relations[componentType.id] = relation
+        for entity in self.entities:
+            if entity.has(componentType.id):
+                relation.link(entity, entity.components[componentType.id])
+
+    def children(self, signature: int, parent: Entity) -> list[Entity]:
+        return self.relations[signature].of(parent)
+
+    def child(self, signature: int, parent: Entity, key: Any) -> Entity | None:
+        return self.relations[signature].get(parent, key)
+
+    def attachComponent(self, entity: Entity, component: Component) -> Component:
+        current = entity.components.get(component.signature)
+        relation = self.relations.get(component.signature)
+        if relation is not None:
+            if current is not None:
+                relation.unlink(entity, current)
+            relation.link(entity, component)
+        storage = self.storages.get(component.signature)
+        if storage is None:
+            if current is not None and current is not component:  # replaced, back to its pool as removed ones are
+                current.release()
+            return component
+        if current is not None:
+            storage.release(current)
+        return self._attachColumns(storage, entity, component)
+
+    def detachComponent(self, entity: Entity, component: Component):
+        relation = self.relations.get(component.signature)
+        if relation is not None:
+            relation.unlink(entity, component)
+        storage = self.storages.get(component.signature)
+        if storage is not None:
+            storage.release(component)
+        elif component.pool is not None:
+            component.pool.release(component)
+
+    # the column view replaces the component, which goes back to its pool once its values are copied
+    def _attachColumns(self, storage: ColumnStorage, entity: Entity, component: Component) -> Component:
+        view = storage.attach(entity, component)
+        if component.pool is not None and component.__class__ is storage.componentType:
+            component.pool.release(component)
+        return view
+
+    def _resetStorages(self):
+        for signature, storage in self.storages.items():
+            self.storages[signature] = ColumnStorage(storage.componentType, storage.fields, storage.typecode, storage.groupBy)
+        self.groupedStorages = [storage for storage in self.storages.values() if storage.groupBy]
+
+    def _resetRelations(self):
+        for signature, relation in self.relations.items():
+            self.relations[signature] = Relation(relation.componentType, relation.field, relation.key)
+
+    # grouped needs the groupBy of useColumns, without columns it counts down every entity with the component
+    def countdown(self, signature: int, field: str, amount: int = 1, grouped: bool | None = None) -> list[Entity]:
+        storage = self.storages.get(signature)
+        if storage is not None:
+            return storage.countdown(field, amount, grouped)
+        if grouped is not None:
+            raise ValueError("A grouped countdown needs the component in columns with groupBy")
+        expired: list[Entity] = list()
+        for entity in self.filter(signature):
+            component = entity[signature]
+            value = getattr(component, field) - amount
+            setattr(component, field, value)
+            if value <= 0:
+                expired.append(entity)
+        return expired
+
+    def below(self, signature: int, field: str, threshold: int) -> list[Entity]:
+        storage = self.storages.get(signature)
+        if storage is not None:
+            return storage.below(field, threshold)
+        return [entity for entity in self.filter(signature) if getattr(entity[signature], field) < threshold]
+
+    def updateIndex(self, entity: Entity, previous: int):
+        current = entity.signature
+        for storage in self.groupedStorages:
+            if (previous ^ current) & storage.groupBy and current & storage.componentType.id:
+                storage.regroup(entity.components[storage.componentType.id], current)
+        for signature, matches in self.queries.items():
+            before = (previous & signature) == signature
+            after = (current & signature) == signature
+            if after and not before:
+                matches.add(entity)
+            elif before and not after:
+                matches.discard(entity)
+        self._record(self.additions, entity, current & ~previous)
+        if previous & ~current:
+            self._forget(entity, previous & ~current)
+            self._record(self.removals, entity, previous & ~current)
+
+    # a system calls checkpoint once per run and asks for the changes made since the tick it returns,
+    # a negative tick means there is no history (first run or the entities were replaced)
+    def checkpoint(self, name: str) -> int:
+        since = self.lastRuns.get(name, -1)
+        oldest = min(self.lastRuns.values()) if since >= 0 else -1
+        self.tick += 1
+        self.lastRuns[name] = self.tick
+        for log in (self.additions, self.changes, self.removals):
+            for entries in log.values():
+                while entries:
+                    entity = next(iter(entries))
+                    if entries[entity] >= oldest:
+                        break
+                    del entries[entity]
+        return since
+
+    def markChanged(self, entity: Entity, signature: int) -> None:
+        self._record(self.changes, entity, signature)
+
+    def added(self, signature: int, since: int) -> list[Entity]:
+        return self._since(self.additions, signature, since)
+
+    def changed(self, signature: int, since: int) -> list[Entity]:
+        return self._since(self.changes, signature, since)
+
+    def removed(self, signature: int, since: int) -> list[Entity]:
+        return self._since(self.removals, signature, since)
+
+    def _since(self, log: dict[int, dict[Entity, int]], signature: int, since: int) -> list[Entity]:
+        entries = log.get(signature)
+        if entries is None:
+            return list()
+        result: list[Entity] = list()
+        for entity, tick in reversed(entries.items()):
+            if tick < since:
+                break
+            result.append(entity)
+        result.reverse()
+        return result
 
-    def filter(self, *signatures: int) -> set[Entity]:
+    def _record(self, log: dict[int, dict[Entity, int]], entity: Entity, signature: int) -> None:
+        while signature:
+            bit = signature & -signature
+            signature ^= bit
+            entries = log.get(bit)
+            if entries is None:
+                entries = log[bit] = dict()
+            entries.pop(entity, None)
+            entries[entity] = self.tick
+
+    def _forget(self, entity: Entity, signature: int) -> None:
+        while signature:
+            bit = signature & -signature
+            signature ^= bit
+            for log in (self.additions, self.changes):
+                entries = log.get(bit)
+                if entries is not None:
+                    entries.pop(entity, None)
+
+    def _resetChanges(self):
+        self.lastRuns.clear()
+        self.additions.clear()
+        self.changes.clear()
+        self.removals.clear()
+
+    def filter(self, *signatures: int) -> Query:
         signature = 0
         for sign in signatures:
             signature = signature | sign
-        return set(
-            filter(lambda e: (e.signature & signature) == signature, self.entities)
-        )
+        query = self.queryViews.get(signature)
+        if query is None:
+            matches = set(filter(lambda e: (e.signature & signature) == signature, self.entities))
+            self.queries[signature] = matches
+            query = self.queryViews[signature] = Query(matches)
+        return query
 
     def store(self, label: str, data):
-        self.memory[label] = data
+        setattr(self.resources, label, data)
 
     def retrieve(self, label: str) -> Any:
-        return self.memory[label]
+        return getattr(self.resources, label)
+
+
+# the output of a system sharing its stage (log lines and the like), kept apart and applied when the stage ends
+STAGE_OUTPUT: ContextVar[list[tuple[Callable[..., None], tuple]] | None] = ContextVar("stage output", default=None)
+
+
+# runs the function now, or at the end of the stage when the system calling it shares one
+def deferToStage(function: Callable[..., None], *arguments) -> None:
+    output = STAGE_OUTPUT.get()
+    if output is None:
+        function(*arguments)
+    else:
+        output.append((function, arguments))
+
+
+def runDeferring(run: Callable[[], None], output: list[tuple[Callable[..., None], tuple]]) -> None:
+    token = STAGE_OUTPUT.set(output)
+    try:
+        run()
+    finally:
+        STAGE_OUTPUT.reset(token)
+
+
+class ScheduledSystem:
+    __slots__ = ["run", "name", "reads", "writes", "readResources", "writeResources", "emits", "condition"]
+
+    def __init__(self, run: Callable[[], None], reads: int, writes: int, readResources: tuple[str, ...], writeResources: tuple[str, ...], emits: tuple[str, ...], condition: Callable[[], bool] | None):
+        self.run = run
+        self.name: str = run.__name__
+        self.reads = reads
+        self.writes = writes
+        self.readResources = frozenset(readResources)
+        self.writeResources = frozenset(writeResources)
+        self.emits = frozenset(emits)
+        self.condition = condition
+
+    # other runs after self; what other emits lands when the stage ends, after self read it, as if run in order
+    def conflicts(self, other: "ScheduledSystem") -> bool:
+        if self.writes & (other.reads | other.writes) or other.writes & self.reads:
+            return True
+        if not self.writeResources.isdisjoint(other.readResources | other.writeResources):
+            return True
+        if not self.emits.isdisjoint(other.readResources | other.writeResources):
+            return True
+        return not other.writeResources.isdisjoint(self.readResources)
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+class Scheduler:
+    def __init__(self, workers: int = 0):
+        self.systems: list[ScheduledSystem] = list()
+        self.stages: list[list[ScheduledSystem]] = list()
+        self.executor = ThreadPoolExecutor(workers) if workers > 1 else None
+        self.lastTimes: list[float] = list()
+        self.totalTimes: list[float] = list()
+        self.runs = 0
+
+    # reads and writes are component signatures, resources name the scene data a system touches,
+    # emits names the event queues it only appends to, which systems sharing a stage do in turn when it ends
+    def add(self, system: Callable[[], None], reads: int = 0, writes: int = 0,
+            readResources: tuple[str, ...] = (), writeResources: tuple[str, ...] = (),
+            emits: tuple[str, ...] = (), condition: Callable[[], bool] | None = None) -> "Scheduler":
+        self.systems.append(ScheduledSystem(system, reads, writes, readResources, writeResources, emits, condition))
+        self.stages.clear()
+        return self
+
+    def build(self) -> list[list[ScheduledSystem]]:
+        levels: list[int] = list()
+        for i, system in enumerate(self.systems):
+            level = 0
+            for j in range(i):
+                if self.systems[j].conflicts(system):
+                    level = max(level, levels[j] + 1)
+            levels.append(level)
+        self.stages = [list() for _ in range(max(levels) + 1)] if levels else list()
+        for system, level in zip(self.systems, levels):
+            self.stages[level].append(system)
+        self.lastTimes = [0.0] * len(self.stages)
+        self.totalTimes = [0.0] * len(self.stages)
+        self.runs = 0
+        return self.stages
+
+    def run(self, scene: "Scene") -> None:
+        if not self.stages:
+            self.build()
+        scene.flush()
+        for index, stage in enumerate(self.stages):
+            start = time.perf_counter()
+            active = [system for system in stage if system.condition is None or system.condition()]
+            if len(active) > 1:
+                outputs: list[list[tuple[Callable[..., None], tuple]]] = [list() for _ in active]
+                if self.executor is not None:
+                    for future in [self.executor.submit(copy_context().run, runDeferring, system.run, output) for system, output in zip(active, outputs)]:
+                        future.result()
+                else:
+                    for system, output in zip(active, outputs):
+                        runDeferring(system.run, output)
+                for output in outputs:  # in the order the systems were added, whatever thread ran them
+                    for function, arguments in output:
+                        function(*arguments)
+            else:
+                for system in active:
+                    system.run()
+            scene.flush()
+            elapsed = time.perf_counter() - start
+            self.lastTimes[index] = elapsed
+            self.totalTimes[index] += elapsed
+        self.runs += 1
+
+    def report(self) -> str:
+        lines = [f"{'stage':<6} {'last (ms)':>10} {'mean (ms)':>10}  systems"]
+        for index, stage in enumerate(self.stages):
+            mean = self.totalTimes[index] / self.runs if self.runs else 0.0
+            names = ", ".join(system.name for system in stage)
+            lines.append(f"{index:<6} {self.lastTimes[index] * 1000:>10.3f} {mean * 1000:>10.3f}  {names}")
+        return "\n".join(lines)
+
+
+class Timing:
+    __slots__ = ["name", "durations", "entities", "calls"]
+
+    def __init__(self, name: str, window: int):
+        self.name = name
+        self.durations: deque[float] = deque(maxlen=window)
+        self.entities: deque[int] = deque(maxlen=window)
+        self.calls = 0
+
+    def record(self, duration: float, entities: int) -> None:
+        self.durations.append(duration)
+        self.entities.append(entities)
+        self.calls += 1
+
+    def percentile(self, fraction: float) -> float:
+        durations = sorted(self.durations)
+        if not durations:
+            return 0.0
+        return durations[min(len(durations) - 1, int(fraction * len(durations)))]
+
+
+# rolling timings over the last window calls of every profiled function, each world keeps its own
+class Profiler:
+    def __init__(self, window: int = 600):
+        self.window = window
+        self.enabled = True
+        self.timings: dict[str, Timing] = dict()
+
+    def timing(self, name: str) -> Timing:
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = Timing(name, self.window)
+        return timing
+
+    def reset(self) -> None:
+        for timing in self.timings.values():
+            timing.durations.clear()
+            timing.entities.clear()
+            timing.calls = 0
+
+    def report(self) -> str:
+        lines = [f"{'function':<24} {'calls':>7} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9} {'entities':>9}"]
+        for timing in sorted(self.timings.values(), key=lambda timing: timing.percentile(0.95), reverse=True):
+            if not timing.durations:
+                continue
+            entities = sum(timing.entities) // len(timing.entities)
+            lines.append(f"{timing.name:<24} {timing.calls:>7} {timing.percentile(0.5) * 1000:>9.3f} {timing.percentile(0.95) * 1000:>9.3f}"
+                         f" {timing.percentile(0.99) * 1000:>9.3f} {max(timing.durations) * 1000:>9.3f} {entities:>9}")
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> None:
+        with open(path, "a") as outfile:
+            outfile.write(time.strftime("%Y-%m-%d %H:%M:%S") + "\n" + self.report() + "\n\n")
+
+
+# the profiler of the world seen in this thread or task, a profiled function records in the world that called it
+class WorldProfiler:
+    def profile(self, function: Callable[..., T]) -> Callable[..., T]:
+        name = function.__qualname__
+
+        @wraps(function)
+        def profiled(*args, **kwargs):
+            world = CURRENT_WORLD.get()
+            profiler = world.profiler
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.timing(name).record(time.perf_counter() - start, len(world.scene.entities))
+
+        return profiled
+
+    @property
+    def enabled(self) -> bool:
+        return CURRENT_WORLD.get().profiler.enabled
+
+    @enabled.setter
+    def enabled(self, enabled: bool) -> None:
+        CURRENT_WORLD.get().profiler.enabled = enabled
+
+    def timing(self, name: str) -> Timing:
+        return CURRENT_WORLD.get().profiler.timing(name)
+
+    def reset(self) -> None:
+        CURRENT_WORLD.get().profiler.reset()
+
+    def report(self) -> str:
+        return CURRENT_WORLD.get().profiler.report()
+
+    def dump(self, path: str) -> None:
+        CURRENT_WORLD.get().profiler.dump(path)
+
+
+PROFILER = WorldProfiler()
+
+
+# the default world serves single game processes that never create one
+CURRENT_WORLD: ContextVar[World] = ContextVar("world", default=World())
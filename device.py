@@ -4,8 +4,7 @@ from typing import Callable
 import pygame
 import pygame.freetype
 
-
-Color = tuple[int, int, int, int]
+from color import Color
 
 
 class DeviceError(Exception):
@@ -0,0 +1,24 @@
+from core import Entity, Event
+
+
+class MoveEvent(Event):
+    __slots__ = ["entity"]
+
+    def __init__(self, entity: Entity):
+        self.entity = entity
+
+
+class DamageEvent(Event):
+    __slots__ = ["target", "amount"]
+
+    def __init__(self, target: Entity, amount: int):
+        self.target = target
+        self.amount = amount
+
+
+class PickupEvent(Event):
+    __slots__ = ["collector", "item"]
+
+    def __init__(self, collector: Entity, item: Entity):
+        self.collector = collector
+        self.item = item
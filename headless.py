@@ -0,0 +1,153 @@
+import sys
+import time
+import getopt
+
+from typing import Iterator
+
+from algorithms import Random
+from core import ECS, PROFILER
+from replay import Replay, ReplayInput, fingerprint
+from runState import RunState
+from simulation import MENU_STATES, cancelMenu, createScene, restart, simulate, startGame
+from system.particleSystem import cullDeadParticles
+from utils import Logger
+
+import map_builders.mapBuilderBase
+import system.mapIndexSystem
+
+# the game without a window: keys come from a script or a seeded random player, no save file is written
+
+INPUT_KEYS = ["h", "j", "k", "l", "y", "u", "b", "n", "g", "space", "."]
+
+
+def randomInput(seed: int) -> Iterator[str]:
+    rand = Random(seed)
+    while True:
+        yield rand.choice(INPUT_KEYS)
+
+
+# one key per whitespace separated word, repeated when the script ends
+def scriptedInput(path: str) -> Iterator[str]:
+    with open(path) as infile:
+        keys = infile.read().split()
+    if not keys:
+        raise ValueError(f"No keys in {path}")
+    while True:
+        yield from keys
+
+
+# one frame of the game loop once the input is in ECS.context, returns the state the frame started in
+def frame() -> RunState:
+    runState: RunState = ECS.scene.resources.state
+    simulate(save=False)
+    cullDeadParticles()
+    ECS.scene.flush()
+    return runState
+
+
+def step(keys: Iterator[str]) -> RunState:
+    ECS.context.keys.clear()
+    runState: RunState = ECS.scene.resources.state
+    if runState == RunState.WaitingInput and not ECS.scene.resources.cleaningInput:
+        ECS.context.keys.add(next(keys))
+    elif runState in MENU_STATES:  # no interface to answer them, taken as cancelled
+        cancelMenu()
+        ECS.scene.resources.state = RunState.WaitingInput
+    return frame()
+
+
+# a recorded game stops at the first death, the next one would start from where the random generator was left
+def run(seed: int, turns: int, workers: int = 0, script: str | None = None, recordPath: str | None = None) -> tuple[int, int, int, float]:
+    scene = createScene(seed, RunState.PlayerTurn, Logger(None, 10, 0, 0))
+    startGame(scene, workers)
+    if recordPath is not None:
+        ECS.scene.resources.recording = Replay(seed)
+    keys = randomInput(seed) if script is None else scriptedInput(script)
+    played = frames = deaths = 0
+    start = time.perf_counter()
+    while played < turns:
+        if ECS.scene.resources.state == RunState.GameOver:
+            deaths += 1
+            if recordPath is not None:
+                break
+            restart()
+            ECS.scene.resources.state = RunState.PlayerTurn
+        frames += 1
+        if step(keys) == RunState.MonsterTurn:
+            played += 1
+    elapsed = time.perf_counter() - start
+    if recordPath is not None:
+        recording: Replay = ECS.scene.resources.recording
+        recording.save(recordPath)
+        del ECS.scene.resources.recording
+    return played, frames, deaths, elapsed
+
+
+def replay(path: str, workers: int = 0) -> tuple[int, int, int, float]:
+    recorded = Replay.load(path)
+    scene = createScene(recorded.seed, RunState.PlayerTurn, Logger(None, 10, 0, 0))
+    startGame(scene, workers)
+    replayInput = ReplayInput(recorded, scene)
+    played = frames = 0
+    start = time.perf_counter()
+    while replayInput.feed():
+        frames += 1
+        if frame() == RunState.MonsterTurn:
+            played += 1
+    deaths = int(ECS.scene.resources.state == RunState.GameOver)
+    return played, frames, deaths, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    seed = 0
+    turns = 1000
+    workers = 0
+    script = None
+    recordPath = None
+    replayPath = None
+    showTiming = False
+    helpMessage = "headless.py -h | [-r <random seed>] [-n <turns>] [-j <system threads>] [-k <file with the keys to play>] [-R <record the game to file>] [-p <play a recorded game>] [-t <print system timing>] [-c <check the map index every turn>] [-m <map width>x<height>]"
+
+    try:
+        opts, _ = getopt.getopt(sys.argv[1:], "hr:n:j:k:R:p:tcm:")
+    except getopt.GetoptError:
+        print(helpMessage)
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt == '-h':
+            print(helpMessage)
+            sys.exit(0)
+        if opt == '-r':
+            seed = int(arg)
+        if opt == '-n':
+            turns = int(arg)
+        if opt == '-j':
+            workers = int(arg)
+        if opt == '-k':
+            script = arg
+        if opt == '-R':
+            recordPath = arg
+        if opt == '-p':
+            replayPath = arg
+        if opt == '-t':
+            showTiming = True
+        if opt == '-c':
+            system.mapIndexSystem.CHECK_MAP_INDEX = True
+        if opt == '-m':
+            map_builders.mapBuilderBase.MAP_WIDTH, map_builders.mapBuilderBase.MAP_HEIGHT = (int(value) for value in arg.split("x"))
+
+    if replayPath is not None:
+        played, frames, deaths, elapsed = replay(replayPath, workers)
+    else:
+        played, frames, deaths, elapsed = run(seed, turns, workers, script, recordPath)
+    turn: int = ECS.scene.resources.turn
+    print(f"{played} turns in {elapsed:.2f} s ({played / elapsed:.0f} turns/s, {frames} frames), {deaths} deaths, reached turn {turn}")
+    if replayPath is not None:
+        final = Replay.load(replayPath).final
+        print(f"replay {'matches' if final == fingerprint() else 'diverged from'} the recorded game (turn, x, y, HP, entities: {final})")
+    if showTiming:
+        print()
+        print(ECS.scene.resources.scheduler.report())
+        print()
+        print(PROFILER.report())
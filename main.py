@@ -2,309 +2,183 @@
 import os
 import sys
 import getopt
-import pickle
 
-from algorithms import Random, Point
-from component import CombatStats, Equipped, Hidden, HungerClock, InBackpack, Player, Position, Ranged, Renderable, Name, Viewshed, WantsToRemoveItem, WantsToUseItem, WantsToDropItem
-from core import ECS, Context, Entity, Scene
+from algorithms import Point
+from component import Hidden, Position, Ranged, Renderable
+from core import ECS, PROFILER, Entity, Scene
 from device import Device, Font
 from screen import Screen, ScreenLayer
-from map import TileType, drawMap, Map, drawMapBackground
+from map import Map
+from mapRenderer import drawMap, drawMapBackground, drawParticles
 from map_builders.mapBuilder import MapBuilder
-from player import getItem, tryMovePlayer
+from replay import Replay, ReplayInput
 from runState import RunState
-from spawner import createPlayer
-from system.hungerSystem import hungerSystem
-from system.damageSystem import damageSystem, deleteTheDead
+from simulation import SAVE_DATA_FILE_NAME, cancelMenu, createScene, dropItem, fastForward, removeItem, restart, saveState, simulate, startGame, useItem
 from system.guiSystem import GameOverResult, ItemMenuResult, MainMenuResult, dropItemMenu, guiSystem, rangedTarget, removeItemMenu, showGameOver, showInventory, showMenu
-from system.inventorySystem import itemCollectionSystem, itemDropSystem, itemRemoveSystem, itemUseSystem
-from system.mapIndexSystem import mapIndexSystem
-from system.meleeCombatSystem import meleeCombatSystem
-from system.monsterAI import monsterAISystem
-from system.particleSystem import cullDeadParticles, drawParticles
-from system.triggerSystem import triggerSystem
-from system.visibilitySystem import visibilitySystem
+from system.particleSystem import cullDeadParticles
 from utils import Logger
 
+import map_builders.mapBuilderBase
+import simulation
+
 
 SHOW_MAP_GENERATION_VISUALIZER = False
-SAVE_DATA_FILE_NAME = "./save.data"
+PROFILE_FILE_NAME = "./profile.txt"
+PROFILE_KEY = "f12"
+FAST_FORWARD_TIME = 0.1  # seconds of resting simulated before a frame is drawn
 
 mapGenerationState = 0
 mapGenerationTimer = 0
+mapGenerationPaused = False
 SHOW_MAP_GENERATION_VISUALIZER_FRAMES = 1
-cleaningInput = False
-cleaningInputNextState = RunState.WaitingInput
-
-
-def tryNextLevel() -> bool:
-    map: Map = ECS.scene.retrieve("map")
-    player: Entity = ECS.scene.retrieve("player")
-    position: Position = player.get(Position.id)
-    point = Point(position.x, position.y)
-    if point in map.tiles and map.tiles[point] == TileType.DownStairs:
-        return True
-    return False
-
-
-def skipTurn() -> None:
-    player: Entity = ECS.scene.retrieve("player")
-    map: Map = ECS.scene.retrieve("map")
-    canHeal = True
-    for pos in map.visibleTiles:
-        if pos in map.tileContent:
-            for entity in map.tileContent[pos]:
-                if not entity.has(Player.id) and entity.has(CombatStats.id):
-                    canHeal = False
-
-    hunger: HungerClock = player[HungerClock.id]
-    if hunger.hungerState == HungerClock.STARVING or hunger.hungerState == HungerClock.HUNGRY:
-        canHeal = False
-
-    if canHeal:
-        stats: CombatStats = player.get(CombatStats.id)
-        stats.HP = min(stats.maxHP, stats.HP + 1)
-
-
-def generateWorldMap(depth: int) -> None:
-    builder = MapBuilder()
-    builder.build(depth)
-    builder.spawn()
-    ECS.scene.store("map", builder.map)
-    screen.reset()
-    drawMapBackground(screen, builder.map)
-    if SHOW_MAP_GENERATION_VISUALIZER:
-        ECS.scene.store("builder", builder)
-
-    player: Entity = ECS.scene.retrieve("player")
-    position: Position = player.get(Position.id)
-    position.x = builder.startPosition.x
-    position.y = builder.startPosition.y
-    viewshed: Viewshed = player.get(Viewshed.id)
-    viewshed.dirty = True
-
+shownMap: Map | None = None
+shownGenerationStep: int | None = None
+recordPath: str | None = None
 
-def gotoNextLevel() -> None:
-    player: Entity = ECS.scene.retrieve("player")
-    equips = ECS.scene.filter(Equipped.id)
-    entities = ECS.scene.filter(InBackpack.id)
-    entities.add(player)
-    entities.update(equips)
-    ECS.scene.entities = entities
-    map: Map = ECS.scene.retrieve("map")
-    generateWorldMap(map.depth + 1)
 
-    logger: Logger = ECS.scene.retrieve("logger")
-    logger.log("You descend to the next level, and take a moment to heal.")
-    stats: CombatStats = player.get(CombatStats.id)
-    stats.HP = max((stats.maxHP + 1) // 2, stats.HP)
+# the simulation swaps the map on new levels, loads and restarts, the background is redrawn when it does
+def showWorldMap() -> None:
+    global shownMap
+    map: Map = ECS.scene.resources.map
+    if map is not shownMap:
+        shownMap = map
+        screen.background = lambda x1, y1, x2, y2: drawMapBackground(screen, map, x1, y1, x2, y2)
+        screen.reset(map.width, map.height)
 
 
 def cleanupGameOver():
-    ECS.scene.entities.clear()
-    player = createPlayer(ECS.scene, 0, 0)
-    ECS.scene.store("player", player)
-    generateWorldMap(1)
-
-    logger: Logger = ECS.scene.retrieve("logger")
-    logger.clear()
-
+    stopRecording()
+    restart()
     os.remove(SAVE_DATA_FILE_NAME)
-    ECS.scene.store("turn", 1)
-
-
-def playerInput(keys: set[str]) -> RunState:
-    global cleaningInput
-    global cleaningInputNextState
-    if cleaningInput:
-        if len(ECS.context.keys) == 0:
-            cleaningInput = False
-            toReturn = cleaningInputNextState
-            cleaningInputNextState = RunState.WaitingInput
-            return toReturn
-        else:
-            return RunState.WaitingInput
-
-
-    if "k" in keys or "[8]" in keys or "up" in keys:
-        tryMovePlayer(0, -1)
-    elif "j" in keys or "[2]" in keys or "down" in keys:
-        tryMovePlayer(0, +1)
-    elif "h" in keys or "[4]" in keys or "left" in keys:
-        tryMovePlayer(-1, 0)
-    elif "l" in keys or "[6]" in keys or "right" in keys:
-        tryMovePlayer(+1, 0)
-    elif "y" in keys or "[9]" in keys:
-        tryMovePlayer(+1, -1)
-    elif "u" in keys or "[7]" in keys:
-        tryMovePlayer(-1, -1)
-    elif "n" in keys or "[3]" in keys:
-        tryMovePlayer(+1, +1)
-    elif "b" in keys or "[1]" in keys:
-        tryMovePlayer(-1, +1)
-    elif "g" in keys or "[5]" in keys:
-        cleaningInput = True
-        if not getItem():
-            logger: Logger = ECS.scene.retrieve("logger")
-            logger.log("There is nothing here to pick up.")
-        else:
-            cleaningInputNextState = RunState.PlayerTurn
-    elif "i" in keys:
-        cleaningInput = True
-        cleaningInputNextState = RunState.ShowInventory
-    elif "d" in keys:
-        cleaningInput = True
-        cleaningInputNextState = RunState.ShowDropItem
-    elif "r" in keys:
-        cleaningInput = True
-        cleaningInputNextState = RunState.ShowRemoveItem
-    elif '.' in keys:
-        cleaningInput = True
-        if tryNextLevel():
-            cleaningInputNextState = RunState.NextLevel
-        else:
-            logger: Logger = ECS.scene.retrieve("logger")
-            logger.log("There is no way down from here.")
-    elif 'space' in keys:
-        cleaningInput = True
-        skipTurn()
-        logger: Logger = ECS.scene.retrieve("logger")
-        logger.log("Turn skipped.")
-        cleaningInputNextState = RunState.PlayerTurn
-    else:
-        return RunState.WaitingInput
-    
-    if cleaningInput:
-        return RunState.WaitingInput
 
-    return RunState.PlayerTurn
 
+# only new games are recorded, they are replayed from the seed
+def startRecording() -> None:
+    if recordPath is not None:
+        ECS.scene.resources.recording = Replay(ECS.scene.resources.seed)
 
-def runSystems():
-    runState: RunState = ECS.scene.retrieve("state")
-    visibilitySystem()
-    if runState == RunState.MonsterTurn:
-        monsterAISystem()
-    mapIndexSystem()
-    triggerSystem()
-    itemCollectionSystem()
-    itemUseSystem()
-    itemDropSystem()
-    itemRemoveSystem()
-    meleeCombatSystem()
-    damageSystem()
-    hungerSystem()
-    deleteTheDead()
+
+# later games go on from the random state this one left, so the file keeps a single game
+def stopRecording() -> None:
+    global recordPath
+    recording: Replay | None = getattr(ECS.scene.resources, "recording", None)
+    if recording is not None:
+        recording.save(recordPath)
+        del ECS.scene.resources.recording
+        recordPath = None
 
 
 def processBeforeDraw():
-    runState: RunState = ECS.scene.retrieve("state")
+    runState: RunState = ECS.scene.resources.state
     if runState == RunState.MainMenu:
         response = showMenu(ECS.context.keys)
         if response == MainMenuResult.Quit:
             exit(0)
         elif response == MainMenuResult.NewGame:
+            startRecording()
             runState = RunState.PlayerTurn
         elif response == MainMenuResult.Continue:
             loadState()
-            runState = ECS.scene.retrieve("state")
-    elif runState == RunState.PlayerTurn:
-        runSystems()
-        runState = RunState.MonsterTurn
-    elif runState == RunState.MonsterTurn:
-        runSystems()
-        player: Entity = ECS.scene.retrieve("player")
-        stats: CombatStats = player.get(CombatStats.id)
-        if stats.HP <= 0:
-            ECS.context.clear()
-            runState = RunState.GameOver
-        else:
-            turn: int = ECS.scene.retrieve("turn")
-            ECS.scene.store("turn", turn + 1)
-            runState = RunState.WaitingInput
-        ECS.scene.store("state", runState)
-        saveState()
-    elif runState == RunState.NextLevel:
-        gotoNextLevel()
-        runSystems()
-        ECS.scene.store("state", runState)
-        runState = RunState.WaitingInput
-        saveState()
-    elif runState == RunState.WaitingInput:
-        runState = playerInput(ECS.context.keys)
-    elif runState == RunState.CloseGUI:
-        global cleaningInput
-        global cleaningInputNextState
-        cleaningInput = True
-        cleaningInputNextState = RunState.WaitingInput
-        runState = RunState.PlayerTurn
-
-    ECS.scene.store("state", runState)
+            runState = ECS.scene.resources.state
+        ECS.scene.resources.state = runState
+    else:
+        simulate()
+    showWorldMap()
 
 
 def processAfterDraw(screen: Screen):
-    runState: RunState = ECS.scene.retrieve("state")
+    runState: RunState = ECS.scene.resources.state
 
     if runState == RunState.ShowInventory:
         result, entity = showInventory(ECS.context.keys)
         if result == ItemMenuResult.Cancel:
+            cancelMenu()
             runState = RunState.WaitingInput
         elif result == ItemMenuResult.Selected and entity is not None:
             if entity.has(Ranged.id):
-                ECS.scene.store("targeting element", entity)
+                ECS.scene.resources.targetingElement = entity
                 runState = RunState.ShowTargeting
             else:
-                player: Entity = ECS.scene.retrieve('player')
-                player.add(WantsToUseItem(entity))
+                useItem(entity)
                 runState = RunState.CloseGUI
     elif runState == RunState.ShowDropItem:
         result, entity = dropItemMenu(ECS.context.keys)
         if result == ItemMenuResult.Cancel:
+            cancelMenu()
             runState = RunState.WaitingInput
         elif result == ItemMenuResult.Selected and entity is not None:
-            player: Entity = ECS.scene.retrieve('player')
-            player.add(WantsToDropItem(entity))
+            dropItem(entity)
             runState = RunState.CloseGUI
     elif runState == RunState.ShowRemoveItem:
         result, entity = removeItemMenu(ECS.context.keys)
         if result == ItemMenuResult.Cancel:
+            cancelMenu()
             runState = RunState.WaitingInput
         elif result == ItemMenuResult.Selected and entity is not None:
-            player: Entity = ECS.scene.retrieve('player')
-            player.add(WantsToRemoveItem(entity))
+            removeItem(entity)
             runState = RunState.CloseGUI
     elif runState == RunState.ShowTargeting:
-        targeting: Entity = ECS.scene.retrieve("targeting element")
+        targeting: Entity = ECS.scene.resources.targetingElement
         result, point = rangedTarget(targeting, screen)
         if result == ItemMenuResult.Cancel:
+            cancelMenu()
             runState = RunState.WaitingInput
         elif result == ItemMenuResult.Selected and point is not None:
-            player: Entity = ECS.scene.retrieve('player')
-            player.add(WantsToUseItem(targeting, point))
+            useItem(targeting, point)
             runState = RunState.CloseGUI
     elif runState == RunState.GameOver:
         if showGameOver(ECS.context.keys) == GameOverResult.QuitToMenu:
             cleanupGameOver()
             runState = RunState.MainMenu
-    ECS.scene.store("state", runState)
+    ECS.scene.resources.state = runState
 
+# plays the steps of the build, left and right scrub through them, home and end jump, return plays again
 def showMapGeneration(screen: Screen) -> None:
     global mapGenerationTimer
     global mapGenerationState
+    global mapGenerationPaused
     screen.clear()
-    builder:MapBuilder = ECS.scene.retrieve("builder")
-    if mapGenerationTimer >= SHOW_MAP_GENERATION_VISUALIZER_FRAMES:
+    builder:MapBuilder = ECS.scene.resources.builder
+    steps = len(builder.history)
+    keys = ECS.context.keys
+    if "left" in keys or "right" in keys or "home" in keys or "end" in keys:
+        mapGenerationPaused = True
+        if "left" in keys:
+            mapGenerationState = max(0, mapGenerationState - 1)
+        elif "right" in keys:
+            mapGenerationState = min(steps - 1, mapGenerationState + 1)
+        elif "home" in keys:
+            mapGenerationState = 0
+        else:
+            mapGenerationState = steps - 1
+    elif "return" in keys:
+        mapGenerationPaused = False
+    elif mapGenerationPaused:
+        pass
+    elif mapGenerationTimer >= SHOW_MAP_GENERATION_VISUALIZER_FRAMES:
         mapGenerationTimer = 0
-        if mapGenerationState + 1 < len(builder.snapshotHistory):
+        if mapGenerationState + 1 < steps:
             mapGenerationState += 1
     else:
         mapGenerationTimer += 1
-    map:Map = builder.snapshotHistory[mapGenerationState]
-    drawMapBackground(screen, map)
-    drawMap(screen, map)
-
+    showGenerationStep(screen, builder)
+    drawMap(screen, shownMap)
+
+
+# the chunk layers only blend new glyphs in, going back a step needs them drawn again from that step alone
+def showGenerationStep(screen: Screen, builder: MapBuilder) -> None:
+    global shownMap
+    global shownGenerationStep
+    if mapGenerationState != shownGenerationStep:
+        shownGenerationStep = mapGenerationState
+        map = builder.snapshot(mapGenerationState)
+        shownMap = map
+        screen.background = lambda x1, y1, x2, y2: drawMapBackground(screen, map, x1, y1, x2, y2)
+        screen.reset(map.width, map.height)
+
+@PROFILER.profile
 def update():
-    runState: RunState = ECS.scene.retrieve("state")
+    runState: RunState = ECS.scene.resources.state
     screen.clear()
     if runState == RunState.MapGeneration:
         showMapGeneration(screen)
@@ -315,8 +189,10 @@ def update():
     if runState == RunState.MainMenu:
         return
 
-    map: Map = ECS.scene.retrieve("map")
+    map: Map = ECS.scene.resources.map
     entities = ECS.scene.filter(Position.id | Renderable.id)
+    playerPosition: Position = ECS.scene.resources.player[Position.id]
+    screen.follow(Point(playerPosition.x, playerPosition.y))
     drawMap(screen, map)    
     for entity in sorted(entities, key=lambda entity: entity[Renderable.id].render_order, reverse=True):
         if not entity.has(Hidden.id):
@@ -328,9 +204,10 @@ def update():
     
     drawParticles(screen)
     cullDeadParticles()
+    ECS.scene.flush()
     screen.draw()
 
-    logger: Logger = ECS.scene.retrieve("logger")
+    logger: Logger = ECS.scene.resources.logger
     logger.print()
 
     processAfterDraw(screen)
@@ -338,87 +215,89 @@ def update():
     screen.drawInterface()
 
 
-def saveState():
-    data = dict()
-    logger: Logger = ECS.scene.retrieve("logger")
-    data["state"] = ECS.scene.retrieve("state")
-    data["turn"] = ECS.scene.retrieve("turn")
-    data["map"] = ECS.scene.retrieve("map")
-    data["random"] = ECS.scene.retrieve("random")
-    data["logger messages"] = logger.messages
-    data["entitities"] = ECS.scene.entities
-    
-    with open(SAVE_DATA_FILE_NAME, "wb") as outfile:
-        pickle.dump(data, outfile)
+def loadState():
+    simulation.loadState()
+    showWorldMap()
+    map: Map = ECS.scene.resources.map
+    screen.revealMask(map.revealedTiles.mask())
+    screen.setVisible(map.visibleTiles)
 
 
-def loadState():
-    logger: Logger = ECS.scene.retrieve("logger")
-    with open(SAVE_DATA_FILE_NAME, "rb") as infile:
-        data = pickle.load(infile)
-        logger.messages = data["logger messages"]
-        ECS.scene.store("state", data["state"])
-        ECS.scene.store("turn", data["turn"])
-        ECS.scene.store("random", data["random"])
-        map:Map = data["map"]
-        ECS.scene.store("map", map)
-        ECS.scene.entities = data["entitities"]
-        player = ECS.scene.filter(Player.id)
-        player = list(player)[0]
-        ECS.scene.store("player", player)
-        viewshed: Viewshed = player[Viewshed.id]
-        viewshed.dirty = True
-        screen.reset()
-        drawMapBackground(screen, map)
-        screen.setVisible(map.revealedTiles)
-        screen.setVisible(map.visibleTiles)
-
-
-def main(seed):
-    rand = Random(seed)
+def registerResources(scene: Scene) -> None:
+    resources = scene.resources
+    resources.register("font", Font)
+    resources.register("camera", tuple)
+    resources.register("targetingElement", Entity)
+
+
+def main(seed, workers=0, showTiming=False, replayPath=None):
+    recorded = None
+    if replayPath is not None:
+        recorded = Replay.load(replayPath)
+        seed = recorded.seed
+
     device = Device("Picnic in the Dungeon", tick=32, width=1280, height=640)
 
     font = device.loadFont("./art/DejaVuSansMono-Bold.ttf", 16)
     logger = Logger(font, 10, 10, 300)
 
     initialState = RunState.MapGeneration if SHOW_MAP_GENERATION_VISUALIZER else RunState.MainMenu
+    if recorded is not None:
+        initialState = RunState.PlayerTurn
 
-    scene = Scene()
-    scene.store("state", initialState)
-    scene.store("font", font)
-    scene.store("random", rand)
-    scene.store("camera", (40, 0))
-    scene.store("logger", logger)
-    scene.store("turn", 1)
+    scene = createScene(seed, initialState, logger)
+    replayInput = ReplayInput(recorded, scene) if recorded is not None else None
+    registerResources(scene)
+    scene.resources.font = font
+    scene.resources.camera = (40, 0)
 
-    ECS.scene = scene
-    ECS.context = Context()
-    
     global screen
-    screen = Screen(80, 40, font)
+    screen = Screen(map_builders.mapBuilderBase.MAP_WIDTH, map_builders.mapBuilderBase.MAP_HEIGHT, font, 80, 40)
     screen.camera.x = 40 # camera
 
-    player = createPlayer(ECS.scene, 0, 0)
-    ECS.scene.store("player", player)
-    generateWorldMap(1)
+    map_builders.mapBuilderBase.RECORD_SNAPSHOTS = SHOW_MAP_GENERATION_VISUALIZER
+    builder = startGame(scene, workers)
+    if SHOW_MAP_GENERATION_VISUALIZER:
+        ECS.scene.resources.builder = builder
+    showWorldMap()
 
     while device.running:
-        ECS.context.keys.clear()
-        ECS.context.keys.update(device.keys)
+        if replayInput is not None and not replayInput.feed():
+            replayInput = None  # the recorded game is over, the player takes it from here
+            logger.log("End of the replay.")
+        if replayInput is None:
+            ECS.context.keys.clear()
+            ECS.context.keys.update(device.keys)
+        if ECS.scene.resources.resting and not ECS.context.keys:  # only the end of the rest is drawn, a key stops it
+            if fastForward(FAST_FORWARD_TIME) > 0:
+                saveState()
         ECS.context.mouseLeftPressed = device.mousePressed
         ECS.context.mousePosition = Point(device.mouseX, device.mouseY)
         device.clear()
         device.loop()
         update()
         device.draw()
+        if PROFILE_KEY in device.keys:
+            device.keys.discard(PROFILE_KEY)
+            PROFILER.dump(PROFILE_FILE_NAME)
+            logger.log(f"Profile written to {PROFILE_FILE_NAME}.")
+
+    stopRecording()
+    if showTiming:
+        print(ECS.scene.resources.scheduler.report())
+        print()
+        print(PROFILER.report())
 
 
 if __name__ == "__main__":
     seed = 0
-    helpMessage = "main.py -h | [-r <random seed>] [-s <show map generation>]"
+    workers = 0
+    showTiming = False
+    replayPath = None
+    helpMessage = "main.py -h | [-r <random seed>] [-s <show map generation>] [-j <system threads>] [-t <print system timing on exit, F12 writes it to profile.txt>] [-R <record new games to file>] [-p <play a recorded game>] [-m <map width>x<height>]"
 
     try:
-        opts, _ = getopt.getopt(sys.argv[1:],"hr:s",["randomSeed="])
+        opts, _ = getopt.getopt(sys.argv[1:],"hr:sj:tR:p:m:",["randomSeed="])
     except getopt.GetoptError:
       print (helpMessage)
       sys.exit(2)
@@ -431,6 +310,15 @@ if __name__ == "__main__":
             seed = int(arg)
         if opt == '-s':
             SHOW_MAP_GENERATION_VISUALIZER = True
-    
-    import cProfile
-    main(seed)
+        if opt == '-j':
+            workers = int(arg)
+        if opt == '-t':
+            showTiming = True
+        if opt == '-R':
+            recordPath = arg
+        if opt == '-p':
+            replayPath = arg
+        if opt == '-m':
+            map_builders.mapBuilderBase.MAP_WIDTH, map_builders.mapBuilderBase.MAP_HEIGHT = (int(value) for value in arg.split("x"))
+
+    main(seed, workers, showTiming, replayPath)
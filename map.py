@@ -1,10 +1,11 @@
+from array import array
 from enum import Enum
+from itertools import compress
+from collections.abc import Iterable, Iterator, MutableMapping, MutableSet
 
 from algorithms import Point
-from algorithms.direction import Direction
-from component import Renderable
+from component import BlocksTile, Position
 from core import ECS, Entity
-from screen import Screen, ScreenLayer
 
 
 class TileType(Enum):
@@ -13,6 +14,24 @@ class TileType(Enum):
     DownStairs = 2
 
 
+TILE_TYPES = tuple(TileType)
+
+# one byte of layers per cell, in map.flags
+BLOCKED = 1
+OPAQUE = 2
+REVEALED = 4
+VISIBLE = 8
+BLOODSTAIN = 16
+
+# byte translations: the bit of a layer as 0 or 1, and the opaque bit of each tile type
+LAYER_MASKS = {bit: bytes(int(value & bit != 0) for value in range(256)) for bit in (BLOCKED, OPAQUE, REVEALED, VISIBLE, BLOODSTAIN)}
+WALL_MASKS = {bit: bytes(bit if value == TileType.Wall.value else 0 for value in range(256)) for bit in (BLOCKED, OPAQUE)}
+IS_WALL = bytes(int(value == TileType.Wall.value) for value in range(256))
+IS_FLOOR = bytes(int(value == TileType.Floor.value) for value in range(256))
+SET_BITS = {bit: bytes(value | bit for value in range(256)) for bit in (BLOCKED, OPAQUE, REVEALED, VISIBLE, BLOODSTAIN)}
+CLEAR_BITS = {bit: bytes(value & ~bit for value in range(256)) for bit in (BLOCKED, OPAQUE, REVEALED, VISIBLE, BLOODSTAIN)}
+
+
 class Rect:
     __slots__ = ["x1", "y1", "x2", "y2"]
 
@@ -37,105 +56,328 @@ class Rect:
         return f"<(x1={self.x1}, y1={self.y1}), (x2={self.x2}, y2={self.y2})>"
 
 
+# the tiles of the map as a dict of points, backed by map.cells
+class TileGrid(MutableMapping):
+    __slots__ = ["map"]
+
+    def __init__(self, map: 'Map'):
+        self.map = map
+
+    def __getitem__(self, point: Point) -> TileType:
+        map = self.map
+        if 0 <= point.x < map.width and 0 <= point.y < map.height:
+            return TILE_TYPES[map.cells[point.y * map.width + point.x]]
+        raise KeyError(point)
+
+    def __setitem__(self, point: Point, tile: TileType) -> None:
+        map = self.map
+        if not (0 <= point.x < map.width and 0 <= point.y < map.height):
+            raise KeyError(point)
+        index = point.y * map.width + point.x
+        map.cells[index] = tile.value
+        map.flags[index] = map.flags[index] | OPAQUE if tile == TileType.Wall else map.flags[index] & ~OPAQUE
+
+    def __delitem__(self, point: Point) -> None:
+        raise TypeError("The tiles of a map can not be removed")
+
+    def __contains__(self, point: Point) -> bool:
+        map = self.map
+        return 0 <= point.x < map.width and 0 <= point.y < map.height
+
+    def __iter__(self) -> Iterator[Point]:
+        for y in range(self.map.height):
+            for x in range(self.map.width):
+                yield Point(x, y)
+
+    def __len__(self) -> int:
+        return len(self.map.cells)
+
+    def copy(self) -> dict[Point, TileType]:
+        return dict(self.items())
+
+
+# one bit of map.flags as a set of points, points outside the map are never in it
+class TileLayer(MutableSet):
+    __slots__ = ["map", "bit"]
+
+    def __init__(self, map: 'Map', bit: int):
+        self.map = map
+        self.bit = bit
+
+    def __contains__(self, point: Point) -> bool:
+        map = self.map
+        return 0 <= point.x < map.width and 0 <= point.y < map.height and map.flags[point.y * map.width + point.x] & self.bit != 0
+
+    def __iter__(self) -> Iterator[Point]:
+        width = self.map.width
+        for index in compress(range(len(self.map.flags)), self.map.flags.translate(LAYER_MASKS[self.bit])):
+            yield Point(index % width, index // width)
+
+    def __len__(self) -> int:
+        return self.map.flags.translate(LAYER_MASKS[self.bit]).count(1)
+
+    def add(self, point: Point) -> None:
+        map = self.map
+        if 0 <= point.x < map.width and 0 <= point.y < map.height:
+            map.flags[point.y * map.width + point.x] |= self.bit
+
+    def discard(self, point: Point) -> None:
+        map = self.map
+        if 0 <= point.x < map.width and 0 <= point.y < map.height:
+            map.flags[point.y * map.width + point.x] &= ~self.bit
+
+    def update(self, points: Iterable[Point]) -> None:
+        for point in points:
+            self.add(point)
+
+    def clear(self) -> None:
+        self.map.flags[:] = self.map.flags.translate(CLEAR_BITS[self.bit])
+
+    def fill(self) -> None:
+        self.map.flags[:] = self.map.flags.translate(SET_BITS[self.bit])
+
+    def copy(self) -> set[Point]:
+        return set(self)
+
+    # one byte per cell from index start to end, 1 where the point is in the layer
+    def mask(self, start: int = 0, end: int | None = None) -> bytes:
+        return self.map.flags[start:end].translate(LAYER_MASKS[self.bit])
+
+
+# tiles and layers are flat arrays indexed by y * width + x, tiles, blocked, visibleTiles, revealedTiles and bloodstains read them as dicts and sets of points
 class Map:
     def __init__(self, width: int, height: int):
         self.name = ''
         self.width = width
         self.height = height
-        self.tiles: dict[Point, TileType] = dict()
-        self.visibleTiles: set[Point] = set()
-        self.revealedTiles: set[Point] = set()
-        self.blocked: set[Point] = set()
+        self.cells = bytearray(width * height)  # TileType.Wall
+        self.flags = bytearray([OPAQUE]) * (width * height)
         self.tileContent: dict[Point, list[Entity]] = dict()
-        self.bloodstains: set[Point] = set()
+        self.contentIndex: dict[Entity, Point] = dict()
+        self.blockers = array('H', bytes(2 * width * height))  # how many indexed entities block each cell
+        self.blocking: set[Entity] = set()  # the indexed entities counted in blockers, they may lose BlocksTile before leaving
         self.depth = 0
-        for row in range(0, self.height):
-            for col in range(0, self.width):
-                self.tiles[Point(col, row)] = TileType.Wall
+        self._wallMasks: bytes | None = None
+        self._wallMasksCells = b''
+        self._createViews()
+
+    def _createViews(self) -> None:
+        self._tiles = TileGrid(self)
+        self._blocked = TileLayer(self, BLOCKED)
+        self._visibleTiles = TileLayer(self, VISIBLE)
+        self._revealedTiles = TileLayer(self, REVEALED)
+        self._bloodstains = TileLayer(self, BLOODSTAIN)
+
+    @property
+    def tiles(self) -> TileGrid:
+        return self._tiles
+
+    @property
+    def blocked(self) -> TileLayer:
+        return self._blocked
+
+    @blocked.setter
+    def blocked(self, points: Iterable[Point]) -> None:
+        self._assign(self._blocked, points)
+
+    @property
+    def visibleTiles(self) -> TileLayer:
+        return self._visibleTiles
+
+    @visibleTiles.setter
+    def visibleTiles(self, points: Iterable[Point]) -> None:
+        self._assign(self._visibleTiles, points)
+
+    @property
+    def revealedTiles(self) -> TileLayer:
+        return self._revealedTiles
+
+    @revealedTiles.setter
+    def revealedTiles(self, points: Iterable[Point]) -> None:
+        self._assign(self._revealedTiles, points)
+
+    @property
+    def bloodstains(self) -> TileLayer:
+        return self._bloodstains
+
+    @bloodstains.setter
+    def bloodstains(self, points: Iterable[Point]) -> None:
+        self._assign(self._bloodstains, points)
+
+    def _assign(self, layer: TileLayer, points: Iterable[Point]) -> None:
+        if points is not layer:
+            layer.clear()
+            layer.update(points)
+
+    # replaces one bit of every cell, mask holds the bit where it is set; the arrays are combined as big integers
+    def setLayer(self, bit: int, mask: bytes) -> None:
+        size = len(self.flags)
+        kept = int.from_bytes(self.flags, "little") & int.from_bytes(bytes([0xFF ^ bit]) * size, "little")
+        self.flags[:] = (kept | int.from_bytes(mask, "little")).to_bytes(size, "little")
+
+    # the cells x1 <= x < x2, y1 <= y < y2 a row slice at a time
+    def fillRect(self, x1: int, y1: int, x2: int, y2: int, tile: TileType) -> None:
+        x1, x2 = max(x1, 0), min(x2, self.width)
+        if x1 >= x2:
+            return
+        row = bytes([tile.value]) * (x2 - x1)
+        opaque = SET_BITS[OPAQUE] if tile == TileType.Wall else CLEAR_BITS[OPAQUE]
+        for y in range(max(y1, 0), min(y2, self.height)):
+            start = y * self.width + x1
+            end = start + x2 - x1
+            self.cells[start:end] = row
+            self.flags[start:end] = self.flags[start:end].translate(opaque)
+
+    def setCells(self, cells: bytes) -> None:
+        self.cells[:] = cells
+        self.setLayer(OPAQUE, self.cells.translate(WALL_MASKS[OPAQUE]))
+
+    # per cell, 0 or 1 + the walls up, down, left and right as bits 1, 2, 4 and 8 for the walls next to a floor;
+    # the grids are shifted and combined as big integers of one byte per cell, kept until the tiles change
+    def wallMasks(self) -> bytes:
+        if self._wallMasks is not None and self._wallMasksCells == self.cells:
+            return self._wallMasks
+        width = self.width
+        size = len(self.cells)
+        every = int.from_bytes(b'\x01' * size, "little")
+        notFirstColumn = int.from_bytes((b'\x00' + b'\x01' * (width - 1)) * self.height, "little")
+        notLastColumn = int.from_bytes((b'\x01' * (width - 1) + b'\x00') * self.height, "little")
+        up = lambda grid: (grid << 8 * width) & every  # each cell gets the one above it
+        down = lambda grid: grid >> 8 * width
+        left = lambda grid: (grid << 8) & notFirstColumn
+        right = lambda grid: (grid >> 8) & notLastColumn
+
+        floors = int.from_bytes(self.cells.translate(IS_FLOOR), "little")
+        rows = floors | left(floors) | right(floors)
+        nearFloor = rows | up(rows) | down(rows)
+        walls = int.from_bytes(self.cells.translate(IS_WALL), "little") & nearFloor
+        masks = up(walls) | down(walls) << 1 | left(walls) << 2 | right(walls) << 3
+        glyphs = (masks & walls * 0xFF) + walls
+        self._wallMasks = glyphs.to_bytes(size, "little")
+        self._wallMasksCells = bytes(self.cells)
+        return self._wallMasks
+
+    def isOpaque(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height and self.flags[y * self.width + x] & OPAQUE != 0
 
     def populateBlocked(self):
-        self.blocked.clear()
-        for row in range(0, self.height):
-            for col in range(0, self.width):
-                point = Point(col, row)
-                if self.tiles[point] == TileType.Wall:
-                    self.blocked.add(point)
+        self.setLayer(BLOCKED, self.cells.translate(WALL_MASKS[BLOCKED]))
 
+    # back to the walls of the level, the blocked layer then follows the entities placed and removed
     def clearContentIndex(self):
         self.tileContent.clear()
+        self.contentIndex = dict()
+        self.blockers[:] = array('H', bytes(2 * len(self.blockers)))
+        self.blocking.clear()
+        self.populateBlocked()
+
+    def placeContent(self, entity: Entity, point: Point):
+        content = self.tileContent[point] if point in self.tileContent else []
+        content.append(entity)
+        self.tileContent[point] = content
+        self.contentIndex[entity] = point
+        if entity.has(BlocksTile.id) and point in self.tiles:
+            index = point.y * self.width + point.x
+            self.blockers[index] += 1
+            self.blocking.add(entity)
+            self.flags[index] |= BLOCKED
+
+    def removeContent(self, entity: Entity) -> Point | None:
+        point = self.contentIndex.pop(entity, None)
+        if point is not None:
+            content = self.tileContent[point]
+            content.remove(entity)
+            if not content:
+                del self.tileContent[point]
+            if entity in self.blocking:
+                self.blocking.discard(entity)
+                index = point.y * self.width + point.x
+                self.blockers[index] -= 1
+                self.refreshBlocked(point)
+        return point
+
+    # places the entity at the point at once, systems that move several entities in a stage see the cells they left and took
+    def moveContent(self, entity: Entity, point: Point):
+        self.removeContent(entity)
+        self.placeContent(entity, point)
+
+    def refreshBlocked(self, point: Point):
+        if point not in self.tiles:
+            return
+        index = point.y * self.width + point.x
+        if self.blockers[index] or self.cells[index] == TileType.Wall.value:
+            self.flags[index] |= BLOCKED
+        else:
+            self.flags[index] &= ~BLOCKED
+
+    # differences between the content index and the positioned entities, empty when the index is exact
+    def checkContentIndex(self, entities: Iterable[Entity]) -> list[str]:
+        errors: list[str] = list()
+        expected: dict[Entity, Point] = dict()
+        for entity in entities:
+            position: Position = entity[Position.id]
+            expected[entity] = Point(position.x, position.y)
+            if self.contentIndex.get(entity) != expected[entity]:
+                errors.append(f"{entity} at {expected[entity]} is indexed at {self.contentIndex.get(entity)}")
+        for entity in self.contentIndex:
+            if entity not in expected:
+                errors.append(f"{entity} is indexed at {self.contentIndex[entity]} without a position")
+        for point, content in self.tileContent.items():
+            if not content:
+                errors.append(f"empty content list at {point}")
+            for entity in content:
+                if self.contentIndex.get(entity) != point:
+                    errors.append(f"{entity} listed at {point} is indexed at {self.contentIndex.get(entity)}")
+            if len(set(content)) != len(content):
+                errors.append(f"repeated entities at {point}: {content}")
+        blockers = array('H', bytes(2 * len(self.blockers)))
+        for entity, point in expected.items():
+            if entity.has(BlocksTile.id) and point in self.tiles:
+                blockers[point.y * self.width + point.x] += 1
+        if blockers != self.blockers:
+            errors.append("the blockers per cell differ from the entities with BlocksTile")
+        expectedBlocked = bytes(a | b for a, b in zip(self.cells.translate(WALL_MASKS[BLOCKED]), (BLOCKED if count else 0 for count in blockers)))
+        if self.flags.translate(LAYER_MASKS[BLOCKED]) != expectedBlocked.translate(LAYER_MASKS[BLOCKED]):
+            errors.append("the blocked tiles differ from the walls and the entities with BlocksTile")
+        return errors
 
     def clone(self) -> 'Map':
         newMap = Map(self.width, self.height)
-        newMap.tiles = self.tiles.copy()
-        newMap.visibleTiles = self.visibleTiles.copy()
-        newMap.revealedTiles = self.revealedTiles.copy()
-        newMap.blocked = self.blocked.copy()
+        newMap.cells[:] = self.cells
+        newMap.flags[:] = self.flags
         for pos in self.tileContent:
             newMap.tileContent[pos] = self.tileContent[pos].copy()
-        newMap.bloodstains = self.bloodstains.copy()
+        newMap.contentIndex = self.contentIndex.copy()
+        newMap.blockers[:] = self.blockers
+        newMap.blocking = self.blocking.copy()
         return newMap
 
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        for view in ("_tiles", "_blocked", "_visibleTiles", "_revealedTiles", "_bloodstains", "_wallMasks", "_wallMasksCells"):
+            del state[view]
+        return state
 
-def drawMapBackground(screen: Screen, map: Map):
-    wallTiles: set[Point] = set()
-    for point in map.tiles:
-        tile = map.tiles[point]
-        if tile == TileType.Floor:
-            for dir in Direction.All:
-                n = point + dir
-                if n in map.tiles and map.tiles[n] == TileType.Wall:
-                    wallTiles.add(n)
-
-    for point in wallTiles:
-        glyph = getWallGlyph(point, wallTiles)
-        screen.setGlyph(ScreenLayer.BackgroundRevealed, point, Renderable(glyph, 0, (127, 127, 127, 255)))
-        screen.setGlyph(ScreenLayer.BackgroundVisible, point, Renderable(glyph, 0, (0, 255, 0, 255)))
-
-    for point in map.tiles:
-        tile = map.tiles[point]
-        if tile == TileType.Floor:
-            screen.setGlyph(ScreenLayer.BackgroundRevealed, point, Renderable('.', 0, (127, 127, 127, 255)))
-            screen.setGlyph(ScreenLayer.BackgroundVisible, point, Renderable('.', 0, (0, 127, 127, 255)))
-        if tile == TileType.DownStairs:
-            screen.setGlyph(ScreenLayer.BackgroundRevealed, point, Renderable('>', 0, (127, 127, 127, 255)))
-            screen.setGlyph(ScreenLayer.BackgroundVisible, point, Renderable('>', 0, (0, 255, 255, 255)))
-
-
-def drawMap(screen: Screen, map: Map):
-    bloodstain = Renderable(' ', 0, (255, 255, 255, 0))
-    bloodstain.background = (100, 0, 0, 255)
-    for point in map.bloodstains:
-        screen.setGlyph(ScreenLayer.BackgroundEffects, point, bloodstain)
-    screen.setRevealed(map.revealedTiles)
-    screen.setVisible(map.visibleTiles)
-
-
-def getWallGlyph(point: Point, walls: set[Point]) -> str:
-    mask = 0
-    if point + Direction.Up in walls:
-        mask += 1
-    if point + Direction.Down in walls:
-        mask += 2
-    if point + Direction.Left in walls:
-        mask += 4
-    if point + Direction.Right in walls:
-        mask += 8
-
-    match mask:
-        case 0: return '○'  # { 9 } // Pillar because we can't see neighbors
-        case 1: return '║'  # { 186 } // Wall only to the north
-        case 2: return '║'  # { 186 } // Wall only to the south
-        case 3: return '║'  # { 186 } // Wall to the north and south
-        case 4: return '═'  # { 205 } // Wall only to the west
-        case 5: return '╝'  # { 188 } // Wall to the north and west
-        case 6: return '╗'  # { 187 } // Wall to the south and west
-        case 7: return '╣'  # { 185 } // Wall to the north, south and west
-        case 8: return '═'  # { 205 } // Wall only to the east
-        case 9: return '╚'  # { 200 } // Wall to the north and east
-        case 10: return '╔'  # { 201 } // Wall to the south and east
-        case 11: return '╠'  # { 204 } // Wall to the north, south and east
-        case 12: return '═'  # { 205 } // Wall to the east and west
-        case 13: return '╩'  # { 202 } // Wall to the east, west, and south
-        case 14: return '╦'  # { 203 } // Wall to the east, west, and north
-        case 15: return '╬'  # { 206 }  // ╬ Wall on all sides
-    return '#'
+    # saves from before the flat arrays kept the tiles and layers as dicts and sets of points
+    def __setstate__(self, state: dict) -> None:
+        legacy = {name: state.pop(name) for name in ("tiles", "blocked", "visibleTiles", "revealedTiles", "bloodstains") if name in state}
+        self.__dict__.update(state)
+        if legacy:
+            self.cells = bytearray(self.width * self.height)
+            self.flags = bytearray([OPAQUE]) * (self.width * self.height)
+        self._wallMasks = None  # computed again when the map is first drawn
+        self._wallMasksCells = b''
+        if "blockers" not in state:  # the map index system rebuilds the content index, counting the blockers
+            self.tileContent = dict()
+            self.contentIndex = dict()
+            self.blockers = array('H', bytes(2 * self.width * self.height))
+            self.blocking = set()
+        elif isinstance(self.blockers, bytearray):  # saves from when a byte counted the blockers
+            self.blockers = array('H', self.blockers)
+        self._createViews()
+        for name, value in legacy.items():
+            if name == "tiles":
+                for point, tile in value.items():
+                    self._tiles[point] = tile
+            else:
+                setattr(self, name, value)
@@ -0,0 +1,89 @@
+
+from itertools import compress
+from typing import Iterator
+
+from algorithms import Point
+from component import ParticleLifetime, Position, Renderable
+from core import ECS, PROFILER
+from map import Map, TileLayer, TileType
+from screen import Screen, ScreenLayer
+
+
+# by the mask of Map.wallMasks: the walls up, down, left and right as bits 1, 2, 4 and 8
+WALL_GLYPHS = (
+    '○',  # { 9 } // Pillar because we can't see neighbors
+    '║',  # { 186 } // Wall only to the north
+    '║',  # { 186 } // Wall only to the south
+    '║',  # { 186 } // Wall to the north and south
+    '═',  # { 205 } // Wall only to the west
+    '╝',  # { 188 } // Wall to the north and west
+    '╗',  # { 187 } // Wall to the south and west
+    '╣',  # { 185 } // Wall to the north, south and west
+    '═',  # { 205 } // Wall only to the east
+    '╚',  # { 200 } // Wall to the north and east
+    '╔',  # { 201 } // Wall to the south and east
+    '╠',  # { 204 } // Wall to the north, south and east
+    '═',  # { 205 } // Wall to the east and west
+    '╩',  # { 202 } // Wall to the east, west, and south
+    '╦',  # { 203 } // Wall to the east, west, and north
+    '╬',  # { 206 }  // ╬ Wall on all sides
+)
+WALL_REVEALED = [Renderable(glyph, 0, (127, 127, 127, 255)) for glyph in WALL_GLYPHS]
+WALL_VISIBLE = [Renderable(glyph, 0, (0, 255, 0, 255)) for glyph in WALL_GLYPHS]
+FLOOR_REVEALED = {TileType.Floor.value: Renderable('.', 0, (127, 127, 127, 255)), TileType.DownStairs.value: Renderable('>', 0, (127, 127, 127, 255))}
+FLOOR_VISIBLE = {TileType.Floor.value: Renderable('.', 0, (0, 127, 127, 255)), TileType.DownStairs.value: Renderable('>', 0, (0, 255, 255, 255))}
+
+
+# the cells x1 <= x < x2, y1 <= y < y2, the whole map by default
+def drawMapBackground(screen: Screen, map: Map, x1: int = 0, y1: int = 0, x2: int | None = None, y2: int | None = None):
+    width = map.width
+    x2 = width if x2 is None else x2
+    y2 = map.height if y2 is None else y2
+    masks = map.wallMasks()
+    for y in range(y1, y2):
+        start = y * width
+        for x in compress(range(x1, x2), masks[start + x1:start + x2]):
+            point = Point(x, y)
+            screen.setGlyph(ScreenLayer.BackgroundRevealed, point, WALL_REVEALED[masks[start + x] - 1])
+            screen.setGlyph(ScreenLayer.BackgroundVisible, point, WALL_VISIBLE[masks[start + x] - 1])
+
+    for y in range(y1, y2):
+        start = y * width
+        for x in compress(range(x1, x2), map.cells[start + x1:start + x2]):  # TileType.Wall is 0
+            point = Point(x, y)
+            screen.setGlyph(ScreenLayer.BackgroundRevealed, point, FLOOR_REVEALED[map.cells[start + x]])
+            screen.setGlyph(ScreenLayer.BackgroundVisible, point, FLOOR_VISIBLE[map.cells[start + x]])
+
+
+# the points of a layer in the view of the screen
+def pointsInView(screen: Screen, layer: TileLayer) -> Iterator[Point]:
+    map = layer.map
+    x1, y1, x2, y2 = screen.viewBounds()
+    x2, y2 = min(x2, map.width), min(y2, map.height)
+    mask = layer.mask(y1 * map.width, y2 * map.width)
+    for y in range(y2 - y1):
+        start = y * map.width
+        for x in compress(range(x1, x2), mask[start + x1:start + x2]):
+            yield Point(x, y1 + y)
+
+
+# only the rows in the view are revealed, the screen draws the fog of the others when they come into it
+def drawMap(screen: Screen, map: Map):
+    bloodstain = Renderable(' ', 0, (255, 255, 255, 0))
+    bloodstain.background = (100, 0, 0, 255)
+    for point in pointsInView(screen, map.bloodstains):
+        screen.setGlyph(ScreenLayer.BackgroundEffects, point, bloodstain)
+    _, y1, _, y2 = screen.viewBounds()
+    screen.revealMask(map.revealedTiles.mask(y1 * map.width, y2 * map.width), y1 * map.width)
+    screen.setVisible(pointsInView(screen, map.visibleTiles))
+
+
+@PROFILER.profile
+def drawParticles(screen: Screen) -> None:
+    map: Map = ECS.scene.resources.map
+    entities = ECS.scene.filter(Position.id | Renderable.id | ParticleLifetime.id)
+    for entity in entities:
+        position: Position = entity[Position.id]
+        if Point(position.x, position.y) in map.visibleTiles:
+            render: Renderable = entity[Renderable.id]
+            screen.setGlyph(ScreenLayer.ForegroundEffects, Point(position.x, position.y), render)
@@ -0,0 +1,132 @@
+import sys
+import json
+import base64
+import getopt
+
+from array import array
+from itertools import compress
+
+KEYFRAME_INTERVAL = 64
+TILE_GLYPHS = "#.>"  # by TileType value
+
+
+# the tiles after each build step as the cells that changed, with the whole grid every KEYFRAME_INTERVAL steps
+class GenerationHistory:
+    def __init__(self, width: int, height: int, keyframeInterval: int = KEYFRAME_INTERVAL):
+        self.width = width
+        self.height = height
+        self.keyframeInterval = keyframeInterval
+        self.keyframes: list[bytes] = list()
+        self.indexes: list[array] = list()  # per step, the cells changed since the step before
+        self.values: list[bytes] = list()
+        self.last = bytes(width * height)
+
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+    # a step is kept only when it changed a tile
+    def record(self, cells: bytes | bytearray) -> None:
+        size = len(self.last)
+        changed = (int.from_bytes(self.last, "little") ^ int.from_bytes(cells, "little")).to_bytes(size, "little")
+        if self.indexes and not any(changed):
+            return
+        indexes = array("I", compress(range(size), changed))
+        self.indexes.append(indexes)
+        self.values.append(bytes(cells[index] for index in indexes))
+        self.last = bytes(cells)
+        if (len(self.indexes) - 1) % self.keyframeInterval == 0:
+            self.keyframes.append(self.last)
+
+    # the tiles of any step from the keyframe before it
+    def cells(self, step: int) -> bytearray:
+        if not 0 <= step < len(self.indexes):
+            raise IndexError(f"Step {step} out of {len(self.indexes)}")
+        first = step - step % self.keyframeInterval
+        cells = bytearray(self.keyframes[first // self.keyframeInterval])
+        for current in range(first + 1, step + 1):
+            for index, value in zip(self.indexes[current], self.values[current]):
+                cells[index] = value
+        return cells
+
+    def text(self, step: int) -> str:
+        cells = self.cells(step)
+        return "\n".join("".join(TILE_GLYPHS[value] for value in cells[row * self.width:(row + 1) * self.width]) for row in range(self.height))
+
+    def save(self, path: str) -> None:
+        data = {
+            "width": self.width,
+            "height": self.height,
+            "keyframeInterval": self.keyframeInterval,
+            "keyframes": [base64.b64encode(keyframe).decode() for keyframe in self.keyframes],
+            "steps": [[list(indexes), list(values)] for indexes, values in zip(self.indexes, self.values)],
+        }
+        with open(path, "w") as outfile:
+            json.dump(data, outfile, separators=(",", ":"))
+
+    @staticmethod
+    def load(path: str) -> "GenerationHistory":
+        with open(path) as infile:
+            data = json.load(infile)
+        history = GenerationHistory(data["width"], data["height"], data["keyframeInterval"])
+        history.keyframes = [base64.b64decode(keyframe) for keyframe in data["keyframes"]]
+        history.indexes = [array("I", indexes) for indexes, _ in data["steps"]]
+        history.values = [bytes(values) for _, values in data["steps"]]
+        if history.indexes:
+            history.last = bytes(history.cells(len(history) - 1))
+        return history
+
+
+# builds one level with the history on and writes it, or prints a step of a written history
+if __name__ == "__main__":
+    import map_builders.mapBuilderBase
+
+    from algorithms import Random
+    from map_builders.mapBuilder import MapBuilder
+    from map_builders.mapBuilderBase import MAP_HEIGHT, MAP_WIDTH
+
+    seed = 0
+    builderIndex = 0
+    width = MAP_WIDTH
+    height = MAP_HEIGHT
+    depth = 1
+    output = "./generation.json"
+    tracePath = None
+    step = -1
+    helpMessage = "python -m map_builders.generationHistory -h | [-r <random seed>] [-b <builder index>] [-s <width>x<height>] [-d <depth>] [-o <history json>] | -l <history json> [-i <step to print, default the last>]"
+
+    try:
+        opts, _ = getopt.getopt(sys.argv[1:], "hr:b:s:d:o:l:i:")
+    except getopt.GetoptError:
+        print(helpMessage)
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt == '-h':
+            print(helpMessage)
+            sys.exit(0)
+        if opt == '-r':
+            seed = int(arg)
+        if opt == '-b':
+            builderIndex = int(arg)
+        if opt == '-s':
+            width, height = (int(value) for value in arg.split("x"))
+        if opt == '-d':
+            depth = int(arg)
+        if opt == '-o':
+            output = arg
+        if opt == '-l':
+            tracePath = arg
+        if opt == '-i':
+            step = int(arg)
+
+    if tracePath is not None:
+        history = GenerationHistory.load(tracePath)
+        step = step if step >= 0 else len(history) + step
+        print(f"step {step} of {len(history)}")
+        print(history.text(step))
+    else:
+        map_builders.mapBuilderBase.RECORD_SNAPSHOTS = True
+        builder = MapBuilder()._builderTable()[builderIndex]
+        builder.build(width, height, depth, Random(seed))
+        builder.history.save(output)
+        print(f"{builder.name}: {len(builder.history)} steps of {width}x{height} written to {output}")
@@ -4,21 +4,23 @@ from algorithms.random import Random
 from core import ECS
 from map import Map
 from map_builders.BSPMap import BSPDungeonBuilder
-from map_builders.mapBuilderBase import MAP_HEIGHT, MAP_WIDTH, MapBuilderBase
+from map_builders.mapBuilderBase import MapBuilderBase
 from map_builders.simpleMap import SimpleMapBuilder
 
+import map_builders.mapBuilderBase
+
 
 class MapBuilder(MapBuilderBase):
 
     def build(self, depth: int):
-        rand: Random = ECS.scene.retrieve("random")
+        rand: Random = ECS.scene.resources.random
         self.depth = depth
         self.builder = rand.choice(self._builderTable())
-        self.map, self.startPosition = self.builder.build(MAP_WIDTH, MAP_HEIGHT, depth, rand)
-        self.snapshotHistory = self.builder.snapshotHistory
+        self.map, self.startPosition = self.builder.build(map_builders.mapBuilderBase.MAP_WIDTH, map_builders.mapBuilderBase.MAP_HEIGHT, depth, rand)
+        self.history = self.builder.history
 
     def spawn(self):
-        rand: Random = ECS.scene.retrieve("random")
+        rand: Random = ECS.scene.resources.random
         self.builder.spawn(ECS.scene, self.map, self.depth, rand)
     
     def _builderTable(self) -> list[MapBuilderBase]:
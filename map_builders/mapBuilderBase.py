@@ -2,11 +2,13 @@
 from algorithms.point import Point
 from algorithms.random import Random
 from core import Scene
-from map import Map, Rect, TileType
+from map import Map, Rect, TileGrid, TileType
+from map_builders.generationHistory import GenerationHistory
 from spawner import createBearTrap, createConfusionScroll, createDagger, createFireballScroll, createGoblin, createHealthPotion, createLongSword, createMagicMapperScroll, createMagicMissileScroll, createOrc, createRations, createShield, createTowerShield, roomTable
 
-MAP_WIDTH = 80
+MAP_WIDTH = 80  # the size of every level, main.py and headless.py take it from -m
 MAP_HEIGHT = 30
+RECORD_SNAPSHOTS = False  # the steps of each build, only the map generation visualizer shows them
 
 
 class MapBuilderBase:
@@ -16,7 +18,8 @@ class MapBuilderBase:
         self.map: Map
         self.startPosition: Point
         self.depth: int = 1
-        self.snapshotHistory: list[Map] = list()
+        self.history: GenerationHistory | None = None  # the steps of the last build when recorded
+        self.historyMap: Map | None = None
 
     def build(self, width: int, height: int, depth: int, rand: Random) -> tuple[Map, Point]:
         return (Map(width, height), Point())
@@ -25,12 +28,24 @@ class MapBuilderBase:
         pass
 
     def takeSnapshot(self):
-        clone = self.map.clone()
-        clone.revealedTiles = set(clone.tiles.keys())
-        clone.visibleTiles = set(clone.tiles.keys())
-        self.snapshotHistory.append(clone)
+        if RECORD_SNAPSHOTS:
+            if self.history is None or self.historyMap is not self.map:
+                self.history = GenerationHistory(self.map.width, self.map.height)
+                self.historyMap = self.map
+            self.history.record(self.map.cells)
+
+    # a fully revealed map with the tiles of one step
+    def snapshot(self, index: int) -> Map:
+        map = Map(self.history.width, self.history.height)
+        map.setCells(self.history.cells(index))
+        map.revealedTiles.fill()
+        map.visibleTiles.fill()
+        return map
 
     def applyRoomToMap(self, tiles: dict[Point, TileType], room: Rect) -> None:
+        if isinstance(tiles, TileGrid):
+            tiles.map.fillRect(room.x1, room.y1, room.x2, room.y2, TileType.Floor)
+            return
         for y in range(room.y1, room.y2):
             for x in range(room.x1, room.x2):
                 tiles[Point(x, y)] = TileType.Floor
@@ -0,0 +1,96 @@
+import json
+
+from algorithms import Point
+from component import CombatStats, Equipped, InBackpack, ParticleLifetime, Position
+from core import ECS, Entity, Scene
+from runState import RunState
+from simulation import MENU_STATES, cancelMenu, dropItem, removeItem, useItem
+
+
+# the keys accepted by playerInput and the outcome of the item menus, enough to play a seeded game again
+
+
+# where the game ended up, compared after playing a replay; particles live for frames, not turns, so they are left out
+def fingerprint() -> list[int]:
+    player: Entity = ECS.scene.resources.player
+    position: Position = player[Position.id]
+    stats: CombatStats = player[CombatStats.id]
+    entities = len(ECS.scene.entities) - len(ECS.scene.filter(ParticleLifetime.id))
+    return [ECS.scene.resources.turn, position.x, position.y, stats.HP, entities]
+
+
+class Replay:
+    __slots__ = ["seed", "actions", "final"]
+
+    def __init__(self, seed: int, actions: list[list] | None = None, final: list[int] | None = None):
+        self.seed = seed
+        self.actions: list[list] = actions if actions is not None else list()
+        self.final = final
+
+    def record(self, *action) -> None:
+        self.actions.append(list(action))
+
+    def save(self, path: str) -> None:
+        self.final = fingerprint()
+        with open(path, "w") as outfile:
+            json.dump({"seed": self.seed, "final": self.final, "actions": self.actions}, outfile, separators=(",", ":"))
+
+    @staticmethod
+    def load(path: str) -> "Replay":
+        with open(path) as infile:
+            data = json.load(infile)
+        return Replay(data["seed"], data["actions"], data["final"])
+
+
+# feeds the recorded actions instead of the device, one frame at a time, to the scene the game plays in
+class ReplayInput:
+    def __init__(self, replay: Replay, scene: Scene):
+        self.actions = replay.actions
+        self.scene = scene
+        self.next = 0
+
+    @property
+    def done(self) -> bool:
+        return self.next >= len(self.actions)
+
+    # fills the keys of the scene's context for the frame and answers the menus, returns False once the replay is over
+    def feed(self) -> bool:
+        keys = self.scene.world.context.keys
+        keys.clear()
+        resources = self.scene.resources
+        runState: RunState = resources.state
+        if runState == RunState.WaitingInput and not resources.cleaningInput:
+            if self.done:
+                return False
+            kind, recorded = self._take()
+            if kind != "keys":
+                raise ValueError(f"Replay expected keys at action {self.next - 1}, found {kind}")
+            keys.update(recorded)
+        elif runState in MENU_STATES:
+            if self.done:
+                return False
+            self._answerMenu(*self._take())
+        return runState != RunState.GameOver
+
+    def _take(self) -> list:
+        action = self.actions[self.next]
+        self.next += 1
+        return action
+
+    def _answerMenu(self, kind: str, *args) -> None:
+        scene = self.scene
+        player: Entity = scene.resources.player
+        if kind == "use":
+            index, target = args
+            useItem(scene.children(InBackpack.id, player)[index], None if target is None else Point(*target))
+        elif kind == "drop":
+            dropItem(scene.children(InBackpack.id, player)[args[0]])
+        elif kind == "remove":
+            removeItem(scene.children(Equipped.id, player)[args[0]])
+        elif kind == "cancel":
+            cancelMenu()
+            scene.resources.state = RunState.WaitingInput
+            return
+        else:
+            raise ValueError(f"Replay expected a menu answer at action {self.next - 1}, found {kind}")
+        scene.resources.state = RunState.CloseGUI
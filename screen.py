@@ -2,12 +2,16 @@
 import pygame
 
 from enum import IntEnum
+from typing import Callable, Iterable, Iterator
 from algorithms.point import Point
 from component import Renderable
+from core import PROFILER
 from device import Font
 
 TRANSPARENT = pygame.color.Color((255, 255, 255, 0))
 BLACK = (0, 0, 0)
+CHUNK_SIZE = 32  # cells per side of the chunks that keep the map background
+CHUNK_MARGIN = 8  # cells around the view whose chunks stay loaded, walking back and forth over a border does not reload them
 
 
 class ScreenLayer(IntEnum):
@@ -22,90 +26,190 @@ class ScreenLayer(IntEnum):
     Interface = 8
 
 
+# drawn once for the whole map, kept in chunks near the view; the other layers are the size of the view and drawn every frame
+CHUNK_LAYERS = (ScreenLayer.BackgroundRevealed, ScreenLayer.FogRevealed, ScreenLayer.BackgroundVisible)
+
+
+# width and height are the map, the view is the part of it on screen, all of it by default
 class Screen:
-    def __init__(self, width: int, height: int, font: Font) -> None:
+    def __init__(self, width: int, height: int, font: Font, viewWidth: int | None = None, viewHeight: int | None = None) -> None:
         self.width = width
         self.height = height
+        self.viewWidth = width if viewWidth is None else viewWidth
+        self.viewHeight = height if viewHeight is None else viewHeight
         self.font = font
         self.camera = Point(0, 0)
+        self.view = Point(0, 0)  # the map cell at the top left of the view
         self.dx = (self.font.size + 4)//2
         self.dy = self.font.size + 3
         self.enableFOG = True
-        self.layers: list[pygame.Surface] = list()
-        self.tmp = pygame.Surface((width * self.dx, height * self.dy), pygame.SRCALPHA)
-        for _ in ScreenLayer:
-            surface = pygame.Surface((width * self.dx, height * self.dy), pygame.SRCALPHA)
-            surface.fill(BLACK)
-            self.layers.append(surface)
-        self.revealed: list[list[bool]] = list()
-        for y in range(height):
-            self.revealed.append(list())
-            for _ in range(width):
-                self.revealed[y].append(False)
+        self.background: Callable[[int, int, int, int], None] | None = None  # draws the map cells x1 <= x < x2, y1 <= y < y2 of a chunk when it loads
+        self.chunks: dict[tuple[int, int], dict[ScreenLayer, pygame.Surface]] = dict()
+        self.layers: dict[ScreenLayer, pygame.Surface] = dict()
+        self.tmp = pygame.Surface((self.viewWidth * self.dx, self.viewHeight * self.dy), pygame.SRCALPHA)
+        for layer in ScreenLayer:
+            if layer not in CHUNK_LAYERS:
+                surface = pygame.Surface((self.viewWidth * self.dx, self.viewHeight * self.dy), pygame.SRCALPHA)
+                surface.fill(BLACK)
+                self.layers[layer] = surface
+        self.revealed = bytearray(width * height)
+        self.stream()
 
     def clear(self):
         for layer in [ScreenLayer.Items, ScreenLayer.Entities, ScreenLayer.ForegroundEffects, ScreenLayer.Interface]:
             self.layers[layer].fill(BLACK)
 
-    def reset(self):
-        for layer in ScreenLayer:
-            self.layers[layer].fill(BLACK)
-        for y in range(self.height):
-            for x in range(self.width):
-                self.revealed[y][x] = False
+    # forgets the map drawn, the chunks are drawn again from the background
+    def reset(self, width: int | None = None, height: int | None = None):
+        self.width = self.width if width is None else width
+        self.height = self.height if height is None else height
+        for layer in self.layers.values():
+            layer.fill(BLACK)
+        self.chunks.clear()
+        self.revealed = bytearray(self.width * self.height)
+        self.view = self.clampView(self.view.x, self.view.y)
+        self.stream()
+
+    def clampView(self, x: int, y: int) -> Point:
+        return Point(max(0, min(x, self.width - self.viewWidth)), max(0, min(y, self.height - self.viewHeight)))
+
+    # the map cells x1 <= x < x2, y1 <= y < y2 in the view
+    def viewBounds(self) -> tuple[int, int, int, int]:
+        return (self.view.x, self.view.y, min(self.view.x + self.viewWidth, self.width), min(self.view.y + self.viewHeight, self.height))
+
+    # centers the view on the point as far as the map allows
+    def follow(self, point: Point) -> None:
+        view = self.clampView(point.x - self.viewWidth // 2, point.y - self.viewHeight // 2)
+        if view != self.view:
+            self.view = view
+            self.layers[ScreenLayer.FogVisible].fill(BLACK)
+            self.layers[ScreenLayer.BackgroundEffects].fill(BLACK)
+            self.stream()
+
+    # loads the chunks under the view and drops the ones away from it
+    def stream(self) -> None:
+        x1, y1, x2, y2 = self.viewBounds()
+        keep = ((x1 - CHUNK_MARGIN) // CHUNK_SIZE, (y1 - CHUNK_MARGIN) // CHUNK_SIZE, (x2 + CHUNK_MARGIN - 1) // CHUNK_SIZE, (y2 + CHUNK_MARGIN - 1) // CHUNK_SIZE)
+        for key in [key for key in self.chunks if not (keep[0] <= key[0] <= keep[2] and keep[1] <= key[1] <= keep[3])]:
+            del self.chunks[key]
+        for cy in range(y1 // CHUNK_SIZE, (y2 - 1) // CHUNK_SIZE + 1):
+            for cx in range(x1 // CHUNK_SIZE, (x2 - 1) // CHUNK_SIZE + 1):
+                if (cx, cy) not in self.chunks:
+                    self.loadChunk(cx, cy)
+
+    def loadChunk(self, cx: int, cy: int) -> None:
+        chunk: dict[ScreenLayer, pygame.Surface] = dict()
+        for layer in CHUNK_LAYERS:
+            surface = pygame.Surface((CHUNK_SIZE * self.dx, CHUNK_SIZE * self.dy), pygame.SRCALPHA)
+            surface.fill(BLACK)
+            chunk[layer] = surface
+        self.chunks[(cx, cy)] = chunk
+        x1, y1 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+        x2, y2 = min(x1 + CHUNK_SIZE, self.width), min(y1 + CHUNK_SIZE, self.height)
+        if self.background is not None:
+            self.background(x1, y1, x2, y2)
+        for y in range(y1, y2):
+            start = y * self.width
+            x = self.revealed.find(1, start + x1, start + x2)
+            while x >= 0:
+                self.revealFog(x - start, y)
+                x = self.revealed.find(1, x + 1, start + x2)
+
+    # the chunks in the view with their position in it
+    def viewChunks(self) -> Iterator[tuple[tuple[int, int], dict[ScreenLayer, pygame.Surface]]]:
+        x1, y1, x2, y2 = self.viewBounds()
+        for cy in range(y1 // CHUNK_SIZE, (y2 - 1) // CHUNK_SIZE + 1):
+            for cx in range(x1 // CHUNK_SIZE, (x2 - 1) // CHUNK_SIZE + 1):
+                chunk = self.chunks.get((cx, cy))
+                if chunk is not None:
+                    yield ((cx * CHUNK_SIZE - x1) * self.dx, (cy * CHUNK_SIZE - y1) * self.dy), chunk
 
     def screenPositionToGrid(self, x: int, y: int) -> tuple[int, int]:
-        return (x // self.dx - self.camera.x, y // self.dy - self.camera.y)
+        return (x // self.dx - self.camera.x + self.view.x, y // self.dy - self.camera.y + self.view.y)
 
     def gridPositionToScreen(self, x: int, y: int) -> tuple[int, int]:
-        return ((self.camera.x + x) * self.dx, (self.camera.y + y) * self.dy + 6)
+        return ((self.camera.x + x - self.view.x) * self.dx, (self.camera.y + y - self.view.y) * self.dy + 6)
 
+    # points of the chunk layers outside the loaded chunks are not drawn, the background draws them when their chunk loads
     def setGlyph(self, layer: ScreenLayer, point: Point, render: Renderable) -> None:
-        surface = self.layers[layer]
+        if layer in CHUNK_LAYERS:
+            chunk = self.chunks.get((point.x // CHUNK_SIZE, point.y // CHUNK_SIZE))
+            if chunk is None:
+                return
+            surface = chunk[layer]
+            x, y = point.x % CHUNK_SIZE, point.y % CHUNK_SIZE
+        else:
+            surface = self.layers[layer]
+            x, y = point.x - self.view.x, point.y - self.view.y
         fg = pygame.color.Color(render.foreground)
         bg = pygame.color.Color(render.background)
 
         textSurface, rect = self.font.font.render(render.glyph, fg, bg)
-        rect.x += point.x * self.dx
-        rect.y = point.y * self.dy + (self.dy - rect.y)
+        rect.x += x * self.dx
+        rect.y = y * self.dy + (self.dy - rect.y)
 
-        area = pygame.rect.Rect(point.x * self.dx, point.y * self.dy, self.dx, self.dy)
+        area = pygame.rect.Rect(x * self.dx, y * self.dy, self.dx, self.dy)
         surface.fill(bg, area, special_flags=pygame.BLEND_RGBA_MAX)
         surface.blit(textSurface, rect, special_flags=pygame.BLEND_RGBA_MAX)
 
-    def setVisible(self, points: set[Point]) -> None:
+    def setVisible(self, points: Iterable[Point]) -> None:
         if self.enableFOG:
-            self.layers[ScreenLayer.FogVisible].fill((0, 0, 0))
+            layer = self.layers[ScreenLayer.FogVisible]
+            layer.fill((0, 0, 0))
             for p in points:
-                area = pygame.rect.Rect(p.x * self.dx, p.y * self.dy, self.dx, self.dy)
-                self.layers[ScreenLayer.FogVisible].fill(TRANSPARENT, area)
-                if not self.revealed[p.y][p.x]:
-                    self.revealed[p.y][p.x] = True
-                    self.layers[ScreenLayer.FogRevealed].fill(TRANSPARENT, area)
-    
-    def setRevealed(self, points: set[Point]) -> None:
+                area = pygame.rect.Rect((p.x - self.view.x) * self.dx, (p.y - self.view.y) * self.dy, self.dx, self.dy)
+                layer.fill(TRANSPARENT, area)
+                self.reveal(p.x, p.y)
+
+    def setRevealed(self, points: Iterable[Point]) -> None:
         if self.enableFOG:
             for p in points:
-                if not self.revealed[p.y][p.x]:
-                    self.revealed[p.y][p.x] = True
-                    area = pygame.rect.Rect(p.x * self.dx, p.y * self.dy, self.dx, self.dy)
-                    self.layers[ScreenLayer.FogRevealed].fill(TRANSPARENT, area)
+                self.reveal(p.x, p.y)
 
+    # the cells set in a mask of one byte per map cell from index start, as TileLayer.mask gives, only the ones not revealed before are drawn
+    def revealMask(self, mask: bytes, start: int = 0) -> None:
+        if self.enableFOG:
+            size = len(mask)
+            added = int.from_bytes(mask, "little") & ~int.from_bytes(self.revealed[start:start + size], "little")
+            if added == 0:
+                return
+            cells = added.to_bytes(size, "little")
+            index = cells.find(1)
+            while index >= 0:
+                self.revealed[start + index] = 1
+                self.revealFog((start + index) % self.width, (start + index) // self.width)
+                index = cells.find(1, index + 1)
+
+    def reveal(self, x: int, y: int) -> None:
+        if 0 <= x < self.width and 0 <= y < self.height and not self.revealed[y * self.width + x]:
+            self.revealed[y * self.width + x] = 1
+            self.revealFog(x, y)
+
+    def revealFog(self, x: int, y: int) -> None:
+        chunk = self.chunks.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+        if chunk is not None:
+            area = pygame.rect.Rect(x % CHUNK_SIZE * self.dx, y % CHUNK_SIZE * self.dy, self.dx, self.dy)
+            chunk[ScreenLayer.FogRevealed].fill(TRANSPARENT, area)
+
+    @PROFILER.profile
     def draw(self):
+        self.stream()
         screen = self.font.device.screen
         screen.fill((0, 0, 0))
         point = (self.camera.x * self.dx, self.camera.y * self.dy)
+        chunks = [((point[0] + x, point[1] + y), (x, y), chunk) for (x, y), chunk in self.viewChunks()]
+        screen.set_clip(pygame.rect.Rect(point, self.tmp.get_size()))
 
         tmp = self.tmp
         tmp.fill((0, 0, 0))
 
-        layer = self.layers[ScreenLayer.BackgroundRevealed]
-        screen.blit(layer, point)
-        layer = self.layers[ScreenLayer.FogRevealed]
-        screen.blit(layer, point, special_flags=pygame.BLEND_MIN)
+        for position, _, chunk in chunks:
+            screen.blit(chunk[ScreenLayer.BackgroundRevealed], position)
+        for position, _, chunk in chunks:
+            screen.blit(chunk[ScreenLayer.FogRevealed], position, special_flags=pygame.BLEND_MIN)
 
-        layer = self.layers[ScreenLayer.BackgroundVisible]
-        tmp.blit(layer, (0, 0))
+        for _, position, chunk in chunks:
+            tmp.blit(chunk[ScreenLayer.BackgroundVisible], position)
         layer = self.layers[ScreenLayer.FogVisible]
         tmp.blit(layer, (0, 0), special_flags=pygame.BLEND_MIN)
         screen.blit(tmp, point, special_flags=pygame.BLEND_ADD)
@@ -120,6 +224,7 @@ class Screen:
         for current in [ScreenLayer.Items, ScreenLayer.Entities, ScreenLayer.ForegroundEffects]:
             layer = self.layers[current]
             screen.blit(layer, point, special_flags=pygame.BLEND_MAX)
+        screen.set_clip(None)
 
     def drawInterface(self):
         screen = self.font.device.screen
@@ -0,0 +1,472 @@
+
+import time
+import pickle
+
+from algorithms import Random, Point
+from component import BlocksTile, CombatStats, Confusion, Consumable, DefenseBonus, EntryTrigger, Equippable, Equipped, Hidden, HungerClock, InBackpack, InflictsDamage, MeleePowerBonus, Monster, ParticleLifetime, Player, Position, Renderable, Name, SingleActivation, Viewshed, WantsToMelee, WantsToRemoveItem, WantsToUseItem, WantsToDropItem
+from core import ECS, PROFILER, Context, Entity, Scene, Scheduler
+from map import TileType, Map
+from map_builders.mapBuilder import MapBuilder
+from player import getItem, tryMovePlayer
+from runState import RunState
+from spawner import createPlayer
+from system.hungerSystem import hungerSystem
+from system.damageSystem import damageSystem, deleteTheDead
+from system.inventorySystem import itemCollectionSystem, itemDropSystem, itemRemoveSystem, itemUseSystem
+from system.mapIndexSystem import mapIndexSystem
+from system.meleeCombatSystem import meleeCombatSystem
+from system.monsterAI import monsterAISystem
+from system.particleSystem import cullDeadParticles
+from system.triggerSystem import triggerSystem
+from system.visibilitySystem import visibilitySystem
+from utils import Logger, Statistics
+
+# the game rules without pygame: main.py draws on top of it, headless.py drives it from scripted input
+
+SAVE_DATA_FILE_NAME = "./save.data"
+MENU_STATES = (RunState.ShowInventory, RunState.ShowDropItem, RunState.ShowRemoveItem, RunState.ShowTargeting)
+REST_TURNS = 100
+
+
+
+def tryNextLevel() -> bool:
+    map: Map = ECS.scene.resources.map
+    player: Entity = ECS.scene.resources.player
+    position: Position = player.get(Position.id)
+    point = Point(position.x, position.y)
+    if point in map.tiles and map.tiles[point] == TileType.DownStairs:
+        return True
+    return False
+
+
+def enemyInView() -> bool:
+    map: Map = ECS.scene.resources.map
+    for pos in map.visibleTiles:
+        if pos in map.tileContent:
+            for entity in map.tileContent[pos]:
+                if not entity.has(Player.id) and entity.has(CombatStats.id):
+                    return True
+    return False
+
+
+def isHungry() -> bool:
+    player: Entity = ECS.scene.resources.player
+    hunger: HungerClock = player[HungerClock.id]
+    return hunger.hungerState == HungerClock.STARVING or hunger.hungerState == HungerClock.HUNGRY
+
+
+def skipTurn() -> None:
+    player: Entity = ECS.scene.resources.player
+    canHeal = not enemyInView() and not isHungry()
+    if canHeal:
+        stats: CombatStats = player.get(CombatStats.id)
+        stats.HP = min(stats.maxHP, stats.HP + 1)
+
+
+@PROFILER.profile
+def generateWorldMap(depth: int) -> MapBuilder:
+    builder = MapBuilder()
+    builder.build(depth)
+    builder.spawn()
+    ECS.scene.resources.map = builder.map
+    player: Entity = ECS.scene.resources.player
+    position: Position = player.get(Position.id)
+    position.x = builder.startPosition.x
+    position.y = builder.startPosition.y
+    player.markChanged(Viewshed.id)
+    return builder
+
+
+def gotoNextLevel() -> None:
+    player: Entity = ECS.scene.resources.player
+    entities = set(ECS.scene.children(InBackpack.id, player))
+    entities.add(player)
+    entities.update(ECS.scene.children(Equipped.id, player))
+    ECS.scene.setEntities(entities)
+    map: Map = ECS.scene.resources.map
+    generateWorldMap(map.depth + 1)
+
+    logger: Logger = ECS.scene.resources.logger
+    logger.log("You descend to the next level, and take a moment to heal.")
+    stats: CombatStats = player.get(CombatStats.id)
+    stats.HP = max((stats.maxHP + 1) // 2, stats.HP)
+
+
+# a new game in the same scene after the player died
+def restart() -> None:
+    ECS.scene.clear()
+    player = createPlayer(ECS.scene, 0, 0)
+    ECS.scene.resources.player = player
+    generateWorldMap(1)
+
+    logger: Logger = ECS.scene.resources.logger
+    logger.clear()
+    ECS.scene.resources.statistics = Statistics()
+    ECS.scene.resources.turn = 1
+    stopResting()
+
+
+# the keys of a command are released before the next one is read, the state it leads to waits in cleaningInputNextState
+def playerInput(keys: set[str]) -> RunState:
+    resources = ECS.scene.resources
+    if resources.cleaningInput:
+        if len(ECS.context.keys) == 0:
+            resources.cleaningInput = False
+            toReturn = resources.cleaningInputNextState
+            resources.cleaningInputNextState = RunState.WaitingInput
+            return toReturn
+        else:
+            return RunState.WaitingInput
+
+    if resources.resting:
+        return rest(keys)
+
+    if "k" in keys or "[8]" in keys or "up" in keys:
+        tryMovePlayer(0, -1)
+    elif "j" in keys or "[2]" in keys or "down" in keys:
+        tryMovePlayer(0, +1)
+    elif "h" in keys or "[4]" in keys or "left" in keys:
+        tryMovePlayer(-1, 0)
+    elif "l" in keys or "[6]" in keys or "right" in keys:
+        tryMovePlayer(+1, 0)
+    elif "y" in keys or "[9]" in keys:
+        tryMovePlayer(+1, -1)
+    elif "u" in keys or "[7]" in keys:
+        tryMovePlayer(-1, -1)
+    elif "n" in keys or "[3]" in keys:
+        tryMovePlayer(+1, +1)
+    elif "b" in keys or "[1]" in keys:
+        tryMovePlayer(-1, +1)
+    elif "g" in keys or "[5]" in keys:
+        resources.cleaningInput = True
+        if not getItem():
+            logger: Logger = resources.logger
+            logger.log("There is nothing here to pick up.")
+        else:
+            resources.cleaningInputNextState = RunState.PlayerTurn
+    elif "i" in keys:
+        resources.cleaningInput = True
+        resources.cleaningInputNextState = RunState.ShowInventory
+    elif "d" in keys:
+        resources.cleaningInput = True
+        resources.cleaningInputNextState = RunState.ShowDropItem
+    elif "r" in keys:
+        resources.cleaningInput = True
+        resources.cleaningInputNextState = RunState.ShowRemoveItem
+    elif '.' in keys:
+        resources.cleaningInput = True
+        if tryNextLevel():
+            resources.cleaningInputNextState = RunState.NextLevel
+        else:
+            logger: Logger = resources.logger
+            logger.log("There is no way down from here.")
+    elif 'space' in keys:
+        resources.cleaningInput = True
+        skipTurn()
+        logger: Logger = resources.logger
+        logger.log("Turn skipped.")
+        resources.cleaningInputNextState = RunState.PlayerTurn
+    elif 'z' in keys:  # not recorded, each turn of the rest is recorded as a skipped turn
+        resources.cleaningInput = True
+        startResting()
+        return RunState.WaitingInput
+    else:
+        return RunState.WaitingInput
+
+    record("keys", sorted(keys))
+    if resources.cleaningInput:
+        return RunState.WaitingInput
+
+    return RunState.PlayerTurn
+
+
+# resting holds the turns left of a rest started with z, they are played without waiting for keys
+def startResting() -> None:
+    resources = ECS.scene.resources
+    player: Entity = resources.player
+    stats: CombatStats = player.get(CombatStats.id)
+    resources.resting = REST_TURNS
+    resources.restingHP = stats.HP
+    logger: Logger = resources.logger
+    logger.log("You rest.")
+
+
+def stopResting() -> None:
+    ECS.scene.resources.resting = 0
+
+
+# one skipped turn of the rest, unless something calls the player's attention
+def rest(keys: set[str]) -> RunState:
+    resources = ECS.scene.resources
+    player: Entity = resources.player
+    stats: CombatStats = player.get(CombatStats.id)
+    reason = None
+    if keys:
+        reason = "You stop resting."
+    elif stats.HP < resources.restingHP:
+        reason = "You are hurt and stop resting."
+    elif enemyInView():
+        reason = "An enemy comes into view."
+    elif isHungry():
+        reason = "You are too hungry to rest."
+    elif stats.HP >= stats.maxHP:
+        reason = "You are fully rested."
+
+    if reason is not None:
+        stopResting()
+        logger: Logger = resources.logger
+        logger.log(reason)
+        if keys:  # the key only interrupts, it is released before it plays
+            resources.cleaningInput = True
+            resources.cleaningInputNextState = RunState.WaitingInput
+        return RunState.WaitingInput
+
+    resources.resting -= 1
+    skipTurn()
+    resources.restingHP = stats.HP
+    record("keys", ["space"])
+    if resources.resting == 0:
+        logger: Logger = resources.logger
+        logger.log(f"You rested {REST_TURNS} turns.")
+    return RunState.PlayerTurn
+
+
+# plays the rest without drawing until it ends or the time of a frame is spent, returns the turns played
+def fastForward(seconds: float) -> int:
+    turns = 0
+    deadline = time.perf_counter() + seconds
+    while ECS.scene.resources.resting and time.perf_counter() < deadline:
+        runState: RunState = ECS.scene.resources.state
+        if runState == RunState.GameOver:
+            stopResting()
+            break
+        simulate(save=False)
+        cullDeadParticles()
+        ECS.scene.flush()
+        if runState == RunState.MonsterTurn:
+            turns += 1
+    return turns
+
+
+# into the recording resource, stored only while the game is being recorded
+def record(*action) -> None:
+    recording = getattr(ECS.scene.resources, "recording", None)
+    if recording is not None:
+        recording.record(*action)
+
+
+# outcomes of the item menus, items are recorded by their place in the player's backpack or equipment
+def useItem(item: Entity, target: Point | None = None) -> None:
+    player: Entity = ECS.scene.resources.player
+    record("use", ECS.scene.children(InBackpack.id, player).index(item), None if target is None else [target.x, target.y])
+    player.add(WantsToUseItem.acquire(item, target))
+
+
+def dropItem(item: Entity) -> None:
+    player: Entity = ECS.scene.resources.player
+    record("drop", ECS.scene.children(InBackpack.id, player).index(item))
+    player.add(WantsToDropItem(item))
+
+
+def removeItem(item: Entity) -> None:
+    player: Entity = ECS.scene.resources.player
+    record("remove", ECS.scene.children(Equipped.id, player).index(item))
+    player.add(WantsToRemoveItem(item))
+
+
+def cancelMenu() -> None:
+    record("cancel")
+
+
+# entities created through the command buffer only show up at the next sync point, so spawning
+# particles is declared on the components no system of the turn reads
+def createScheduler(workers: int = 0) -> Scheduler:
+    particles = Renderable.id | ParticleLifetime.id
+    isMonsterTurn = lambda: ECS.scene.resources.state == RunState.MonsterTurn
+    scheduler = Scheduler(workers)
+    scheduler.add(visibilitySystem,
+                  reads=Position.id | Viewshed.id | Player.id | Hidden.id | Name.id,
+                  writes=Viewshed.id | Hidden.id,
+                  readResources=("map",),
+                  writeResources=("visibility", "random"))
+    scheduler.add(monsterAISystem,
+                  reads=Position.id | Viewshed.id | Monster.id | Name.id | Confusion.id | BlocksTile.id,
+                  writes=Position.id | Confusion.id | WantsToMelee.id | particles,
+                  writeResources=("map", "random"),
+                  emits=("move events",),
+                  condition=isMonsterTurn)
+    scheduler.add(mapIndexSystem,
+                  reads=Position.id | BlocksTile.id,
+                  writeResources=("map",))
+    scheduler.add(triggerSystem,
+                  reads=Position.id | EntryTrigger.id | Name.id | InflictsDamage.id | SingleActivation.id | Hidden.id,
+                  writes=Hidden.id | particles,
+                  readResources=("map",),
+                  writeResources=("move events",),
+                  emits=("damage events",))
+    scheduler.add(itemCollectionSystem,
+                  reads=Position.id | Name.id,
+                  writes=Position.id | InBackpack.id,
+                  writeResources=("pickup events",))
+    scheduler.add(itemUseSystem,
+                  reads=Name.id | WantsToUseItem.id | CombatStats.id | Position.id | Equippable.id | Equipped.id | Consumable.id,
+                  writes=CombatStats.id | Confusion.id | HungerClock.id | Equipped.id | InBackpack.id | WantsToUseItem.id | particles,
+                  readResources=("map",),
+                  writeResources=("visibility",),
+                  emits=("damage events",))
+    scheduler.add(itemDropSystem,
+                  reads=Name.id | WantsToDropItem.id | Position.id,
+                  writes=Position.id | InBackpack.id | WantsToDropItem.id)
+    scheduler.add(itemRemoveSystem,
+                  reads=Name.id | WantsToRemoveItem.id,
+                  writes=Equipped.id | InBackpack.id | WantsToRemoveItem.id)
+    scheduler.add(meleeCombatSystem,
+                  reads=WantsToMelee.id | Name.id | CombatStats.id | Equipped.id | MeleePowerBonus.id | DefenseBonus.id | HungerClock.id | Position.id,
+                  writes=WantsToMelee.id | particles,
+                  emits=("damage events",))
+    scheduler.add(damageSystem,
+                  reads=CombatStats.id | Position.id,
+                  writes=CombatStats.id,
+                  writeResources=("bloodstains", "damage events", "statistics"))
+    scheduler.add(hungerSystem,
+                  reads=HungerClock.id | Player.id,
+                  writes=HungerClock.id,
+                  emits=("damage events",))
+    scheduler.add(deleteTheDead,
+                  reads=CombatStats.id | Player.id | Name.id,
+                  writes=CombatStats.id,
+                  writeResources=("statistics",))
+    return scheduler
+
+
+@PROFILER.profile
+def runSystems():
+    scene = ECS.scene
+    scheduler: Scheduler = scene.resources.scheduler
+    scheduler.run(scene)
+
+
+# advances the states that need no interface, the menus are left to the caller
+def simulate(save: bool = True):
+    runState: RunState = ECS.scene.resources.state
+    if runState == RunState.PlayerTurn:
+        runSystems()
+        runState = RunState.MonsterTurn
+    elif runState == RunState.MonsterTurn:
+        runSystems()
+        player: Entity = ECS.scene.resources.player
+        stats: CombatStats = player.get(CombatStats.id)
+        if stats.HP <= 0:
+            ECS.context.clear()
+            runState = RunState.GameOver
+        else:
+            turn: int = ECS.scene.resources.turn
+            ECS.scene.resources.turn = turn + 1
+            runState = RunState.WaitingInput
+        ECS.scene.resources.state = runState
+        if save:
+            saveState()
+    elif runState == RunState.NextLevel:
+        gotoNextLevel()
+        runSystems()
+        ECS.scene.resources.state = runState
+        runState = RunState.WaitingInput
+        if save:
+            saveState()
+    elif runState == RunState.WaitingInput:
+        runState = playerInput(ECS.context.keys)
+    elif runState == RunState.CloseGUI:
+        ECS.scene.resources.cleaningInput = True
+        ECS.scene.resources.cleaningInputNextState = RunState.WaitingInput
+        runState = RunState.PlayerTurn
+
+    ECS.scene.resources.state = runState
+
+
+def saveState():
+    data = dict()
+    logger: Logger = ECS.scene.resources.logger
+    data["state"] = ECS.scene.resources.state
+    data["turn"] = ECS.scene.resources.turn
+    data["map"] = ECS.scene.resources.map
+    data["random"] = ECS.scene.resources.random
+    data["logger messages"] = logger.messages
+    data["entitities"] = ECS.scene.entities
+    data["events"] = ECS.scene.events
+
+    with open(SAVE_DATA_FILE_NAME, "wb") as outfile:
+        pickle.dump(data, outfile)
+
+
+def loadState():
+    stopResting()
+    logger: Logger = ECS.scene.resources.logger
+    with open(SAVE_DATA_FILE_NAME, "rb") as infile:
+        data = pickle.load(infile)
+        logger.messages = data["logger messages"]
+        ECS.scene.resources.state = data["state"]
+        ECS.scene.resources.turn = data["turn"]
+        ECS.scene.resources.random = data["random"]
+        map:Map = data["map"]
+        ECS.scene.resources.map = map
+        ECS.scene.setEntities(data["entitities"])
+        if "events" in data:  # hunger damage emitted after the damage system of the saved turn
+            ECS.scene.events = data["events"]
+        player = ECS.scene.filter(Player.id)
+        player = list(player)[0]
+        ECS.scene.resources.player = player
+        player.markChanged(Viewshed.id)
+
+
+def registerResources(scene: Scene) -> None:
+    from replay import Replay  # replay plays through this module
+
+    resources = scene.resources
+    resources.register("map", Map)
+    resources.register("player", Entity)
+    resources.register("random", Random)
+    resources.register("seed", int)
+    resources.register("turn", int)
+    resources.register("state", RunState)
+    resources.register("logger", Logger)
+    resources.register("statistics", Statistics)
+    resources.register("builder", MapBuilder)
+    resources.register("playerPosition", tuple)
+    resources.register("scheduler", Scheduler)
+    resources.register("cleaningInput", bool)
+    resources.register("cleaningInputNextState", RunState)
+    resources.register("recording", Replay)
+    resources.register("resting", int)
+    resources.register("restingHP", int)
+
+
+def createScene(seed: int, state: RunState, logger: Logger) -> Scene:
+    scene = Scene()
+    scene.useColumns(CombatStats, "maxHP", "HP", "defense", "power")
+    scene.useColumns(HungerClock, "duration", groupBy=Player.id)
+    scene.useColumns(ParticleLifetime, "frames")
+    scene.useRelation(InBackpack, "owner")
+    scene.useRelation(Equipped, "owner", "slot")
+    registerResources(scene)
+    scene.resources.state = state
+    scene.resources.random = Random(seed)
+    scene.resources.seed = seed
+    scene.resources.logger = logger
+    scene.resources.statistics = Statistics()
+    scene.resources.turn = 1
+    scene.resources.cleaningInput = False
+    scene.resources.cleaningInputNextState = RunState.WaitingInput
+    scene.resources.resting = 0
+    scene.resources.restingHP = 0
+    return scene
+
+
+# makes the scene current and generates the first level, returns its builder for the generation visualizer
+def startGame(scene: Scene, workers: int = 0, depth: int = 1) -> MapBuilder:
+    ECS.scene = scene
+    ECS.context = Context()
+    scene.resources.scheduler = createScheduler(workers)
+
+    player = createPlayer(ECS.scene, 0, 0)
+    ECS.scene.resources.player = player
+    return generateWorldMap(depth)
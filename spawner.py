@@ -1,7 +1,7 @@
 
 from core import Entity, Scene
 from component import AreaOfEffect, BlocksTile, CombatStats, Confusion, Consumable, DefenseBonus, EntryTrigger, Equippable, GUIDescription, Hidden, HungerClock, InflictsDamage, Item, MagicMapper, MeleePowerBonus, Monster, Name, ParticleLifetime, Player, Position, ProvidesFood, ProvidesHealing, Ranged, Renderable, SingleActivation, Viewshed
-from device import Color
+from color import Color
 from randomTable import RandomTable
 
 
@@ -158,10 +158,10 @@ def createTowerShield(scene:Scene, x:int, y:int) -> Entity:
 
 
 def createParticle(scene:Scene, x:int, y:int, glyph:str, foreground:Color = (255,255,255,255), lifetime:int = 2):
-    particle = scene.create()
+    particle = scene.commands.create(scene.entityPool("particles"))
     particle.add(Position(x,y))
     particle.add(Renderable(glyph, 100, foreground))
-    particle.add(ParticleLifetime(lifetime))
+    particle.add(ParticleLifetime.acquire(lifetime))
     return particle
 
 
@@ -1,35 +1,45 @@
 
 
 from algorithms.point import Point
-from component import CombatStats, Player, Position, SufferDamage, Name
-from core import ECS
+from component import CombatStats, Player, Position, Name
+from core import ECS, PROFILER
+from event import DamageEvent
 from map import Map
-from utils import Logger
+from utils import Logger, Statistics
 
 
+@PROFILER.profile
 def damageSystem():
-    map: Map = ECS.scene.retrieve("map")
-    entities = ECS.scene.filter(CombatStats.id | SufferDamage.id)
-    for entity in entities:
+    scene = ECS.scene
+    map: Map = scene.resources.map
+    statistics: Statistics = scene.resources.statistics
+    for event in scene.events.drain(DamageEvent):
+        entity = event.target
+        if entity.scene is not scene or not entity.has(CombatStats.id):
+            continue
         combatStats: CombatStats = entity[CombatStats.id]
-        sufferDamage: SufferDamage = entity[SufferDamage.id]
-        combatStats.HP -= sufferDamage.amount
-        entity.remove(SufferDamage.id)
+        combatStats.HP -= event.amount
+        if entity.has(Player.id):
+            statistics.damageTaken += event.amount
+        else:
+            statistics.damageDealt += event.amount
         if entity.has(Position.id):
             position: Position = entity[Position.id]
             map.bloodstains.add(Point(position.x, position.y))
 
 
+@PROFILER.profile
 def deleteTheDead():
-    entities = ECS.scene.filter(CombatStats.id)
-    logger: Logger = ECS.scene.retrieve("logger")
+    scene = ECS.scene
+    entities = scene.below(CombatStats.id, "HP", 1)
+    logger: Logger = scene.resources.logger
+    statistics: Statistics = scene.resources.statistics
     for entity in entities:
-        combatStats: CombatStats = entity[CombatStats.id]
-        if combatStats.HP < 1:
-            if entity.has(Player.id):
-                logger.log("You are dead!")
-            else:
-                ECS.scene.destroy(entity)
-                if entity.has(Name.id):
-                    name: Name = entity[Name.id]
-                    logger.log(f"{name.name} is dead!")
+        if entity.has(Player.id):
+            logger.log("You are dead!")
+        else:
+            scene.commands.destroy(entity)
+            statistics.kills += 1
+            if entity.has(Name.id):
+                name: Name = entity[Name.id]
+                logger.log(f"{name.name} is dead!")
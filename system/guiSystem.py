@@ -5,7 +5,7 @@ import os.path
 from enum import Enum
 from algorithms.point import Point
 from component import AreaOfEffect, CombatStats, Equippable, Equipped, GUIDescription, Hidden, HungerClock, InBackpack, Item, Name, Player, Position, Ranged, Renderable, Viewshed
-from core import ECS, Entity
+from core import ECS, PROFILER, Entity
 from device import Font
 from screen import Screen, ScreenLayer
 from map import Map
@@ -32,11 +32,13 @@ class GameOverResult(Enum):
     QuitToMenu = 1
 
 
+@PROFILER.profile
 def guiSystem(screen: Screen):
-    entities = ECS.scene.filter(GUIDescription.id | Position.id)
-    player: Entity = ECS.scene.retrieve("player")
-    font: Font = ECS.scene.retrieve("font")
-    map: Map = ECS.scene.retrieve("map")
+    scene = ECS.scene
+    entities = scene.filter(GUIDescription.id | Position.id)
+    player: Entity = scene.resources.player
+    font: Font = scene.resources.font
+    map: Map = scene.resources.map
 
     font.background = (0, 0, 0, 255)
     font.foreground = (200, 200, 200, 255)
@@ -73,11 +75,10 @@ def guiSystem(screen: Screen):
 
                 messages.append(name.name + statsMsg + hungerMsg)
 
-                equips = ECS.scene.filter(Name.id | Equipped.id)
-                for equippedEntity in equips:
-                    equipped: Equipped = equippedEntity[Equipped.id]
-                    equippedName: Name = equippedEntity[Name.id]
-                    if equipped.owner == entity:
+                for equippedEntity in scene.children(Equipped.id, entity):
+                    if equippedEntity.has(Name.id):
+                        equipped: Equipped = equippedEntity[Equipped.id]
+                        equippedName: Name = equippedEntity[Name.id]
                         msg = f"    {equipped.slot}: {equippedName.name}"
                         messages.append(msg)
 
@@ -93,9 +94,10 @@ def guiSystem(screen: Screen):
 
 # TODO item and monster at same position
 def drawTooltips(screen: Screen):
-    map: Map = ECS.scene.retrieve("map")
-    font: Font = ECS.scene.retrieve('font')
-    entities = ECS.scene.filter(Position.id | Name.id | Renderable.id)
+    scene = ECS.scene
+    map: Map = scene.resources.map
+    font: Font = scene.resources.font
+    entities = scene.filter(Position.id | Name.id | Renderable.id)
     position = ECS.context.mousePosition
     x, y = screen.screenPositionToGrid(position.x, position.y)
     point = Point(x, y)
@@ -117,10 +119,10 @@ def drawTooltips(screen: Screen):
 
 
 def showInventory(keys: set[str]) -> tuple[ItemMenuResult, Entity | None]:
-    player: Entity = ECS.scene.retrieve('player')
-    font: Font = ECS.scene.retrieve('font')
-    items = ECS.scene.filter(InBackpack.id | Item.id)
-    items = [item for item in items if item[InBackpack.id].owner == player]
+    scene = ECS.scene
+    player: Entity = scene.resources.player
+    font: Font = scene.resources.font
+    items = [item for item in scene.children(InBackpack.id, player) if item.has(Item.id)]
     index = ord('a')
     y = 200
     x = 400
@@ -148,10 +150,10 @@ def showInventory(keys: set[str]) -> tuple[ItemMenuResult, Entity | None]:
 
 
 def dropItemMenu(keys: set[str]) -> tuple[ItemMenuResult, Entity | None]:
-    player: Entity = ECS.scene.retrieve('player')
-    font: Font = ECS.scene.retrieve('font')
-    items = ECS.scene.filter(InBackpack.id | Item.id)
-    items = [item for item in items if item[InBackpack.id].owner == player]
+    scene = ECS.scene
+    player: Entity = scene.resources.player
+    font: Font = scene.resources.font
+    items = [item for item in scene.children(InBackpack.id, player) if item.has(Item.id)]
     index = ord('a')
     y = 200
     x = 400
@@ -178,10 +180,10 @@ def dropItemMenu(keys: set[str]) -> tuple[ItemMenuResult, Entity | None]:
 
 
 def removeItemMenu(keys: set[str]) -> tuple[ItemMenuResult, Entity | None]:
-    player: Entity = ECS.scene.retrieve('player')
-    font: Font = ECS.scene.retrieve('font')
-    items = ECS.scene.filter(Equipped.id | Item.id)
-    items = [item for item in items if item[Equipped.id].owner == player]
+    scene = ECS.scene
+    player: Entity = scene.resources.player
+    font: Font = scene.resources.font
+    items = [item for item in scene.children(Equipped.id, player) if item.has(Item.id)]
     index = ord('a')
     y = 200
     x = 400
@@ -210,7 +212,7 @@ def removeItemMenu(keys: set[str]) -> tuple[ItemMenuResult, Entity | None]:
 def rangedTarget(targetingEntity: Entity, screen: Screen) -> tuple[ItemMenuResult, Point | None]:
     ranged: Ranged = targetingEntity[Ranged.id]
     itemRange: int = ranged.range
-    player = ECS.scene.retrieve("player")
+    player = ECS.scene.resources.player
     playerPosition: Position = player[Position.id]
     playerPoint = Point(playerPosition.x, playerPosition.y)
     viewshed: Viewshed = player[Viewshed.id]
@@ -261,7 +263,7 @@ countFrames = 0
 
 
 def showMenu(keys: set[str]) -> MainMenuResult:
-    font: Font = ECS.scene.retrieve('font')
+    font: Font = ECS.scene.resources.font
     if "escape" in keys:
         return MainMenuResult.Quit
     else:
@@ -319,7 +321,7 @@ def showGameOver(keys: set[str]) -> GameOverResult:
     if keys and countFrames <= 0:
         return GameOverResult.QuitToMenu
     else:
-        font: Font = ECS.scene.retrieve('font')
+        font: Font = ECS.scene.resources.font
         font.foreground = (255, 255, 0, 255)
         font.drawAtScreen("          Your journey has ended!", 400, 200)
         font.foreground = (255, 255, 255, 255)
@@ -1,31 +1,36 @@
 
 from algorithms.point import Point
-from component import AreaOfEffect, CombatStats, Confusion, Consumable, Equippable, Equipped, GUIDescription, HungerClock, InBackpack, InflictsDamage, MagicMapper, Name, Player, Position, ProvidesFood, ProvidesHealing, WantsToRemoveItem, WantsToUseItem, WantsToDropItem, WantsToPickupItem, sufferDamage
-from core import ECS, Entity
+from component import AreaOfEffect, CombatStats, Confusion, Consumable, Equippable, Equipped, GUIDescription, HungerClock, InBackpack, InflictsDamage, MagicMapper, Name, Player, Position, ProvidesFood, ProvidesHealing, WantsToRemoveItem, WantsToUseItem, WantsToDropItem, sufferDamage
+from core import ECS, PROFILER, Entity
+from event import PickupEvent
 from map import Map
 from spawner import createParticle
 from utils import Logger
 
 
+@PROFILER.profile
 def itemCollectionSystem() -> None:
-    entities = ECS.scene.filter(Position.id | Name.id | WantsToPickupItem.id)
-    logger: Logger = ECS.scene.retrieve("logger")
-    for entity in entities:
-        wantsToPickup: WantsToPickupItem = entity[WantsToPickupItem.id]
-        item = wantsToPickup.item
-        item.remove(Position.id)
-        entity.remove(WantsToPickupItem.id)
-        item.add(InBackpack(entity))
+    scene = ECS.scene
+    logger: Logger = scene.resources.logger
+    for event in scene.events.drain(PickupEvent):
+        entity = event.collector
+        item = event.item
+        if entity.scene is not scene or item.scene is not scene:
+            continue
+        scene.commands.remove(item, Position.id)
+        scene.commands.add(item, InBackpack(entity))
         name: Name = entity[Name.id]
         itemName: Name = item[Name.id]
         logger.log(f"{name.name} pick up the {itemName.name}")
     # TODO equip empty slot
 
 
+@PROFILER.profile
 def itemUseSystem() -> None:
-    entities = ECS.scene.filter(Name.id | WantsToUseItem.id | CombatStats.id)
-    logger: Logger = ECS.scene.retrieve("logger")
-    map: Map = ECS.scene.retrieve("map")
+    scene = ECS.scene
+    entities = scene.filter(Name.id | WantsToUseItem.id | CombatStats.id)
+    logger: Logger = scene.resources.logger
+    map: Map = scene.resources.map
     for entity in entities:
         wants: WantsToUseItem = entity[WantsToUseItem.id]
         entityItem = wants.item
@@ -44,7 +49,7 @@ def itemUseSystem() -> None:
                         for entityTarget in content:
                             if entityTarget.has(CombatStats.id):
                                 targets.add(entityTarget)
-                        createParticle(ECS.scene, pos.x, pos.y, '░', (100, 50, 0, 255))
+                        createParticle(scene, pos.x, pos.y, '░', (100, 50, 0, 255))
 
         elif wants.target is not None:
             target = wants.target
@@ -65,7 +70,7 @@ def itemUseSystem() -> None:
             
                 if target.has(Position.id):
                     position:Position = target[Position.id]
-                    createParticle(ECS.scene, position.x, position.y, '♥', (0, 255, 0, 255))
+                    createParticle(scene, position.x, position.y, '♥', (0, 255, 0, 255))
 
 
         if entityItem.has(InflictsDamage.id):
@@ -80,14 +85,14 @@ def itemUseSystem() -> None:
                     
                     if target.has(Position.id):
                         position:Position = target[Position.id]
-                        createParticle(ECS.scene, position.x, position.y, '!', (255, 0, 0, 255))
+                        createParticle(scene, position.x, position.y, '!', (255, 0, 0, 255))
 
 
         if entityItem.has(Confusion.id):
             for target in targets:
                 if target.has(CombatStats.id):
                     confusion: Confusion = entityItem[Confusion.id]
-                    target.add(Confusion(confusion.turns))
+                    scene.commands.add(target, Confusion(confusion.turns))
                     if entity.has(Player.id):
                         itemName: Name = entityItem[Name.id]
                         targetName: Name = target[Name.id]
@@ -95,7 +100,7 @@ def itemUseSystem() -> None:
                 
                 if target.has(Position.id):
                     position:Position = target[Position.id]
-                    createParticle(ECS.scene, position.x, position.y, '?', (255, 0, 255, 255))
+                    createParticle(scene, position.x, position.y, '?', (255, 0, 255, 255))
 
 
         if entityItem.has(ProvidesFood.id):
@@ -109,58 +114,60 @@ def itemUseSystem() -> None:
         
 
         if entityItem.has(MagicMapper.id):
-            map.revealedTiles.update(map.tiles)
+            map.revealedTiles.fill()
             logger.log("The map is revealed to you!")
 
 
         if entityItem.has(Equippable.id):
             toEquip: Equippable = entityItem[Equippable.id]
-            unequipEntities = ECS.scene.filter(Name.id | Equipped.id)
-            for unequipEntity in unequipEntities:
-                unequipEquipped: Equipped = unequipEntity[Equipped.id]
-                if unequipEquipped.owner == entity and unequipEquipped.slot == toEquip.slot:
-                    unequipEntity.remove(Equipped.id)
-                    unequipEntity.add(InBackpack(entity))
-                    if entity.has(Player.id):
-                        unequipName: Name = unequipEntity[Name.id]
-                        logger.log(f"You unequip {unequipName.name}.")
+            unequipEntity = scene.child(Equipped.id, entity, toEquip.slot)
+            if unequipEntity is not None:
+                scene.commands.remove(unequipEntity, Equipped.id)
+                scene.commands.add(unequipEntity, InBackpack(entity))
+                if entity.has(Player.id):
+                    unequipName: Name = unequipEntity[Name.id]
+                    logger.log(f"You unequip {unequipName.name}.")
 
 
             toEquipName: Name = entityItem[Name.id]
             logger.log(f"You equipped {toEquipName.name}.")
 
-            entityItem.remove(InBackpack.id)
-            entityItem.add(Equipped(entity, toEquip.slot))
+            scene.commands.remove(entityItem, InBackpack.id)
+            scene.commands.add(entityItem, Equipped(entity, toEquip.slot))
 
         if entityItem.has(Consumable.id):
-            ECS.scene.destroy(entityItem)
-        entity.remove(WantsToUseItem.id)
+            scene.commands.destroy(entityItem)
+        scene.commands.remove(entity, WantsToUseItem.id)
 
 
+@PROFILER.profile
 def itemDropSystem() -> None:
-    entities = ECS.scene.filter(Name.id | WantsToDropItem.id)
-    logger: Logger = ECS.scene.retrieve("logger")
-    player: Entity = ECS.scene.retrieve('player')
+    scene = ECS.scene
+    entities = scene.filter(Name.id | WantsToDropItem.id)
+    logger: Logger = scene.resources.logger
+    player: Entity = scene.resources.player
     for entity in entities:
         position = entity[Position.id]
         wants: WantsToDropItem = entity[WantsToDropItem.id]
         item: Entity = wants.item
-        item.add(Position(position.x, position.y))
-        item.remove(InBackpack.id)
-        entity.remove(WantsToDropItem.id)
+        scene.commands.add(item, Position(position.x, position.y))
+        scene.commands.remove(item, InBackpack.id)
+        scene.commands.remove(entity, WantsToDropItem.id)
         if entity == player:
             logger.log(f"You drop the {item[Name.id].name}.")
 
 
+@PROFILER.profile
 def itemRemoveSystem() -> None:
-    entities = ECS.scene.filter(Name.id | WantsToRemoveItem.id)
-    logger: Logger = ECS.scene.retrieve("logger")
-    player: Entity = ECS.scene.retrieve('player')
+    scene = ECS.scene
+    entities = scene.filter(Name.id | WantsToRemoveItem.id)
+    logger: Logger = scene.resources.logger
+    player: Entity = scene.resources.player
     for entity in entities:
         wants: WantsToRemoveItem = entity[WantsToRemoveItem.id]
         item: Entity = wants.item
-        item.remove(Equipped.id)
-        item.add(InBackpack(entity))
-        entity.remove(WantsToRemoveItem.id)
+        scene.commands.remove(item, Equipped.id)
+        scene.commands.add(item, InBackpack(entity))
+        scene.commands.remove(entity, WantsToRemoveItem.id)
         if entity == player:
             logger.log(f"You unequipped the {item[Name.id].name}.")
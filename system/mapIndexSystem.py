@@ -2,21 +2,46 @@
 
 from algorithms.point import Point
 from component import BlocksTile, Position
-from core import ECS
+from core import ECS, PROFILER, Entity
 from map import Map
 
+CHECK_MAP_INDEX = False  # compares the index with every positioned entity after each update, assertions must be enabled
 
+
+@PROFILER.profile
 def mapIndexSystem():
-    entities = ECS.scene.filter(Position.id)
-    map: Map = ECS.scene.retrieve("map")
+    scene = ECS.scene
+    map: Map = scene.resources.map
+    since = scene.checkpoint("mapIndexSystem")
+    if since < 0 or not map.contentIndex:
+        rebuildMapIndex(map)
+    else:
+        updateMapIndex(map, since)
+    if CHECK_MAP_INDEX:
+        errors = map.checkContentIndex(scene.filter(Position.id))
+        assert not errors, "Map index out of date:\n" + "\n".join(errors)
+
+
+# only the entities that moved, got or lost a position or BlocksTile, or were destroyed since the last update
+def updateMapIndex(map: Map, since: int):
+    scene = ECS.scene
+    moved: set[Entity] = set(scene.removed(Position.id, since))
+    moved.update(scene.changed(Position.id, since))
+    moved.update(scene.added(Position.id, since))
+    moved.update(scene.added(BlocksTile.id, since))
+    moved.update(scene.removed(BlocksTile.id, since))
+
+    # removing and placing again keeps the blocked tiles of the moved entities exact
+    for entity in moved:
+        map.removeContent(entity)
+        if entity.scene is scene and entity.has(Position.id):
+            position: Position = entity[Position.id]
+            map.placeContent(entity, Point(position.x, position.y))
+
 
-    map.populateBlocked()
+# once per level, the walls are blocked and every entity is placed
+def rebuildMapIndex(map: Map):
     map.clearContentIndex()
-    for entity in entities:
-        position:Position = entity[Position.id]
-        point = Point(position.x, position.y)
-        content = map.tileContent[point] if point in map.tileContent else []
-        content.append(entity)
-        map.tileContent[point] = content
-        if entity.has(BlocksTile.id):
-            map.blocked.add(point)
+    for entity in ECS.scene.filter(Position.id):
+        position: Position = entity[Position.id]
+        map.placeContent(entity, Point(position.x, position.y))
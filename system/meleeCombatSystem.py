@@ -1,17 +1,15 @@
 
 from component import CombatStats, DefenseBonus, Equipped, HungerClock, MeleePowerBonus, Name, Position, WantsToMelee, sufferDamage
-from core import ECS, Entity
+from core import ECS, PROFILER, Entity
 from spawner import createParticle
 from utils import Logger
 
 
 def getOffensiveBonus(entity:Entity) -> int:
     offensiveBonus = 0
-    powerBonusEntities = ECS.scene.filter(MeleePowerBonus.id | Equipped.id)
-    for powerBonusEntity in powerBonusEntities:
-        equipped:Equipped = powerBonusEntity[Equipped.id]
-        if equipped.owner == entity:
-            powerBonus:MeleePowerBonus = powerBonusEntity[MeleePowerBonus.id]
+    for equippedEntity in ECS.scene.children(Equipped.id, entity):
+        if equippedEntity.has(MeleePowerBonus.id):
+            powerBonus:MeleePowerBonus = equippedEntity[MeleePowerBonus.id]
             offensiveBonus += powerBonus.power
     
     if entity.has(HungerClock.id):
@@ -24,24 +22,27 @@ def getOffensiveBonus(entity:Entity) -> int:
 
 def getDefensiveBonus(entity:Entity) -> int:
     defensiveBonus = 0
-    defenseBonusEntities = ECS.scene.filter(DefenseBonus.id | Equipped.id)
-    for defenseBonusEntity in defenseBonusEntities:
-        equipped:Equipped = defenseBonusEntity[Equipped.id]
-        if equipped.owner == entity:
-            defenseBonus:DefenseBonus = defenseBonusEntity[DefenseBonus.id]
+    for equippedEntity in ECS.scene.children(Equipped.id, entity):
+        if equippedEntity.has(DefenseBonus.id):
+            defenseBonus:DefenseBonus = equippedEntity[DefenseBonus.id]
             defensiveBonus += defenseBonus.defense
     return defensiveBonus
 
 
+@PROFILER.profile
 def meleeCombatSystem():
-    entities = ECS.scene.filter(WantsToMelee.id | Name.id | CombatStats.id)
-    logger:Logger = ECS.scene.retrieve("logger")
+    scene = ECS.scene
+    entities = scene.filter(WantsToMelee.id | Name.id | CombatStats.id)
+    logger:Logger = scene.resources.logger
     for entity in entities:
         combatStats = entity[CombatStats.id]
         if combatStats.HP > 0:
 
             wantsToMelee:WantsToMelee = entity[WantsToMelee.id]
             target = wantsToMelee.target
+            if not target.isAlive():
+                scene.commands.remove(entity, WantsToMelee.id)
+                continue
 
             offensiveBonus = getOffensiveBonus(entity)
             defensiveBonus = getDefensiveBonus(target)
@@ -56,8 +57,8 @@ def meleeCombatSystem():
             else:
                 logger.log(f"{name.name} hits {targetName.name}, for {damage} hp.")
                 sufferDamage(target, damage)
-            entity.remove(WantsToMelee.id)
+            scene.commands.remove(entity, WantsToMelee.id)
             
             if target.has(Position.id):
                 position:Position = target[Position.id]
-                createParticle(ECS.scene, position.x, position.y, '!', (255, 90, 5, 255))
+                createParticle(scene, position.x, position.y, '!', (255, 90, 5, 255))
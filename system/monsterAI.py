@@ -3,35 +3,38 @@
 from algorithms import PathFinding, Point
 from algorithms.direction import Direction
 from algorithms.random import Random
-from component import Confusion, EntityMoved, Monster, Position, Viewshed, Name, WantsToMelee
-from core import ECS, Entity
+from component import Confusion, Monster, Position, Viewshed, Name, WantsToMelee
+from core import ECS, PROFILER, Entity
+from event import MoveEvent
 from map import Map, TileType
 from spawner import createParticle
 from utils import Logger
 
 
+@PROFILER.profile
 def monsterAISystem():
-    entities = ECS.scene.filter(Position.id | Viewshed.id | Monster.id | Name.id)
-    player:Entity = ECS.scene.retrieve("player")
+    scene = ECS.scene
+    entities = scene.filter(Position.id | Viewshed.id | Monster.id | Name.id)
+    player:Entity = scene.resources.player
     playerPosition:Position = player[Position.id]
     playerPoint = Point(playerPosition.x, playerPosition.y)
-    map: Map = ECS.scene.retrieve("map")
-    logger:Logger = ECS.scene.retrieve("logger")
-    rand:Random = ECS.scene.retrieve("random")
+    map: Map = scene.resources.map
+    logger:Logger = scene.resources.logger
+    rand:Random = scene.resources.random
 
     for entity in entities:
         if entity.has(Confusion.id):
             confusion = entity[Confusion.id]
             confusion.turns -= 1
             if confusion.turns <= 0:
-                entity.remove(Confusion.id)
+                scene.commands.remove(entity, Confusion.id)
             else:
                 view:Viewshed = entity[Viewshed.id]
                 name:Name = entity[Name.id]
                 position: Position = entity[Position.id]
                 if playerPoint in view.visibleTiles:
                     logger.log(f"{name.name} is confused!")
-                    createParticle(ECS.scene, position.x, position.y, '?', (255, 0, 255, 255))
+                    createParticle(scene, position.x, position.y, '?', (255, 0, 255, 255))
                 break
         
         view:Viewshed = entity[Viewshed.id]
@@ -45,22 +48,21 @@ def monsterAISystem():
             if len(path) >= 2 and len(path) <= view.range + 1:
                 nextPoint = path[1]
                 if nextPoint == playerPoint:
-                    wantsToMelee = WantsToMelee(player)
-                    entity.add(wantsToMelee)
+                    wantsToMelee = WantsToMelee.acquire(player)
+                    scene.commands.add(entity, wantsToMelee)
                 else:
-                    map.blocked.remove(Point(position.x, position.y))
-                    map.blocked.add(nextPoint)
+                    map.moveContent(entity, nextPoint)
                     position.x = nextPoint.x
                     position.y = nextPoint.y
-                    view.dirty = True
-                    entity.add(EntityMoved())
+                    entity.markChanged(Position.id)
+                    scene.events.emit(MoveEvent(entity))
             else:
                 nextPoint = Point(position.x, position.y) + rand.choice(Direction.All)
                 if nextPoint in map.tiles and map.tiles[nextPoint] != TileType.Wall and nextPoint not in map.blocked:
-                    map.blocked.add(nextPoint)
+                    map.moveContent(entity, nextPoint)
                     position.x = nextPoint.x
                     position.y = nextPoint.y
-                    view.dirty = True
-                    entity.add(EntityMoved())
+                    entity.markChanged(Position.id)
+                    scene.events.emit(MoveEvent(entity))
 
                     
@@ -1,26 +1,11 @@
 
-
-from algorithms import Point
-from component import ParticleLifetime, Position, Renderable
-from core import ECS
-from screen import Screen, ScreenLayer
-from map import Map
+from component import ParticleLifetime
+from core import ECS, PROFILER
 
 
+@PROFILER.profile
 def cullDeadParticles() -> None:
-    entities = ECS.scene.filter(ParticleLifetime.id)
-    for entity in entities:
-        particle:ParticleLifetime = entity[ParticleLifetime.id]
-        particle.frames -= 1
-        if particle.frames <= 0:
-            ECS.scene.destroy(entity)
-
-
-def drawParticles(screen: Screen) -> None:
-    map: Map = ECS.scene.retrieve("map")
-    entities = ECS.scene.filter(Position.id | Renderable.id | ParticleLifetime.id)
-    for entity in entities:
-        position: Position = entity[Position.id]
-        if Point(position.x, position.y) in map.visibleTiles:
-            render: Renderable = entity[Renderable.id]
-            screen.setGlyph(ScreenLayer.ForegroundEffects, Point(position.x, position.y), render)
+    scene = ECS.scene
+    particles = scene.entityPool("particles")
+    for entity in scene.countdown(ParticleLifetime.id, "frames"):
+        scene.commands.destroy(entity, particles)
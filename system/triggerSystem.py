@@ -2,18 +2,23 @@
 
 
 from algorithms.point import Point
-from component import EntityMoved, EntryTrigger, Hidden, InflictsDamage, Name, Position, SingleActivation, sufferDamage
-from core import ECS
+from component import EntryTrigger, Hidden, InflictsDamage, Name, Position, SingleActivation, sufferDamage
+from core import ECS, PROFILER
+from event import MoveEvent
 from map import Map
 from spawner import createParticle
 from utils import Logger
 
 
+@PROFILER.profile
 def triggerSystem():
-    map: Map = ECS.scene.retrieve("map")
-    logger:Logger = ECS.scene.retrieve("logger")
-    entities = ECS.scene.filter(EntityMoved.id | Position.id)
-    for entity in entities:
+    scene = ECS.scene
+    map: Map = scene.resources.map
+    logger:Logger = scene.resources.logger
+    for event in scene.events.drain(MoveEvent):
+        entity = event.entity
+        if entity.scene is not scene:
+            continue
         position:Position = entity[Position.id]
         point = Point(position.x, position.y)
         if point in map.tileContent:
@@ -24,15 +29,13 @@ def triggerSystem():
                         logger.log(f"{name.name} triggers!")
                     
                     if tileEntity.has(Hidden.id):
-                        tileEntity.remove(Hidden.id)
+                        scene.commands.remove(tileEntity, Hidden.id)
                     
                     if tileEntity.has(InflictsDamage.id):
                         damage:InflictsDamage = tileEntity[InflictsDamage.id]
                         sufferDamage(entity, damage.damage)
                         position:Position = tileEntity[Position.id]
-                        createParticle(ECS.scene, position.x, position.y, '!', (255, 90, 5, 255))
+                        createParticle(scene, position.x, position.y, '!', (255, 90, 5, 255))
                     
                     if tileEntity.has(SingleActivation.id):
-                        ECS.scene.destroy(tileEntity)
-                    
-        entity.remove(EntityMoved.id)
+                        scene.commands.destroy(tileEntity)
@@ -3,39 +3,54 @@
 from algorithms import FieldOfView, Point
 from algorithms.random import Random
 from component import Hidden, Name, Player, Position, Viewshed
-from core import ECS
-from map import Map, TileType
+from core import ECS, PROFILER, Entity
+from map import Map
 from utils import Logger
 
 RATE_PERCEPT_HIDDEN:float = 0.05
 
+@PROFILER.profile
 def visibilitySystem():
-    map: Map = ECS.scene.retrieve("map")
-    rand:Random = ECS.scene.retrieve("random")
-    logger:Logger = ECS.scene.retrieve("logger")
-    entities = ECS.scene.filter(Position.id | Viewshed.id)
+    scene = ECS.scene
+    map: Map = scene.resources.map
+    rand:Random = scene.resources.random
+    logger:Logger = scene.resources.logger
+    entities = scene.filter(Position.id | Viewshed.id)
+    since = scene.checkpoint("visibilitySystem")
+    if since >= 0:
+        entities = changedViewers(since)
 
-    isOpaque = lambda x, y : map.tiles[Point(x,y)] == TileType.Wall if Point(x,y) in map.tiles else False
-    fieldOfView = FieldOfView(8, isOpaque)
+    fieldOfView = FieldOfView(8, map.isOpaque)
 
     for entity in entities:
         position: Position = entity[Position.id]
         viewshed:Viewshed = entity[Viewshed.id]
-        if viewshed.dirty:
-            fieldOfView.radius = viewshed.range
-            viewshed.dirty = False
-            viewshed.visibleTiles = fieldOfView.rayCasting(Point(position.x,position.y))
-
-            if entity.has(Player.id):
-                map.visibleTiles.clear()
-                map.visibleTiles = viewshed.visibleTiles
-                map.revealedTiles.update(map.visibleTiles)
-
-                for point in viewshed.visibleTiles:
-                    if point in map.tileContent:
-                        for tileEntity in map.tileContent[point]:
-                            if tileEntity.has(Hidden.id) and rand.nextDouble() < RATE_PERCEPT_HIDDEN:
-                                tileEntity.remove(Hidden.id)
-                                if tileEntity.has(Name.id):
-                                    name:Name = tileEntity[Name.id]
-                                    logger.log(f"You spotted a {name.name}.")
+        fieldOfView.radius = viewshed.range
+        previous = viewshed.visibleTiles
+        viewshed.visibleTiles = fieldOfView.rayCasting(Point(position.x,position.y))
+
+        if entity.has(Player.id):
+            for point in previous:  # the map holds the player's last view, replaced without a pass over every cell
+                map.visibleTiles.discard(point)
+            map.visibleTiles.update(viewshed.visibleTiles)
+            map.revealedTiles.update(viewshed.visibleTiles)
+
+            for point in viewshed.visibleTiles:
+                if point in map.tileContent:
+                    for tileEntity in map.tileContent[point]:
+                        if tileEntity.has(Hidden.id) and rand.nextDouble() < RATE_PERCEPT_HIDDEN:
+                            scene.commands.remove(tileEntity, Hidden.id)
+                            if tileEntity.has(Name.id):
+                                name:Name = tileEntity[Name.id]
+                                logger.log(f"You spotted a {name.name}.")
+
+
+def changedViewers(since: int) -> list[Entity]:
+    scene = ECS.scene
+    signature = Position.id | Viewshed.id
+    viewers: dict[Entity, None] = dict()
+    for entities in (scene.added(Position.id, since), scene.added(Viewshed.id, since), scene.changed(Position.id, since), scene.changed(Viewshed.id, since)):
+        for entity in entities:
+            if entity.scene is scene and (entity.signature & signature) == signature:
+                viewers[entity] = None
+    return list(viewers)
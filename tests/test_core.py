@@ -0,0 +1,492 @@
+import threading
+import time
+import unittest
+
+from component import CombatStats, Equipped, HungerClock, InBackpack, Name, Player, Position, WantsToMelee
+from core import ECS, INDEX_MASK, PROFILER, Entity, Event, Pool, Resources, Scene, Scheduler, World, deferToStage
+
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        self.scene = Scene()
+        self.entities = [self.scene.create().add(Position(i, 0)) for i in range(3)]
+
+    def test_filter_is_read_only(self):
+        query = self.scene.filter(Position.id)
+        self.assertFalse(hasattr(query, "add"))
+        self.assertFalse(hasattr(query, "discard"))
+        self.assertIsInstance(query - {self.entities[0]}, set)
+
+    def test_filter_follows_the_scene(self):
+        query = self.scene.filter(Position.id | Name.id)
+        self.assertEqual(len(query), 0)
+        self.entities[0].add(Name("Goblin"))
+        self.assertEqual(set(query), {self.entities[0]})
+        self.entities[0].remove(Name.id)
+        self.assertEqual(len(query), 0)
+
+    def test_iterating_while_changing_needs_a_snapshot(self):
+        with self.assertRaises(RuntimeError):
+            for entity in self.scene.filter(Position.id):
+                entity.remove(Position.id)
+        self.scene = Scene()
+        for i in range(3):
+            self.scene.create().add(Position(i, 0))
+        for entity in list(self.scene.filter(Position.id)):
+            entity.remove(Position.id)
+        self.assertEqual(len(self.scene.filter(Position.id)), 0)
+
+
+class PoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = WantsToMelee.pool
+        WantsToMelee.pool = Pool()
+        self.scene = Scene()
+        self.entity = self.scene.create()
+        self.target = self.scene.create()
+
+    def tearDown(self):
+        WantsToMelee.pool = self.pool
+
+    def test_replaced_component_goes_back_to_its_pool(self):
+        first = WantsToMelee.acquire(self.target)
+        self.entity.add(first)
+        self.entity.add(WantsToMelee.acquire(self.target))
+        self.assertEqual(WantsToMelee.pool.free, [first])
+        self.entity.add(self.entity[WantsToMelee.id])
+        self.assertEqual(len(WantsToMelee.pool.free), 1)
+
+    def test_replaced_through_the_commands_goes_back_to_its_pool(self):
+        first = WantsToMelee.acquire(self.target)
+        self.scene.commands.add(self.entity, first)
+        self.scene.commands.add(self.entity, WantsToMelee.acquire(self.target))
+        self.scene.flush()
+        self.assertEqual(WantsToMelee.pool.free, [first])
+        self.assertIs(WantsToMelee.acquire(self.target), first)
+
+    def test_replaced_outside_a_scene_goes_back_to_its_pool(self):
+        entity = Entity()
+        first = WantsToMelee.acquire(self.target)
+        entity.add(first).add(WantsToMelee.acquire(self.target))
+        self.assertEqual(WantsToMelee.pool.free, [first])
+
+
+class WorldTest(unittest.TestCase):
+    def test_each_world_has_its_own_scene_and_ids(self):
+        outside = ECS.scene
+        with World() as first:
+            a = ECS.scene.create()
+            with World() as second:
+                b = ECS.scene.create()
+                self.assertIs(ECS.scene, second.scene)
+            self.assertIs(ECS.scene, first.scene)
+        self.assertIs(ECS.scene, outside)
+        self.assertEqual((a.index, b.index), (0, 0))
+        self.assertIs(first.lookup(a.id), a)
+        self.assertIs(second.lookup(b.id), b)
+        self.assertEqual([entity is a for entity in first.scene.entities], [True])
+        self.assertEqual([entity is b for entity in second.scene.entities], [True])
+
+    def test_threads_see_the_world_they_entered(self):
+        seen: dict[str, list] = dict()
+        def play(name: str, world: World) -> None:
+            with world:
+                entities = [ECS.scene.create() for _ in range(50)]
+                time.sleep(0.01)
+                seen[name] = [ECS.world is world, ECS.scene is world.scene, len(ECS.scene.entities), entities[-1].index]
+        worlds = {"first": World(), "second": World()}
+        threads = [threading.Thread(target=play, args=item) for item in worlds.items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(seen, {"first": [True, True, 50, 49], "second": [True, True, 50, 49]})
+
+    def test_a_world_can_be_entered_again(self):
+        world = World()
+        with world:
+            with world:
+                self.assertIs(ECS.world, world)
+            self.assertIs(ECS.world, world)
+        self.assertIsNot(ECS.world, world)
+
+
+class ColumnStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.scene = Scene()
+        self.scene.useColumns(HungerClock, "duration", groupBy=Player.id)
+        self.player = self.scene.create().add(HungerClock(HungerClock.NORMAL, 2)).add(Player())
+        self.monsters = [self.scene.create().add(HungerClock(HungerClock.NORMAL, duration)) for duration in (1, 3, 5)]
+
+    def durations(self) -> list[int]:
+        return [entity[HungerClock.id].duration for entity in [self.player] + self.monsters]
+
+    def test_countdown_returns_the_clocks_that_reach_zero(self):
+        self.assertEqual(self.scene.countdown(HungerClock.id, "duration"), [self.monsters[0]])
+        self.assertEqual(self.durations(), [1, 0, 2, 4])
+        self.assertEqual(self.scene.countdown(HungerClock.id, "duration", 2), [self.player, self.monsters[0], self.monsters[1]])
+        self.assertEqual(self.durations(), [-1, -2, 0, 2])
+
+    def test_countdown_of_one_group(self):
+        self.assertEqual(self.scene.countdown(HungerClock.id, "duration", grouped=True), [])
+        self.assertEqual(self.durations(), [1, 1, 3, 5])
+        self.assertEqual(self.scene.countdown(HungerClock.id, "duration", grouped=False), [self.monsters[0]])
+        self.assertEqual(self.durations(), [1, 0, 2, 4])
+        self.player.remove(Player.id)
+        self.scene.countdown(HungerClock.id, "duration", grouped=False)
+        self.assertEqual(self.durations(), [0, -1, 1, 3])
+
+    def test_countdown_of_the_whole_column_at_once(self):
+        for monster in self.monsters:
+            monster[HungerClock.id].duration = 10 ** 12
+        self.player[HungerClock.id].duration = 3
+        self.assertEqual(self.scene.countdown(HungerClock.id, "duration", 2), [])
+        self.assertEqual(self.durations(), [1] + [10 ** 12 - 2] * 3)
+
+    def test_released_rows_are_left_alone(self):
+        self.scene.destroy(self.monsters[0])
+        self.scene.countdown(HungerClock.id, "duration", 3)
+        self.assertEqual(self.scene.below(HungerClock.id, "duration", 1), [self.player, self.monsters[1]])
+        reused = self.scene.create().add(HungerClock(HungerClock.NORMAL, 7))
+        self.assertEqual(reused[HungerClock.id].duration, 7)
+        self.assertEqual(self.scene.below(HungerClock.id, "duration", 3), [self.player, self.monsters[1], self.monsters[2]])
+
+
+class CommandBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.world = World().__enter__()
+        self.scene = self.world.scene
+        self.commands = self.scene.commands
+
+    def tearDown(self):
+        self.world.__exit__(None, None, None)
+
+    def test_nothing_changes_until_the_flush(self):
+        entity = self.commands.create()
+        self.commands.add(entity, Name("Goblin"))
+        self.assertNotIn(entity, self.scene.entities)
+        self.scene.flush()
+        self.assertIn(entity, self.scene.entities)
+        self.assertEqual(entity[Name.id].name, "Goblin")
+
+    def test_commands_apply_in_the_order_they_were_recorded(self):
+        entity = self.scene.create()
+        self.commands.add(entity, Name("first"))
+        self.commands.remove(entity, Name.id)
+        self.commands.add(entity, Name("last"))
+        self.assertEqual(self.commands.pending(entity, Name.id).name, "last")
+        self.scene.flush()
+        self.assertEqual(entity[Name.id].name, "last")
+        self.commands.remove(entity, Name.id)
+        self.commands.add(entity, Position(1, 2))
+        self.scene.flush()
+        self.assertFalse(entity.has(Name.id))
+        self.assertTrue(entity.has(Position.id))
+
+    def test_commands_after_a_destroy_are_dropped(self):
+        entity = self.scene.create()
+        self.commands.destroy(entity)
+        self.commands.add(entity, Name("ghost"))
+        self.commands.remove(entity, Name.id)
+        self.scene.flush()
+        self.assertNotIn(entity, self.scene.entities)
+        self.assertFalse(entity.has(Name.id))
+        self.assertEqual(self.commands.commands, [])
+
+    def test_commands_recorded_while_flushing_wait_for_the_next_flush(self):
+        entity = self.scene.create()
+        self.commands._record(lambda: self.commands.add(entity, Name("later")), ())
+        self.scene.flush()
+        self.assertFalse(entity.has(Name.id))
+        self.scene.flush()
+        self.assertEqual(entity[Name.id].name, "later")
+
+
+class ChangeTickTest(unittest.TestCase):
+    def setUp(self):
+        self.scene = Scene()
+        self.old = self.scene.create().add(Position(0, 0))
+        self.scene.checkpoint("system")
+
+    def test_first_run_has_no_history(self):
+        self.assertEqual(self.scene.checkpoint("other"), -1)
+
+    def test_added_changed_and_removed_since_the_last_run(self):
+        new = self.scene.create().add(Position(1, 1))
+        self.old.markChanged(Position.id)
+        since = self.scene.checkpoint("system")
+        self.assertEqual(self.scene.added(Position.id, since), [new])
+        self.assertEqual(self.scene.changed(Position.id, since), [self.old])
+        self.assertEqual(self.scene.removed(Position.id, since), [])
+        new.remove(Position.id)
+        self.scene.destroy(self.old)
+        since = self.scene.checkpoint("system")
+        self.assertEqual(self.scene.added(Position.id, since), [])
+        self.assertEqual(self.scene.changed(Position.id, since), [])
+        self.assertEqual(self.scene.removed(Position.id, since), [new, self.old])
+
+    def test_each_system_sees_the_changes_since_its_own_run(self):
+        self.scene.checkpoint("slow")
+        entity = self.scene.create().add(Position(1, 1))
+        self.assertEqual(self.scene.added(Position.id, self.scene.checkpoint("system")), [entity])
+        entity.markChanged(Position.id)
+        self.assertEqual(self.scene.added(Position.id, self.scene.checkpoint("system")), [])
+        since = self.scene.checkpoint("slow")
+        self.assertEqual(self.scene.added(Position.id, since), [entity])
+        self.assertEqual(self.scene.changed(Position.id, since), [entity])
+
+    def test_changes_seen_by_every_system_are_dropped(self):
+        self.old.markChanged(Position.id)
+        self.scene.checkpoint("system")
+        self.scene.checkpoint("system")
+        self.assertEqual(self.scene.changes[Position.id], {})
+
+
+class ResourcesTest(unittest.TestCase):
+    def setUp(self):
+        self.resources = Resources()
+        self.resources.register("turn", int, 1)
+        self.resources.register("seed", int)
+
+    def test_registered_values_are_typed(self):
+        self.resources.seed = 7
+        self.assertEqual((self.resources.turn, self.resources.seed), (1, 7))
+        with self.assertRaises(TypeError):
+            self.resources.seed = "7"
+        with self.assertRaises(TypeError):
+            self.resources.turn = None
+
+    def test_unregistered_or_unset_names_fail(self):
+        with self.assertRaises(AttributeError):
+            self.resources.mapp = 1
+        with self.assertRaisesRegex(AttributeError, "not registered"):
+            self.resources.mapp
+        with self.assertRaisesRegex(AttributeError, "not stored yet"):
+            self.resources.seed
+
+    def test_registration_is_checked(self):
+        self.resources.register("seed", int, 3)
+        with self.assertRaises(TypeError):
+            self.resources.register("seed", str)
+        for name in ("types", "register", "two words"):
+            with self.assertRaises(ValueError):
+                self.resources.register(name, int)
+
+    def test_fast_resources_live_in_slots(self):
+        self.assertNotIn("turn", self.resources.values)
+        self.resources.seed = 5
+        self.assertEqual(self.resources.values, {"seed": 5})
+        del self.resources.turn
+        with self.assertRaises(AttributeError):
+            self.resources.turn
+
+
+class RelationTest(unittest.TestCase):
+    def setUp(self):
+        self.scene = Scene()
+        self.player, self.monster = self.scene.create(), self.scene.create()
+        self.sword = self.scene.create().add(InBackpack(self.player))
+        self.scene.useRelation(InBackpack, "owner")
+        self.scene.useRelation(Equipped, "owner", "slot")
+
+    def test_children_follow_their_component(self):
+        self.assertEqual(self.scene.children(InBackpack.id, self.player), [self.sword])
+        potion = self.scene.create().add(InBackpack(self.player))
+        self.assertEqual(self.scene.children(InBackpack.id, self.player), [self.sword, potion])
+        self.sword.add(InBackpack(self.monster))
+        self.assertEqual(self.scene.children(InBackpack.id, self.player), [potion])
+        self.assertEqual(self.scene.children(InBackpack.id, self.monster), [self.sword])
+        potion.remove(InBackpack.id)
+        self.scene.destroy(self.sword)
+        self.assertEqual(self.scene.children(InBackpack.id, self.player), [])
+        self.assertEqual(self.scene.relations[InBackpack.id].children, {})
+
+    def test_keyed_children(self):
+        shield = self.scene.create().add(Equipped(self.player, "shield"))
+        self.sword.remove(InBackpack.id)
+        self.sword.add(Equipped(self.player, "melee"))
+        self.assertIs(self.scene.child(Equipped.id, self.player, "melee"), self.sword)
+        self.assertIs(self.scene.child(Equipped.id, self.player, "shield"), shield)
+        self.assertIsNone(self.scene.child(Equipped.id, self.monster, "melee"))
+        dagger = self.scene.create().add(Equipped(self.player, "melee"))
+        self.assertIs(self.scene.child(Equipped.id, self.player, "melee"), dagger)
+        self.sword.remove(Equipped.id)  # no longer the child of its slot, the dagger stays
+        self.assertIs(self.scene.child(Equipped.id, self.player, "melee"), dagger)
+
+    def test_entities_created_through_the_commands_are_linked(self):
+        scroll = self.scene.commands.create()
+        scroll.add(InBackpack(self.player))
+        self.assertEqual(self.scene.children(InBackpack.id, self.player), [self.sword])
+        self.scene.flush()
+        self.assertEqual(self.scene.children(InBackpack.id, self.player), [self.sword, scroll])
+
+
+class EntityIdTest(unittest.TestCase):
+    def test_released_index_comes_back_with_a_new_generation(self):
+        with World() as world:
+            old = world.scene.create()
+            oldId = old.id
+            world.scene.destroy(old)
+            self.assertFalse(world.isAlive(oldId))
+            self.assertIsNone(world.lookup(oldId))
+            new = world.scene.create()
+            self.assertEqual(new.index, oldId & INDEX_MASK)
+            self.assertEqual(new.generation, old.generation + 1)
+            self.assertTrue(new.isAlive())
+            self.assertIs(world.lookup(new.id), new)
+
+    def test_destroyed_entity_does_not_reach_the_components_of_the_next_one(self):
+        pool = WantsToMelee.pool
+        WantsToMelee.pool = Pool()
+        try:
+            with World() as world:
+                scene = world.scene
+                scene.useColumns(CombatStats, "maxHP", "HP", "defense", "power")
+                target = scene.create()
+                dead = scene.create().add(CombatStats(10, 1, 2)).add(WantsToMelee.acquire(target))
+                scene.destroy(dead)
+                alive = scene.create().add(CombatStats(30, 3, 4)).add(WantsToMelee.acquire(target))
+                self.assertEqual(dead.signature, 0)
+                self.assertEqual(dead.components, {})
+                self.assertFalse(dead.has(CombatStats.id))
+                self.assertEqual(WantsToMelee.pool.reused, 1)  # the dead one's intent, now the alive one's
+                self.assertNotIn(alive[WantsToMelee.id], dead.components.values())
+                self.assertNotIn(alive[CombatStats.id], dead.components.values())
+                self.assertEqual(alive[CombatStats.id].HP, 30)
+        finally:
+            WantsToMelee.pool = pool
+
+
+class Noise(Event):
+    def __init__(self, source: str):
+        self.source = source
+
+
+class Echo(Event):
+    pass
+
+
+class EventQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.events = Scene().events
+
+    def test_drain_takes_the_events_of_one_type_in_order(self):
+        for source in ("first", "second"):
+            self.events.emit(Noise(source))
+        self.events.emit(Echo())
+        self.assertEqual([event.source for event in self.events.drain(Noise)], ["first", "second"])
+        self.assertEqual(self.events.drain(Noise), [])
+        self.assertEqual(len(self.events.pending(Echo)), 1)
+
+    def test_pending_does_not_consume(self):
+        self.events.emit(Noise("kept"))
+        self.assertEqual(len(self.events.pending(Noise)), 1)
+        self.assertEqual(len(self.events.drain(Noise)), 1)
+        self.assertEqual(self.events.pending(Noise), [])
+
+    def test_events_emitted_while_handling_wait_for_the_next_drain(self):
+        self.events.emit(Noise("first"))
+        for event in self.events.drain(Noise):
+            self.events.emit(Noise("after " + event.source))
+        self.assertEqual([event.source for event in self.events.drain(Noise)], ["after first"])
+
+    def test_clear_drops_every_type(self):
+        self.events.emit(Noise("lost"))
+        self.events.emit(Echo())
+        self.events.clear()
+        self.assertEqual(self.events.drain(Noise), [])
+        self.assertEqual(self.events.drain(Echo), [])
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scene = Scene()
+        self.previous = ECS.scene
+        ECS.scene = self.scene
+        self.lines: list[str] = list()
+
+    def tearDown(self):
+        ECS.scene = self.previous
+
+    def names(self, scheduler: Scheduler) -> list[list[str]]:
+        return [[system.name for system in stage] for stage in scheduler.build()]
+
+    def test_conflicting_systems_get_their_own_stages(self):
+        def first(): pass
+        def second(): pass
+        def third(): pass
+        scheduler = Scheduler()
+        scheduler.add(first, writes=Position.id)
+        scheduler.add(second, reads=Position.id)
+        scheduler.add(third, reads=Name.id)
+        self.assertEqual(self.names(scheduler), [["first", "third"], ["second"]])
+
+    def test_emitters_share_a_stage_and_drainers_wait_for_them(self):
+        def drain(): pass
+        def emitA(): pass
+        def emitB(): pass
+        def drainAgain(): pass
+        scheduler = Scheduler()
+        scheduler.add(drain, writeResources=("noise",))
+        scheduler.add(emitA, emits=("noise",))
+        scheduler.add(emitB, emits=("noise",))
+        scheduler.add(drainAgain, writeResources=("noise",))
+        self.assertEqual(self.names(scheduler), [["drain", "emitA", "emitB"], ["drainAgain"]])
+
+    def test_stage_output_keeps_the_order_of_the_systems(self):
+        def slow():
+            time.sleep(0.05)
+            deferToStage(self.lines.append, "slow")
+            ECS.scene.events.emit(Noise("slow"))
+            ECS.scene.commands.add(ECS.scene.create(), Name("slow"))
+        def fast():
+            deferToStage(self.lines.append, "fast")
+            ECS.scene.events.emit(Noise("fast"))
+            ECS.scene.commands.add(ECS.scene.create(), Name("fast"))
+        scheduler = Scheduler(workers=2)
+        scheduler.add(slow, emits=("noise",))
+        scheduler.add(fast, emits=("noise",))
+        self.assertEqual(self.names(scheduler), [["slow", "fast"]])
+        scheduler.run(self.scene)
+        self.assertEqual(self.lines, ["slow", "fast"])
+        self.assertEqual([event.source for event in self.scene.events.drain(Noise)], ["slow", "fast"])
+        self.assertEqual(sorted(entity[Name.id].name for entity in self.scene.filter(Name.id)), ["fast", "slow"])
+
+    def test_output_outside_a_shared_stage_is_immediate(self):
+        deferToStage(self.lines.append, "now")
+        self.assertEqual(self.lines, ["now"])
+
+
+@PROFILER.profile
+def profiledWork() -> None:
+    pass
+
+
+class ProfilerTest(unittest.TestCase):
+    def test_each_world_keeps_its_own_timings(self):
+        def play(world: World, calls: int) -> None:
+            with world:
+                for _ in range(calls):
+                    profiledWork()
+        first, second = World(), World()
+        threads = [threading.Thread(target=play, args=(first, 3)), threading.Thread(target=play, args=(second, 5))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(first.profiler.timing("profiledWork").calls, 3)
+        self.assertEqual(second.profiler.timing("profiledWork").calls, 5)
+        self.assertNotIn("profiledWork", ECS.world.profiler.timings)
+
+    def test_disabled_in_one_world_only(self):
+        with World() as world:
+            PROFILER.enabled = False
+            profiledWork()
+            self.assertEqual(world.profiler.timing("profiledWork").calls, 0)
+        with World() as world:
+            profiledWork()
+            self.assertEqual(world.profiler.timing("profiledWork").calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import random
+import tempfile
+import unittest
+
+from map_builders.generationHistory import GenerationHistory
+
+
+class GenerationHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.history = GenerationHistory(5, 3, keyframeInterval=3)
+        self.steps: list[bytes] = list()
+        rng = random.Random(4)
+        cells = bytearray(15)
+        for _ in range(10):
+            for _ in range(rng.randint(1, 4)):
+                cells[rng.randrange(15)] = rng.randint(1, 2)
+            if self.steps and cells == self.steps[-1]:
+                cells[0] ^= 1
+            self.history.record(cells)
+            self.steps.append(bytes(cells))
+
+    def test_every_step_comes_back_from_the_keyframe_before_it(self):
+        self.assertEqual(len(self.history), 10)
+        self.assertEqual(len(self.history.keyframes), 4)
+        for step, cells in enumerate(self.steps):
+            self.assertEqual(self.history.cells(step), cells)
+        for step in (9, 0, 5, 4):  # scrubbing back and forth
+            self.assertEqual(self.history.cells(step), self.steps[step])
+        with self.assertRaises(IndexError):
+            self.history.cells(10)
+
+    def test_steps_that_change_nothing_are_not_kept(self):
+        self.history.record(self.steps[-1])
+        self.assertEqual(len(self.history), 10)
+        empty = GenerationHistory(2, 1)
+        empty.record(bytes(2))
+        self.assertEqual(len(empty), 1)  # the first step is the starting grid
+
+    def test_written_and_read_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "generation.json")
+            self.history.save(path)
+            loaded = GenerationHistory.load(path)
+        self.assertEqual([loaded.cells(step) for step in range(len(loaded))], self.steps)
+        self.assertEqual(loaded.text(3), self.history.text(3))
+        loaded.record(self.steps[-1])
+        self.assertEqual(len(loaded), 10)
+
+    def test_text(self):
+        history = GenerationHistory(3, 2)
+        history.record(bytes([0, 1, 2, 1, 1, 0]))
+        self.assertEqual(history.text(0), "#.>\n..#")
+
+
+if __name__ == "__main__":
+    unittest.main()
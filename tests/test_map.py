@@ -0,0 +1,121 @@
+import pickle
+import unittest
+
+from algorithms import Point
+from component import BlocksTile, Position
+from core import Scene
+from map import OPAQUE, VISIBLE, Map, TileType
+
+
+class MapLayerTest(unittest.TestCase):
+    def setUp(self):
+        self.map = Map(6, 4)
+        self.map.fillRect(1, 1, 5, 3, TileType.Floor)
+
+    def test_tiles_keep_the_opaque_bit(self):
+        self.assertEqual(self.map.tiles[Point(1, 1)], TileType.Floor)
+        self.assertEqual(self.map.tiles[Point(0, 0)], TileType.Wall)
+        self.assertFalse(self.map.isOpaque(1, 1))
+        self.assertTrue(self.map.isOpaque(0, 1))
+        self.assertFalse(self.map.isOpaque(-1, 1))
+        self.map.tiles[Point(2, 2)] = TileType.Wall
+        self.assertTrue(self.map.isOpaque(2, 2))
+        with self.assertRaises(KeyError):
+            self.map.tiles[Point(6, 0)]
+
+    def test_layers_are_independent_sets_of_points(self):
+        self.map.visibleTiles.add(Point(1, 1))
+        self.map.revealedTiles.update([Point(1, 1), Point(2, 1)])
+        self.map.bloodstains.add(Point(9, 9))  # outside the map, never in a layer
+        self.assertEqual(set(self.map.visibleTiles), {Point(1, 1)})
+        self.assertEqual(len(self.map.revealedTiles), 2)
+        self.assertEqual(len(self.map.bloodstains), 0)
+        self.map.visibleTiles.clear()
+        self.assertEqual(len(self.map.visibleTiles), 0)
+        self.assertIn(Point(1, 1), self.map.revealedTiles)
+        self.map.revealedTiles = [Point(3, 2)]
+        self.assertEqual(set(self.map.revealedTiles), {Point(3, 2)})
+        self.assertEqual(self.map.revealedTiles.mask(2 * 6, 3 * 6), bytes([0, 0, 0, 1, 0, 0]))
+
+    def test_set_layer_replaces_one_bit(self):
+        self.map.setLayer(VISIBLE, bytes([VISIBLE]) * 24)
+        self.assertEqual(len(self.map.visibleTiles), 24)
+        self.assertTrue(self.map.isOpaque(0, 0))
+        self.map.setLayer(OPAQUE, bytes(24))
+        self.assertFalse(self.map.isOpaque(0, 0))
+        self.assertEqual(len(self.map.visibleTiles), 24)
+
+    def test_saved_and_loaded(self):
+        self.map.bloodstains.add(Point(2, 1))
+        self.map.wallMasks()
+        loaded: Map = pickle.loads(pickle.dumps(self.map))
+        self.assertEqual(loaded.cells, self.map.cells)
+        self.assertEqual(loaded.flags, self.map.flags)
+        self.assertEqual(set(loaded.bloodstains), {Point(2, 1)})
+        self.assertEqual(loaded.wallMasks(), self.map.wallMasks())
+
+    def test_loads_the_saves_with_dicts_and_sets_of_points(self):
+        tiles = {Point(x, y): TileType.Wall for y in range(4) for x in range(6)}
+        tiles[Point(1, 1)] = tiles[Point(2, 1)] = TileType.Floor
+        tiles[Point(3, 1)] = TileType.DownStairs
+        state = {"name": "old", "width": 6, "height": 4, "depth": 2, "tiles": tiles, "blocked": {Point(0, 0)},
+                 "visibleTiles": {Point(1, 1)}, "revealedTiles": {Point(1, 1), Point(2, 1)}, "bloodstains": {Point(2, 1)},
+                 "tileContent": dict()}
+        loaded = Map.__new__(Map)
+        loaded.__setstate__(state)
+        self.assertEqual(loaded.tiles.copy(), tiles)
+        self.assertEqual(set(loaded.revealedTiles), {Point(1, 1), Point(2, 1)})
+        self.assertEqual(set(loaded.visibleTiles), {Point(1, 1)})
+        self.assertEqual(set(loaded.bloodstains), {Point(2, 1)})
+        self.assertTrue(loaded.isOpaque(0, 0))
+        self.assertFalse(loaded.isOpaque(3, 1))
+        self.assertEqual(len(loaded.blockers), 24)
+        self.assertEqual(loaded.depth, 2)
+
+
+class BlockedTest(unittest.TestCase):
+    def setUp(self):
+        self.map = Map(6, 4)
+        self.map.fillRect(1, 1, 5, 3, TileType.Floor)
+        self.map.clearContentIndex()
+        self.scene = Scene()
+
+    def place(self, x: int, y: int, blocks: bool = True):
+        entity = self.scene.create().add(Position(x, y))
+        if blocks:
+            entity.add(BlocksTile())
+        self.map.placeContent(entity, Point(x, y))
+        return entity
+
+    def test_walls_are_blocked_from_the_start(self):
+        self.assertEqual(len(self.map.blocked), 24 - 8)
+        self.assertNotIn(Point(1, 1), self.map.blocked)
+
+    def test_a_cell_is_blocked_while_a_blocker_stays(self):
+        first, second = self.place(2, 1), self.place(2, 1)
+        self.place(3, 1, blocks=False)
+        self.assertIn(Point(2, 1), self.map.blocked)
+        self.assertNotIn(Point(3, 1), self.map.blocked)
+        self.map.removeContent(first)
+        self.assertIn(Point(2, 1), self.map.blocked)
+        self.map.removeContent(second)
+        self.assertNotIn(Point(2, 1), self.map.blocked)
+
+    def test_moving_blockers_keep_the_index_exact(self):
+        monster = self.place(1, 1)
+        wall = self.place(0, 0)  # standing in a wall, the wall stays blocked when it leaves
+        for x, y in ((2, 1), (3, 2)):
+            monster[Position.id].x, monster[Position.id].y = x, y
+            self.map.moveContent(monster, Point(x, y))
+        self.map.removeContent(wall)
+        self.assertIn(Point(0, 0), self.map.blocked)
+        self.assertEqual([point for point in self.map.blocked if self.map.tiles[point] != TileType.Wall], [Point(3, 2)])
+        monster.remove(BlocksTile.id)  # lost before leaving, still counted until it does
+        self.assertIn(Point(3, 2), self.map.blocked)
+        self.map.removeContent(monster)
+        self.assertNotIn(Point(3, 2), self.map.blocked)
+        self.assertEqual(self.map.checkContentIndex([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+import pygame.freetype
+
+from algorithms import Point
+from component import Renderable
+from device import Font
+from screen import CHUNK_SIZE, Screen, ScreenLayer
+
+
+class ScreenChunkTest(unittest.TestCase):
+    def setUp(self):
+        pygame.freetype.init()
+        font = Font(None, 16, pygame.freetype.Font("./art/DejaVuSansMono-Bold.ttf", 16))
+        self.drawn: list[tuple[int, int, int, int]] = list()
+        self.screen = Screen(200, 200, font, 40, 20)
+        self.screen.background = lambda x1, y1, x2, y2: self.drawn.append((x1, y1, x2, y2))
+        self.screen.reset()
+
+    def transparent(self, x: int, y: int) -> bool:
+        chunk = self.screen.chunks[(x // CHUNK_SIZE, y // CHUNK_SIZE)]
+        return chunk[ScreenLayer.FogRevealed].get_at((x % CHUNK_SIZE * self.screen.dx, y % CHUNK_SIZE * self.screen.dy)).a == 0
+
+    def test_only_the_chunks_under_the_view_are_loaded(self):
+        self.assertEqual(sorted(self.screen.chunks), [(0, 0), (1, 0)])
+        self.assertEqual(self.drawn, [(0, 0, 32, 32), (32, 0, 64, 32)])
+
+    def test_following_loads_new_chunks_and_drops_the_far_ones(self):
+        self.screen.follow(Point(100, 100))
+        self.assertEqual(self.screen.view, Point(80, 90))
+        self.assertEqual(sorted(self.screen.chunks), [(2, 2), (2, 3), (3, 2), (3, 3)])
+        drawn = len(self.drawn)
+        self.screen.follow(Point(101, 100))  # inside the margin, nothing is drawn again
+        self.assertEqual(len(self.drawn), drawn)
+        self.screen.follow(Point(199, 199))
+        self.assertEqual(self.screen.view, Point(160, 180))
+        self.assertIn((192, 192, 200, 200), self.drawn)  # the last chunk ends with the map
+
+    def test_revealed_cells_are_remembered_while_their_chunk_is_away(self):
+        self.screen.reveal(150, 150)
+        self.screen.follow(Point(150, 150))
+        self.assertTrue(self.transparent(150, 150))
+        self.assertFalse(self.transparent(151, 150))
+        self.screen.follow(Point(0, 0))
+        self.screen.follow(Point(150, 150))
+        self.assertTrue(self.transparent(150, 150))
+
+    def lit(self, x: int, y: int) -> bool:
+        surface = self.screen.chunks[(x // CHUNK_SIZE, y // CHUNK_SIZE)][ScreenLayer.BackgroundVisible]
+        left, top = x % CHUNK_SIZE * self.screen.dx, y % CHUNK_SIZE * self.screen.dy
+        return any(surface.get_at((left + i, top + j)).r for i in range(self.screen.dx) for j in range(self.screen.dy))
+
+    def test_glyphs_outside_the_loaded_chunks_are_dropped(self):
+        render = Renderable("#", 0, (255, 255, 255, 255))
+        self.screen.setGlyph(ScreenLayer.BackgroundVisible, Point(150, 150), render)
+        self.screen.setGlyph(ScreenLayer.BackgroundVisible, Point(1, 1), render)
+        self.assertEqual(sorted(self.screen.chunks), [(0, 0), (1, 0)])
+        self.assertTrue(self.lit(1, 1))
+        self.screen.follow(Point(150, 150))
+        self.assertFalse(self.lit(150, 150))
+
+    def test_reset_forgets_the_map(self):
+        self.screen.reveal(1, 1)
+        self.screen.reset(50, 30)
+        self.assertEqual(len(self.screen.revealed), 50 * 30)
+        self.assertFalse(self.transparent(1, 1))
+        self.assertEqual(sorted(self.screen.chunks), [(0, 0), (1, 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,14 @@
 
-from core import ECS
-from device import Color, Font
+from typing import TYPE_CHECKING
+
+from color import Color
+from core import ECS, deferToStage
+
+if TYPE_CHECKING:
+    from device import Font
 
 class Logger:
-    def __init__(self, font:Font, length:int, x:int, y:int):
+    def __init__(self, font:'Font | None', length:int, x:int, y:int):
         self.messages:list[str] = []
         self.x = x
         self.y = y
@@ -15,17 +20,31 @@ class Logger:
     def clear(self):
         self.messages.clear()
     
+    # systems sharing a stage log into their own buffers, appended in the order of the systems when the stage ends
     def log(self, message:str) -> None:
-        turn = ECS.scene.retrieve("turn")
-        self.messages.append(f"Turn:{turn}: {message}")
+        turn = ECS.scene.resources.turn
+        deferToStage(self._append, f"Turn:{turn}: {message}")
+
+    def _append(self, message:str) -> None:
+        self.messages.append(message)
         size = len(self.messages)
         if size > self.length:
             self.messages = self.messages[-self.length:]
     
     def print(self) -> None:
-        font:Font = ECS.scene.retrieve("font")
+        font:'Font' = ECS.scene.resources.font
         font.background = self.background
         font.foreground = self.foreground
         for i in range(len(self.messages)):
             message = self.messages[i]
             font.drawAtScreen(message, self.x, self.y + i * font.size)
+
+
+# running totals of the current game, damage dealt is the damage taken by everyone but the player
+class Statistics:
+    __slots__ = ["kills", "damageDealt", "damageTaken"]
+
+    def __init__(self):
+        self.kills = 0
+        self.damageDealt = 0
+        self.damageTaken = 0